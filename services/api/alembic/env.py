@@ -16,13 +16,26 @@ def get_url() -> str:
         raise RuntimeError("DATABASE_URL_MIGRATOR must be set for Alembic migrations")
     return url
 
+def run_migrations_offline() -> None:
+    # `alembic upgrade A:B --sql` (used by hakilix.scripts.lock_plan): emit SQL, touch nothing.
+    context.configure(url=get_url(), literal_binds=True, dialect_opts={"paramstyle": "named"},
+                      transaction_per_migration=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
 def run_migrations_online() -> None:
     section = config.get_section(config.config_ini_section) or {}
     section["sqlalchemy.url"] = get_url()
     connectable = engine_from_config(section, prefix="sqlalchemy.", poolclass=pool.NullPool)
     with connectable.connect() as connection:
-        context.configure(connection=connection, target_metadata=target_metadata, compare_type=True)
+        # One transaction per revision: a failed upgrade keeps the revisions already applied,
+        # so re-running it resumes instead of redoing every revision since the last success.
+        context.configure(connection=connection, target_metadata=target_metadata, compare_type=True,
+                          transaction_per_migration=True)
         with context.begin_transaction():
             context.run_migrations()
 
-run_migrations_online()
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
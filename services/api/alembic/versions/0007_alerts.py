@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+"""Tenant-configurable alert rules and the alerts they raise.
+
+A rule fires when ``metric <op> threshold`` holds for ``consecutive`` readings in a
+row for a resident; ``cooldown_s`` suppresses re-firing for the same resident.
+Rules are evaluated by the inference service's alert consumer
+(``inference/alerts.py``), which writes one row to ``alerts`` per firing.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0007_alerts"
+down_revision = "0006_devices_resident_fk"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "alert_rules",
+        sa.Column("id", sa.String(64), primary_key=True),
+        sa.Column("agency_id", sa.String(64), sa.ForeignKey("hakilix.agencies.id"), nullable=False, index=True),
+        sa.Column("name", sa.String(255), nullable=False),
+        sa.Column("metric", sa.String(64), nullable=False),
+        sa.Column("op", sa.String(2), nullable=False),
+        sa.Column("threshold", sa.Float(), nullable=False),
+        sa.Column("consecutive", sa.Integer(), nullable=False, server_default="1"),
+        sa.Column("cooldown_s", sa.Integer(), nullable=False, server_default="3600"),
+        sa.Column("severity", sa.String(32), nullable=False, server_default="high"),
+        sa.Column("enabled", sa.Boolean(), nullable=False, server_default=sa.true()),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+        sa.CheckConstraint("op IN ('>', '>=', '<', '<=')", name="ck_alert_rules_op"),
+        sa.CheckConstraint("consecutive BETWEEN 1 AND 1000", name="ck_alert_rules_consecutive"),
+        schema="hakilix",
+    )
+
+    op.create_table(
+        "alerts",
+        sa.Column("id", sa.BigInteger(), primary_key=True, autoincrement=True),
+        sa.Column("time", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("agency_id", sa.String(64), nullable=False),
+        sa.Column("resident_id", sa.String(64), nullable=False),
+        sa.Column("rule_id", sa.String(64), nullable=False),
+        sa.Column("metric", sa.String(64), nullable=False),
+        sa.Column("value", sa.Float(), nullable=False),
+        sa.Column("threshold", sa.Float(), nullable=False),
+        sa.Column("severity", sa.String(32), nullable=False),
+        sa.Column("model_version", sa.String(64), nullable=True),
+        sa.Column("detail", sa.Text(), nullable=True),
+        schema="hakilix",
+    )
+    op.execute("CREATE INDEX IF NOT EXISTS ix_alerts_agency_time ON hakilix.alerts (agency_id, time DESC);")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_alerts_agency_resident_time ON hakilix.alerts (agency_id, resident_id, time DESC);")
+
+    for t in ["alert_rules", "alerts"]:
+        op.execute(f"ALTER TABLE hakilix.{t} ENABLE ROW LEVEL SECURITY;")
+        op.execute(f"DROP POLICY IF EXISTS p_{t} ON hakilix.{t};")
+        op.execute(
+            f"CREATE POLICY p_{t} ON hakilix.{t} "
+            f"USING (agency_id = current_setting('app.tenant_id', true)) "
+            f"WITH CHECK (agency_id = current_setting('app.tenant_id', true));"
+        )
+
+
+def downgrade():
+    op.drop_table("alerts", schema="hakilix")
+    op.drop_table("alert_rules", schema="hakilix")
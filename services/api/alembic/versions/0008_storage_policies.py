@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+"""Compression and hypertable conversion for the time-series tables.
+
+With TimescaleDB:
+- ``risk_events`` becomes a hypertable (existing rows are migrated into chunks;
+  this holds a lock on the table for the duration of the copy)
+- ``telemetry`` and ``risk_events`` get native compression segmented by
+  ``agency_id, resident_id`` and ordered by ``time DESC``, plus a default policy
+  compressing chunks older than 7 days
+
+Retention and the compression age are then managed by
+``python -m hakilix.scripts.storage_policies apply`` from the
+``HAKILIX_COMPRESS_AFTER_DAYS`` / ``HAKILIX_RETENTION_*_DAYS`` settings.
+
+Without TimescaleDB this migration is a no-op; retention falls back to batched
+deletes run by ``storage_policies run-retention``.
+
+Each step is best-effort (like 0002). TimescaleDB refuses ``timescaledb.compress``
+on tables with row-level security, and telemetry and risk_events have RLS since
+0003, so on such builds the compression step only logs a NOTICE and both tables
+stay uncompressed. audit_log gets no compression settings at all. ``storage_policies
+report`` shows ``compression: unavailable (RLS)`` for them and ``apply`` exits
+non-zero while compression is requested but unavailable.
+"""
+
+from alembic import op
+
+
+revision = "0008_storage_policies"
+down_revision = "0007_alerts"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute(
+        """
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_proc WHERE proname='create_hypertable') THEN
+    BEGIN
+      PERFORM create_hypertable('hakilix.risk_events', 'time', if_not_exists => TRUE, migrate_data => TRUE);
+    EXCEPTION WHEN others THEN
+      RAISE NOTICE 'risk_events hypertable conversion skipped: %', SQLERRM;
+    END;
+  END IF;
+END $$;
+"""
+    )
+
+    for table in ("telemetry", "risk_events"):
+        op.execute(
+            f"""
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_proc WHERE proname='add_compression_policy')
+     AND EXISTS (SELECT 1 FROM timescaledb_information.hypertables
+                 WHERE hypertable_schema='hakilix' AND hypertable_name='{table}') THEN
+    BEGIN
+      ALTER TABLE hakilix.{table} SET (
+        timescaledb.compress,
+        timescaledb.compress_segmentby = 'agency_id, resident_id',
+        timescaledb.compress_orderby = 'time DESC'
+      );
+      PERFORM add_compression_policy('hakilix.{table}', INTERVAL '7 days', if_not_exists => TRUE);
+    EXCEPTION WHEN others THEN
+      RAISE NOTICE '{table} compression skipped: %', SQLERRM;
+    END;
+  END IF;
+END $$;
+"""
+        )
+
+
+def downgrade():
+    for table in ("telemetry", "risk_events"):
+        op.execute(
+            f"""
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_proc WHERE proname='remove_compression_policy') THEN
+    BEGIN
+      PERFORM remove_retention_policy('hakilix.{table}', if_exists => TRUE);
+      PERFORM remove_compression_policy('hakilix.{table}', if_exists => TRUE);
+      PERFORM decompress_chunk(c, if_compressed => TRUE) FROM show_chunks('hakilix.{table}') c;
+      ALTER TABLE hakilix.{table} SET (timescaledb.compress = false);
+    EXCEPTION WHEN others THEN
+      RAISE NOTICE '{table} compression downgrade skipped: %', SQLERRM;
+    END;
+  END IF;
+END $$;
+"""
+        )
+    # risk_events stays a hypertable: converting back would need a full table copy.
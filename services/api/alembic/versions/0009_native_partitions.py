@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+"""Native range partitioning for telemetry, risk_events and audit_log (no TimescaleDB).
+
+On Postgres without TimescaleDB (e.g. Cloud SQL) each table becomes
+``PARTITION BY RANGE (time)`` with monthly partitions, so time-bounded queries
+prune partitions and retention can drop whole partitions.
+
+Existing rows are not copied or split into monthly partitions: they stay in
+one ``<table>_legacy`` partition (``MINVALUE`` up to the boundary), which
+retention can only drop once all of it has expired. Moving them into monthly
+partitions would rewrite every row; that is left to a later, optional step.
+Each table is converted online:
+
+1. ``CHECK (time < <boundary>) NOT VALID`` is added (brief lock), where the
+   boundary is the first day of a month at least 7 days ahead
+2. the constraint is validated outside the migration transaction; this scans the
+   table under SHARE UPDATE EXCLUSIVE, so reads and writes continue
+3. in one short transaction the table is renamed ``<table>_legacy``, a partitioned
+   parent with the old name is created, and the legacy table is attached as the
+   ``(MINVALUE) TO (<boundary>)`` partition; the validated CHECK lets Postgres skip
+   the attach scan and existing equivalent indexes are reused instead of rebuilt
+
+``audit_log``'s primary key becomes ``(id, time)`` (a partitioned table's unique
+keys must include the partition key); the legacy unique index is built
+concurrently first, and ``audit_log_id_seq`` is re-owned by the new parent so
+dropping the legacy partition later does not take the sequence with it.
+
+Each table also gets a ``<table>_default`` DEFAULT partition, so a row past the
+last monthly partition is still accepted; ``maintain`` moves such rows into
+their month when it creates it.
+
+Future partitions are pre-created here and then by
+``python -m hakilix.scripts.partitions maintain``, which also drops expired ones.
+With TimescaleDB this migration is a no-op.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+from alembic import op
+from sqlalchemy import text
+
+
+revision = "0009_native_partitions"
+down_revision = "0008_storage_policies"
+branch_labels = None
+depends_on = None
+
+TABLES = ("telemetry", "risk_events", "audit_log")
+PREMAKE_MONTHS = 3
+
+# Indexes on the partitioned parent; partitions get (or reuse) a matching index.
+PARENT_INDEXES = {
+    "telemetry": [
+        "CREATE INDEX IF NOT EXISTS ix_telemetry_agency_resident_time ON hakilix.telemetry (agency_id, resident_id, time DESC)",
+        "CREATE INDEX IF NOT EXISTS ix_hakilix_telemetry_time ON hakilix.telemetry (time)",
+    ],
+    "risk_events": [
+        "CREATE INDEX IF NOT EXISTS ix_risk_events_agency_resident_time ON hakilix.risk_events (agency_id, resident_id, time DESC)",
+        "CREATE INDEX IF NOT EXISTS ix_hakilix_risk_events_time ON hakilix.risk_events (time)",
+    ],
+    "audit_log": [
+        "CREATE INDEX IF NOT EXISTS ix_hakilix_audit_log_time ON hakilix.audit_log (time)",
+        "CREATE INDEX IF NOT EXISTS ix_hakilix_audit_log_agency_id ON hakilix.audit_log (agency_id)",
+    ],
+}
+
+VITALS_1H_VIEW = """
+CREATE OR REPLACE VIEW hakilix.vitals_1h AS
+  SELECT
+    date_trunc('hour', time) AS bucket,
+    agency_id,
+    resident_id,
+    avg(hr) AS hr_avg,
+    avg(spo2) AS spo2_avg,
+    avg(rr) AS rr_avg,
+    avg(temp_c) AS temp_avg
+  FROM hakilix.telemetry
+  GROUP BY date_trunc('hour', time), agency_id, resident_id
+"""
+
+
+def _add_month(dt: datetime) -> datetime:
+    return dt.replace(year=dt.year + dt.month // 12, month=dt.month % 12 + 1)
+
+
+def _scalar(sql: str, **params):
+    return op.get_bind().execute(text(sql), params).scalar()
+
+
+def _skip() -> bool:
+    if _scalar("SELECT 1 FROM pg_extension WHERE extname='timescaledb'"):
+        return True
+    return bool(_scalar("SELECT 1 FROM pg_class WHERE oid = CAST('hakilix.telemetry' AS regclass) AND relkind = 'p'"))
+
+
+def _policy(table: str):
+    op.execute(f"ALTER TABLE hakilix.{table} ENABLE ROW LEVEL SECURITY;")
+    op.execute(f"DROP POLICY IF EXISTS p_{table} ON hakilix.{table};")
+    op.execute(
+        f"CREATE POLICY p_{table} ON hakilix.{table} "
+        f"USING (agency_id = current_setting('app.tenant_id', true)) "
+        f"WITH CHECK (agency_id = current_setting('app.tenant_id', true));"
+    )
+
+
+def upgrade():
+    if _skip():
+        return
+    # First month start at least 7 days ahead, so writes never reach it before the cut-over.
+    soon = datetime.now(timezone.utc) + timedelta(days=7)
+    boundary = datetime(soon.year, soon.month, 1, tzinfo=timezone.utc)
+    if boundary < soon:
+        boundary = _add_month(boundary)
+
+    for table in TABLES:
+        op.execute(f"ALTER TABLE hakilix.{table} ADD CONSTRAINT ck_{table}_legacy_range "
+                   f"CHECK (time < TIMESTAMPTZ '{boundary.isoformat()}') NOT VALID;")
+
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            op.execute(f"ALTER TABLE hakilix.{table} VALIDATE CONSTRAINT ck_{table}_legacy_range;")
+        op.execute("CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS audit_log_legacy_id_time ON hakilix.audit_log (id, time);")
+
+    op.execute("SET LOCAL lock_timeout = '10s';")
+    for table in TABLES:
+        op.execute(f"ALTER TABLE hakilix.{table} RENAME TO {table}_legacy;")
+        # Free the index names for the parent; CREATE INDEX on the parent then adopts these.
+        for ddl in PARENT_INDEXES[table]:
+            name = ddl.split(" IF NOT EXISTS ")[1].split()[0]
+            op.execute(f"ALTER INDEX IF EXISTS hakilix.{name} RENAME TO {name}_legacy;")
+        op.execute(f"CREATE TABLE hakilix.{table} (LIKE hakilix.{table}_legacy INCLUDING DEFAULTS) PARTITION BY RANGE (time);")
+        if table == "audit_log":
+            op.execute("ALTER TABLE hakilix.audit_log ADD CONSTRAINT audit_log_pkey_time PRIMARY KEY (id, time);")
+            # The parent's id DEFAULT uses this sequence; it must not belong to the legacy partition.
+            op.execute("ALTER SEQUENCE IF EXISTS hakilix.audit_log_id_seq OWNED BY hakilix.audit_log.id;")
+        op.execute(f"ALTER TABLE hakilix.{table} ATTACH PARTITION hakilix.{table}_legacy "
+                   f"FOR VALUES FROM (MINVALUE) TO ('{boundary.isoformat()}');")
+        for ddl in PARENT_INDEXES[table]:
+            op.execute(ddl + ";")
+        _policy(table)
+
+        lower = boundary
+        for _ in range(PREMAKE_MONTHS):
+            upper = _add_month(lower)
+            op.execute(f"CREATE TABLE IF NOT EXISTS hakilix.{table}_p{lower:%Y_%m} PARTITION OF hakilix.{table} "
+                       f"FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}');")
+            lower = upper
+        op.execute(f"CREATE TABLE IF NOT EXISTS hakilix.{table}_default PARTITION OF hakilix.{table} DEFAULT;")
+
+    # The view followed the renamed table; point it back at the parent.
+    op.execute(VITALS_1H_VIEW + ";")
+    op.execute("GRANT SELECT, INSERT, UPDATE, DELETE ON ALL TABLES IN SCHEMA hakilix TO hakilix_app;")
+    op.execute("GRANT INSERT ON hakilix.telemetry, hakilix.risk_events, hakilix.audit_log TO hakilix_ingest;")
+    op.execute("GRANT SELECT ON ALL TABLES IN SCHEMA hakilix TO hakilix_readonly;")
+
+
+def downgrade():
+    if _scalar("SELECT 1 FROM pg_extension WHERE extname='timescaledb'"):
+        return
+    if not _scalar("SELECT 1 FROM pg_class WHERE oid = CAST('hakilix.telemetry' AS regclass) AND relkind = 'p'"):
+        return
+    # Not online: copies every row back into a plain table.
+    for table in TABLES:
+        op.execute(f"CREATE TABLE hakilix.{table}_plain (LIKE hakilix.{table} INCLUDING DEFAULTS);")
+        op.execute(f"INSERT INTO hakilix.{table}_plain SELECT * FROM hakilix.{table};")
+        if table == "audit_log":
+            op.execute("ALTER TABLE hakilix.audit_log_plain ADD PRIMARY KEY (id);")
+            op.execute("ALTER SEQUENCE IF EXISTS hakilix.audit_log_id_seq OWNED BY hakilix.audit_log_plain.id;")
+        op.execute(f"DROP TABLE hakilix.{table} CASCADE;")
+        op.execute(f"ALTER TABLE hakilix.{table}_plain RENAME TO {table};")
+        for ddl in PARENT_INDEXES[table]:
+            op.execute(ddl + ";")
+        _policy(table)
+    op.execute(VITALS_1H_VIEW + ";")
@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+"""Multi-resolution telemetry rollups: vitals_1m, vitals_1h, vitals_1d.
+
+Each rollup has, per (bucket, agency_id, resident_id), ``n`` readings and
+``<col>_min``, ``<col>_max``, ``<col>_avg``, ``<col>_count`` for every telemetry
+column (vitals and the behavioural signals).
+
+With TimescaleDB they are continuous aggregates with refresh policies and
+real-time aggregation on (toggle with ``python -m hakilix.scripts.rollups realtime``).
+Otherwise, or if Timescale refuses the continuous aggregate, they are plain
+tables (``<col>_sum`` stored, ``<col>_avg`` generated) with row-level security,
+kept current by ``python -m hakilix.scripts.rollups refresh`` through
+``hakilix.rollup_watermarks``.
+
+The old four-column ``vitals_1h`` (view or continuous aggregate) is replaced.
+"""
+
+from alembic import op
+
+
+revision = "0010_rollups"
+down_revision = "0009_native_partitions"
+branch_labels = None
+depends_on = None
+
+COLUMNS = ("hr", "spo2", "rr", "temp_c", "gait_instability", "orthostatic_hypotension", "night_wandering",
+           "intake_ml", "sleep_fragmentation", "agitation", "toileting_freq")
+
+# name -> (bucket width, policy start_offset, end_offset, schedule_interval)
+ROLLUPS = {
+    "vitals_1m": ("1 minute", "2 hours", "1 minute", "1 minute"),
+    "vitals_1h": ("1 hour", "2 days", "1 hour", "15 minutes"),
+    "vitals_1d": ("1 day", "14 days", "1 day", "1 hour"),
+}
+
+VITALS_1H_VIEW = """
+CREATE OR REPLACE VIEW hakilix.vitals_1h AS
+  SELECT
+    date_trunc('hour', time) AS bucket,
+    agency_id,
+    resident_id,
+    avg(hr) AS hr_avg,
+    avg(spo2) AS spo2_avg,
+    avg(rr) AS rr_avg,
+    avg(temp_c) AS temp_avg
+  FROM hakilix.telemetry
+  GROUP BY date_trunc('hour', time), agency_id, resident_id
+"""
+
+
+def _drop(name: str):
+    # A continuous aggregate shows up as a view in pg_class but needs DROP MATERIALIZED VIEW.
+    op.execute(
+        f"""
+DO $$
+DECLARE k "char";
+BEGIN
+  SELECT relkind INTO k FROM pg_class WHERE oid = to_regclass('hakilix.{name}');
+  IF k = 'r' THEN
+    DROP TABLE hakilix.{name};
+  ELSIF k IS NOT NULL THEN
+    BEGIN
+      DROP MATERIALIZED VIEW hakilix.{name} CASCADE;
+    EXCEPTION WHEN others THEN
+      DROP VIEW hakilix.{name};
+    END;
+  END IF;
+END $$;
+"""
+    )
+
+
+def _cagg(name: str, width: str, start: str, end: str, every: str):
+    aggs = ",\n            ".join(
+        f"min({c}) AS {c}_min, max({c}) AS {c}_max, avg({c}) AS {c}_avg, count({c}) AS {c}_count" for c in COLUMNS)
+    op.execute(
+        f"""
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_proc WHERE proname='add_continuous_aggregate_policy') THEN
+    BEGIN
+      EXECUTE $SQL$
+        CREATE MATERIALIZED VIEW IF NOT EXISTS hakilix.{name}
+        WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+          SELECT
+            time_bucket(INTERVAL '{width}', time) AS bucket,
+            agency_id,
+            resident_id,
+            count(*) AS n,
+            {aggs}
+          FROM hakilix.telemetry
+          GROUP BY 1, agency_id, resident_id
+        WITH NO DATA;
+      $SQL$;
+      PERFORM add_continuous_aggregate_policy('hakilix.{name}',
+        start_offset => INTERVAL '{start}', end_offset => INTERVAL '{end}',
+        schedule_interval => INTERVAL '{every}', if_not_exists => TRUE);
+    EXCEPTION WHEN others THEN
+      RAISE NOTICE '{name} continuous aggregate skipped: %', SQLERRM;
+    END;
+  END IF;
+END $$;
+"""
+    )
+
+
+def _table(name: str):
+    cols = ",\n  ".join(
+        f"{c}_min double precision, {c}_max double precision, {c}_sum double precision, "
+        f"{c}_count bigint NOT NULL DEFAULT 0, "
+        f"{c}_avg double precision GENERATED ALWAYS AS ({c}_sum / NULLIF({c}_count, 0)) STORED"
+        for c in COLUMNS)
+    op.execute(
+        f"""
+DO $$
+BEGIN
+  IF to_regclass('hakilix.{name}') IS NULL THEN
+    CREATE TABLE hakilix.{name} (
+      bucket timestamptz NOT NULL,
+      agency_id varchar(64) NOT NULL,
+      resident_id varchar(64) NOT NULL,
+      n bigint NOT NULL,
+      {cols},
+      PRIMARY KEY (agency_id, resident_id, bucket)
+    );
+    CREATE INDEX ix_{name}_bucket ON hakilix.{name} (bucket);
+    ALTER TABLE hakilix.{name} ENABLE ROW LEVEL SECURITY;
+    CREATE POLICY p_{name} ON hakilix.{name}
+      USING (agency_id = current_setting('app.tenant_id', true))
+      WITH CHECK (agency_id = current_setting('app.tenant_id', true));
+  END IF;
+END $$;
+"""
+    )
+
+
+def upgrade():
+    _drop("vitals_1h")
+    for name, (width, start, end, every) in ROLLUPS.items():
+        _cagg(name, width, start, end, every)
+    # Fallback when no continuous aggregate was created (plain Postgres or Timescale refused it).
+    for name in ROLLUPS:
+        _table(name)
+    op.execute(
+        """
+CREATE TABLE IF NOT EXISTS hakilix.rollup_watermarks (
+  name varchar(64) PRIMARY KEY,
+  upto timestamptz NOT NULL,
+  refreshed_at timestamptz NOT NULL
+);
+"""
+    )
+    op.execute("GRANT SELECT, INSERT, UPDATE, DELETE ON ALL TABLES IN SCHEMA hakilix TO hakilix_app;")
+    op.execute("GRANT SELECT ON ALL TABLES IN SCHEMA hakilix TO hakilix_readonly;")
+    for name in ROLLUPS:
+        op.execute(f"GRANT SELECT ON hakilix.{name} TO hakilix_app, hakilix_readonly;")
+
+
+def downgrade():
+    for name in ROLLUPS:
+        _drop(name)
+    op.execute("DROP TABLE IF EXISTS hakilix.rollup_watermarks;")
+    op.execute(VITALS_1H_VIEW + ";")
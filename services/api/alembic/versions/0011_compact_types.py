@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+"""Store telemetry signals and risk scores as ``real`` instead of ``double precision``.
+
+Every value column drops from 8 to 4 bytes (telemetry: 11 columns, risk_events:
+4). Sensor and model precision is far below float4's ~7 significant digits,
+and Postgres prints float4 with the shortest exact representation, so readers
+still see e.g. ``36.6``; writers keep binding Python floats. The
+agency/resident/device ids are left as they are (see
+``python -m hakilix.scripts.bench_storage`` for what integer keys would add).
+
+``ALTER COLUMN TYPE`` rewrites each table under an ACCESS EXCLUSIVE lock: run it
+in a maintenance window. Objects that block the rewrite are handled:
+- the ``vitals_*`` continuous aggregates are dropped and recreated; rebuild
+  their history afterwards with ``python -m hakilix.scripts.rollups rebuild``
+  (plain-Postgres rollup tables do not depend on the column types)
+- Timescale compression is switched off (chunks decompressed) for the rewrite
+  and re-enabled with a 7-day policy; ``storage_policies apply`` re-syncs it
+"""
+
+from alembic import op
+from sqlalchemy import text
+
+
+revision = "0011_compact_types"
+down_revision = "0010_rollups"
+branch_labels = None
+depends_on = None
+
+COLUMNS = {
+    "telemetry": ("hr", "spo2", "rr", "temp_c", "gait_instability", "orthostatic_hypotension", "night_wandering",
+                  "intake_ml", "sleep_fragmentation", "agitation", "toileting_freq"),
+    "risk_events": ("falls_risk", "resp_risk", "dehydration_risk", "delirium_uti_risk"),
+}
+
+# Same definitions as 0010_rollups: name -> (bucket width, policy start_offset, end_offset, schedule_interval)
+ROLLUPS = {
+    "vitals_1m": ("1 minute", "2 hours", "1 minute", "1 minute"),
+    "vitals_1h": ("1 hour", "2 days", "1 hour", "15 minutes"),
+    "vitals_1d": ("1 day", "14 days", "1 day", "1 hour"),
+}
+
+
+def _scalar(sql: str, **params):
+    return op.get_bind().execute(text(sql), params).scalar()
+
+
+def _caggs() -> list[str]:
+    # Continuous aggregates are views in pg_class; the plain-Postgres fallback is tables.
+    return [name for name in ROLLUPS
+            if _scalar("SELECT relkind FROM pg_class WHERE oid = to_regclass(:t)", t=f"hakilix.{name}") == "v"]
+
+
+def _create_cagg(name: str):
+    width, start, end, every = ROLLUPS[name]
+    aggs = ",\n            ".join(
+        f"min({c}) AS {c}_min, max({c}) AS {c}_max, avg({c}) AS {c}_avg, count({c}) AS {c}_count"
+        for c in COLUMNS["telemetry"])
+    op.execute(
+        f"""
+CREATE MATERIALIZED VIEW IF NOT EXISTS hakilix.{name}
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+  SELECT
+    time_bucket(INTERVAL '{width}', time) AS bucket,
+    agency_id,
+    resident_id,
+    count(*) AS n,
+    {aggs}
+  FROM hakilix.telemetry
+  GROUP BY 1, agency_id, resident_id
+WITH NO DATA;
+"""
+    )
+    op.execute(f"SELECT add_continuous_aggregate_policy('hakilix.{name}', start_offset => INTERVAL '{start}', "
+               f"end_offset => INTERVAL '{end}', schedule_interval => INTERVAL '{every}', if_not_exists => TRUE);")
+    op.execute(f"GRANT SELECT ON hakilix.{name} TO hakilix_app, hakilix_readonly;")
+
+
+def _compressed(table: str) -> bool:
+    if not _scalar("SELECT 1 FROM pg_extension WHERE extname='timescaledb'"):
+        return False
+    return bool(_scalar("""
+        SELECT compression_enabled FROM timescaledb_information.hypertables
+        WHERE hypertable_schema='hakilix' AND hypertable_name=:t
+    """, t=table))
+
+
+def _convert(pg_type: str):
+    caggs = _caggs()
+    for name in caggs:
+        op.execute(f"DROP MATERIALIZED VIEW hakilix.{name} CASCADE;")
+    for table, cols in COLUMNS.items():
+        compressed = _compressed(table)
+        if compressed:
+            op.execute(f"SELECT remove_compression_policy('hakilix.{table}', if_exists => TRUE);")
+            op.execute(f"SELECT decompress_chunk(c, if_compressed => TRUE) FROM show_chunks('hakilix.{table}') c;")
+            op.execute(f"ALTER TABLE hakilix.{table} SET (timescaledb.compress = false);")
+        # One statement, so each table is rewritten once.
+        alters = ", ".join(f"ALTER COLUMN {c} TYPE {pg_type}" for c in cols)
+        op.execute(f"ALTER TABLE hakilix.{table} {alters};")
+        if compressed:
+            op.execute(
+                f"ALTER TABLE hakilix.{table} SET (timescaledb.compress, "
+                f"timescaledb.compress_segmentby = 'agency_id, resident_id', timescaledb.compress_orderby = 'time DESC');"
+            )
+            op.execute(f"SELECT add_compression_policy('hakilix.{table}', INTERVAL '7 days', if_not_exists => TRUE);")
+    for name in caggs:
+        _create_cagg(name)
+
+
+def upgrade():
+    _convert("real")
+
+
+def downgrade():
+    _convert("double precision")
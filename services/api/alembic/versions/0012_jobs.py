@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+"""Background jobs and resident tombstones.
+
+``DELETE /v1/residents/{id}`` now sets ``residents.deleted_at`` and queues a
+``resident.delete`` row in ``jobs``; the job deletes the resident's time-series
+rows in small batches and records progress in ``jobs.progress``.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "0012_jobs"
+down_revision = "0011_compact_types"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("residents", sa.Column("deleted_at", sa.DateTime(timezone=True), nullable=True), schema="hakilix")
+
+    op.create_table(
+        "jobs",
+        sa.Column("id", sa.String(64), primary_key=True),
+        sa.Column("agency_id", sa.String(64), sa.ForeignKey("hakilix.agencies.id"), nullable=False),
+        sa.Column("kind", sa.String(64), nullable=False),
+        sa.Column("resource_id", sa.String(64), nullable=False),
+        sa.Column("status", sa.String(16), nullable=False, server_default="queued"),
+        sa.Column("progress", postgresql.JSONB(), nullable=False, server_default=sa.text("'{}'::jsonb")),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("created_by", sa.String(64), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+        sa.CheckConstraint("status IN ('queued', 'running', 'done', 'failed')", name="ck_jobs_status"),
+        schema="hakilix",
+    )
+    op.execute("CREATE INDEX IF NOT EXISTS ix_jobs_agency_created ON hakilix.jobs (agency_id, created_at DESC);")
+    # Resume scans only unfinished jobs.
+    op.execute("CREATE INDEX IF NOT EXISTS ix_jobs_unfinished ON hakilix.jobs (updated_at) WHERE status IN ('queued', 'running');")
+
+    op.execute("ALTER TABLE hakilix.jobs ENABLE ROW LEVEL SECURITY;")
+    op.execute("DROP POLICY IF EXISTS p_jobs ON hakilix.jobs;")
+    op.execute(
+        "CREATE POLICY p_jobs ON hakilix.jobs "
+        "USING (agency_id = current_setting('app.tenant_id', true)) "
+        "WITH CHECK (agency_id = current_setting('app.tenant_id', true));"
+    )
+
+
+def downgrade():
+    op.drop_table("jobs", schema="hakilix")
+    op.drop_column("residents", "deleted_at", schema="hakilix")
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+"""Manifest of telemetry archived to Parquet (``hakilix.scripts.archive``).
+
+One row per Parquet file: ``(agency_id, month)`` identifies the archived UTC
+month, ``path`` the file under ``HAKILIX_ARCHIVE_URI``. A month is served from
+the archive by the read path as soon as it has a row here (``status`` is
+``deleting`` while its Postgres rows are being removed, then ``archived``).
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0013_telemetry_archive"
+down_revision = "0012_jobs"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "telemetry_archive",
+        sa.Column("agency_id", sa.String(64), nullable=False),
+        sa.Column("month", sa.Date(), nullable=False),
+        sa.Column("path", sa.String(512), nullable=False),
+        sa.Column("rows", sa.BigInteger(), nullable=False),
+        sa.Column("bytes", sa.BigInteger(), nullable=True),
+        sa.Column("status", sa.String(16), nullable=False, server_default="deleting"),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("agency_id", "month", "path"),
+        sa.CheckConstraint("status IN ('deleting', 'archived')", name="ck_telemetry_archive_status"),
+        schema="hakilix",
+    )
+    op.execute("ALTER TABLE hakilix.telemetry_archive ENABLE ROW LEVEL SECURITY;")
+    op.execute("DROP POLICY IF EXISTS p_telemetry_archive ON hakilix.telemetry_archive;")
+    op.execute(
+        "CREATE POLICY p_telemetry_archive ON hakilix.telemetry_archive "
+        "USING (agency_id = current_setting('app.tenant_id', true)) "
+        "WITH CHECK (agency_id = current_setting('app.tenant_id', true));"
+    )
+
+
+def downgrade():
+    op.drop_table("telemetry_archive", schema="hakilix")
@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+"""Key alert rules by ``(agency_id, id)``.
+
+Rule ids are chosen by the client (``PUT /v1/alert-rules/{id}``), so two tenants
+may both use e.g. ``falls-high``. With ``id`` alone as the primary key, the second
+tenant's upsert conflicted with a row its RLS policy hides and failed.
+"""
+
+from alembic import op
+
+from hakilix import migrations
+
+
+revision = "0015_alert_rules_tenant_key"
+down_revision = "0014_audit_partitioning"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    migrations.ddl("ALTER TABLE hakilix.alert_rules DROP CONSTRAINT IF EXISTS alert_rules_pkey, "
+                   "ADD CONSTRAINT alert_rules_pkey PRIMARY KEY (agency_id, id)")
+
+
+def downgrade():
+    # Fails if two tenants now share a rule id.
+    op.execute("ALTER TABLE hakilix.alert_rules DROP CONSTRAINT IF EXISTS alert_rules_pkey, "
+               "ADD CONSTRAINT alert_rules_pkey PRIMARY KEY (id);")
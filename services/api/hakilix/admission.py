@@ -0,0 +1,226 @@
+"""Admission control: ingest rate limits per device and agency, priority load shedding.
+
+Rate limits (``POST /v1/telemetry/ingest``) are token buckets, ``rate+burst`` in
+tokens/s and tokens:
+
+- per device (``HAKILIX_RATE_DEVICE``), checked before the device lookup so a
+  flooding device never reaches the database; readings streamed by a gateway
+  (``hakilix.stream_ingest``) use ``HAKILIX_RATE_GATEWAY`` instead
+- per agency (``HAKILIX_RATE_AGENCY``, ``HAKILIX_RATE_AGENCY_OVERRIDES`` per
+  agency id); a device's agency is remembered after its first authenticated
+  request, so from then on both buckets are charged in one check
+
+With ``HAKILIX_RATE_LIMIT_BACKEND=redis`` the buckets live in Redis and are
+shared by every API process: one ``EVALSHA`` checks and charges all buckets
+atomically using the Redis clock. When Redis errors or exceeds
+``HAKILIX_RATE_REDIS_TIMEOUT_S`` the process falls back to in-process buckets for
+``_REDIS_RETRY_S`` (limits then apply per process). ``local`` always uses the
+in-process buckets, ``off`` disables rate limiting.
+
+Load shedding works on the number of requests in flight in this process.
+Every request has a priority (``priority()``): ``read`` (GET), ``write``
+(other methods) or ``ingest``. A priority is refused once in-flight requests
+reach its ``HAKILIX_SHED_INFLIGHT`` threshold, so with ``read`` < ``write`` <
+``ingest`` reads are shed first and ingest last. Health, readiness and
+metrics are never shed. Streaming ingest connections (``STREAMS``) are neither
+shed nor counted: they are long-lived, and their pace is set by the buckets
+(``admit_stream`` charges a group of readings at once) and the write-behind.
+
+Both answer 429 with ``Retry-After``; rejections are counted in
+``hakilix_throttled_total{reason,priority}``.
+"""
+from __future__ import annotations
+import math, threading, time
+from contextlib import contextmanager
+
+from cachetools import LRUCache
+from prometheus_client import Counter, Gauge
+import structlog
+
+from hakilix.config import settings
+
+log = structlog.get_logger(__name__)
+
+READ, WRITE, INGEST = "read", "write", "ingest"
+EXEMPT = frozenset({"/v1/health", "/v1/ready", "/v1/metrics"})
+STREAMS = frozenset({"/v1/telemetry/stream"})
+_REDIS_RETRY_S = 5.0
+
+THROTTLED = Counter("hakilix_throttled_total", "Requests refused with 429", ["reason", "priority"])
+INFLIGHT = Gauge("hakilix_http_inflight", "Requests in flight", multiprocess_mode="livesum")
+RATE_FALLBACK = Counter("hakilix_rate_limit_fallback_total", "Rate-limit checks answered in-process because Redis failed")
+
+class Throttled(Exception):
+    def __init__(self, reason: str, retry_after_s: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after_s = retry_after_s
+
+def _bucket(spec: str) -> tuple[float, float]:
+    rate, _, burst = spec.partition("+")
+    return float(rate), float(burst or rate)
+
+def _overrides(spec: str) -> dict[str, tuple[float, float]]:
+    out = {}
+    for part in spec.split(","):
+        if part.strip():
+            agency_id, _, bucket = part.partition("=")
+            out[agency_id.strip()] = _bucket(bucket.strip())
+    return out
+
+def _shed_limits(spec: str) -> dict[str, int]:
+    out = {READ: 0, WRITE: 0, INGEST: 0}
+    for part in spec.split(","):
+        if part.strip():
+            name, _, n = part.partition("=")
+            out[name.strip()] = int(n)
+    return out
+
+DEVICE = _bucket(settings.hakilix_rate_device)
+GATEWAY = _bucket(settings.hakilix_rate_gateway)
+AGENCY = _bucket(settings.hakilix_rate_agency)
+AGENCY_OVERRIDES = _overrides(settings.hakilix_rate_agency_overrides)
+SHED = _shed_limits(settings.hakilix_shed_inflight)
+
+# --- token buckets -----------------------------------------------------------------
+
+# KEYS: bucket keys; ARGV: cost, then rate (tokens/s) and burst per key. All buckets are
+# charged ``cost`` tokens or none is; returns {0, 0} or {index of the short bucket, retry-after ms}.
+_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local cost = tonumber(ARGV[1])
+local left = {}
+for i, key in ipairs(KEYS) do
+  local rate, burst = tonumber(ARGV[2 * i]) / 1000, tonumber(ARGV[2 * i + 1])
+  local v = redis.call('HMGET', key, 'tokens', 'ts')
+  local tokens = tonumber(v[1]) or burst
+  tokens = math.min(burst, tokens + math.max(0, now - (tonumber(v[2]) or now)) * rate)
+  if tokens < cost then
+    return {i, math.ceil((cost - tokens) / rate)}
+  end
+  left[i] = tokens - cost
+end
+for i, key in ipairs(KEYS) do
+  local rate, burst = tonumber(ARGV[2 * i]) / 1000, tonumber(ARGV[2 * i + 1])
+  redis.call('HSET', key, 'tokens', tostring(left[i]), 'ts', now)
+  redis.call('PEXPIRE', key, math.ceil(burst / rate) + 1000)
+end
+return {0, 0}
+"""
+
+_lock = threading.Lock()
+_local: LRUCache = LRUCache(maxsize=100_000)  # key -> [tokens, monotonic ts]; an evicted bucket restarts full
+_device_agency: LRUCache = LRUCache(maxsize=100_000)
+_redis = {"script": None, "down_until": 0.0}
+
+def _take_local(buckets: list[tuple[str, float, float]], cost: int) -> tuple[int, float]:
+    now = time.monotonic()
+    with _lock:
+        left = []
+        for i, (key, rate, burst) in enumerate(buckets, 1):
+            tokens, ts = _local.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - ts) * rate)
+            if tokens < cost:
+                return i, (cost - tokens) / rate
+            left.append(tokens - cost)
+        for (key, _, _), tokens in zip(buckets, left):
+            _local[key] = (tokens, now)
+    return 0, 0.0
+
+def _script():
+    if _redis["script"] is None:
+        import redis
+        client = redis.Redis.from_url(settings.redis_url, socket_timeout=settings.hakilix_rate_redis_timeout_s,
+                                      socket_connect_timeout=settings.hakilix_rate_redis_timeout_s)
+        _redis["script"] = client.register_script(_LUA)
+    return _redis["script"]
+
+def _take(buckets: list[tuple[str, float, float]], cost: int) -> tuple[int, float]:
+    if settings.hakilix_rate_limit_backend == "redis" and time.monotonic() >= _redis["down_until"]:
+        try:
+            args = [cost] + [x for _, rate, burst in buckets for x in (rate, burst)]
+            i, retry_ms = _script()(keys=[f"hakilix:rl:{key}" for key, _, _ in buckets], args=args)
+            return int(i), int(retry_ms) / 1000
+        except Exception as e:
+            _redis["down_until"] = time.monotonic() + _REDIS_RETRY_S
+            log.warning("rate_limit_redis_unavailable", fallback="local", retry_in_s=_REDIS_RETRY_S, error=repr(e))
+    if settings.hakilix_rate_limit_backend == "redis":
+        RATE_FALLBACK.inc()
+    return _take_local(buckets, cost)
+
+def _charge(buckets: list[tuple[str, str, float, float]], cost: int = 1) -> None:
+    """``buckets``: (reason, key, rate, burst); raises Throttled naming the first short bucket."""
+    if settings.hakilix_rate_limit_backend == "off" or not buckets:
+        return
+    i, retry_s = _take([(key, rate, burst) for _, key, rate, burst in buckets], cost)
+    if i:
+        reason = buckets[i - 1][0]
+        THROTTLED.labels(reason=reason, priority=INGEST).inc()
+        raise Throttled(reason, max(1, math.ceil(retry_s)))
+
+def _agency_bucket(agency_id: str) -> tuple[str, str, float, float]:
+    rate, burst = AGENCY_OVERRIDES.get(agency_id, AGENCY)
+    return "agency", f"a:{agency_id}", rate, burst
+
+def admit_device(device_id: str) -> str | None:
+    """Before the device lookup: charge the device and, if already known, its agency.
+
+    Returns the agency charged (pass it to ``admit_agency``).
+    """
+    # LRUCache.get reorders its links, so reads need the lock as much as writes.
+    with _lock:
+        agency_id = _device_agency.get(device_id)
+    buckets = [("device", f"d:{device_id}", *DEVICE)]
+    if agency_id is not None:
+        buckets.append(_agency_bucket(agency_id))
+    _charge(buckets)
+    return agency_id
+
+def admit_agency(device_id: str, agency_id: str, charged: str | None) -> None:
+    """After the device is authenticated: charge its agency unless ``admit_device`` already did."""
+    if agency_id != charged:
+        with _lock:
+            _device_agency[device_id] = agency_id
+        _charge([_agency_bucket(agency_id)])
+
+def stream_quota(agency_id: str) -> int:
+    """Most readings one ``admit_stream`` call may charge (a bucket never holds more than its burst)."""
+    return max(1, int(min(GATEWAY[1], AGENCY_OVERRIDES.get(agency_id, AGENCY)[1])))
+
+def admit_stream(device_id: str, agency_id: str, n: int) -> None:
+    """Charge ``n`` streamed readings to the gateway's own bucket (``HAKILIX_RATE_GATEWAY``) and its agency."""
+    _charge([("device", f"g:{device_id}", *GATEWAY), _agency_bucket(agency_id)], cost=n)
+
+# --- load shedding -----------------------------------------------------------------
+
+_inflight = [0]
+
+def priority(method: str, path: str) -> str | None:
+    if path in EXEMPT or path in STREAMS:
+        return None
+    if path == "/v1/telemetry/ingest":
+        return INGEST
+    return READ if method in ("GET", "HEAD") else WRITE
+
+def shed(method: str, path: str) -> str | None:
+    """The request's priority if it has to be refused now, else None. Called on the event loop."""
+    prio = priority(method, path)
+    limit = SHED.get(prio, 0) if prio else 0
+    if limit and _inflight[0] >= limit:
+        THROTTLED.labels(reason="shed", priority=prio).inc()
+        return prio
+    return None
+
+@contextmanager
+def in_flight(path: str):
+    if path in STREAMS:
+        yield
+        return
+    _inflight[0] += 1
+    INFLIGHT.inc()
+    try:
+        yield
+    finally:
+        _inflight[0] -= 1
+        INFLIGHT.dec()
@@ -1,27 +1,33 @@
 from __future__ import annotations
-import json, time, uuid
-from datetime import datetime, timezone
+import json, os, time, uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
 from hashlib import sha256
+from itertools import islice
 from typing import Callable
 
 import structlog
-from hakilix.observability import init_logging, init_otel
+from hakilix.observability import init_logging, init_otel, instrument_app
 
-from fastapi import FastAPI, Request, Response, Depends, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Request, Response, Depends, HTTPException, BackgroundTasks, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm, HTTPBearer, HTTPAuthorizationCredentials
-from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client import CollectorRegistry, Counter, Histogram, generate_latest, multiprocess, CONTENT_TYPE_LATEST
 from sqlalchemy import text
 from pydantic import BaseModel
 
 from hakilix.config import settings
-from hakilix.db import db_session
+from hakilix.db import db_session, INGEST, READ
+from hakilix import admission, archive, audit_query, coalesce, jobs, rollups, stream_ingest, warmup
+from hakilix.responses import DuplexStreamingResponse, ORJSONResponse, trusted
 from hakilix.security import verify_password, create_access_token, decode_token
 init_logging("hakilix-api")
 init_otel("hakilix-api")
 log = structlog.get_logger("hakilix-api")
 
-from hakilix.schemas import Problem, TokenResponse, ResidentCreate, ResidentOut, RiskSummary, TelemetryIn
+from hakilix.schemas import (Problem, TokenResponse, ResidentCreate, ResidentOut, RiskSummary, TelemetryIn,
+                             TelemetryRecent, AlertRuleIn, AlertRuleOut, AlertOut, JobOut)
 
 REQ_COUNT = Counter("hakilix_http_requests_total", "HTTP requests", ["method", "path", "status"])
 REQ_LAT = Histogram("hakilix_http_request_seconds", "Request latency", ["path"])
@@ -31,6 +37,11 @@ def problem(status_code: int, title: str, code: str, detail: str | None = None)
     p = Problem(title=title, status=status_code, code=code, detail=detail)
     return JSONResponse(status_code=status_code, content=p.model_dump())
 
+def throttled(code: str, detail: str, retry_after_s: int) -> JSONResponse:
+    resp = problem(429, "Too many requests", code, detail)
+    resp.headers["Retry-After"] = str(retry_after_s)
+    return resp
+
 def get_principal(creds: HTTPAuthorizationCredentials | None = Depends(bearer)) -> dict | None:
     if not creds:
         return None
@@ -71,20 +82,31 @@ def require_role(allowed: set[str]):
         return principal
     return _dep
 
-app = FastAPI(title="Hakilix API", version="1.0.0", redirect_slashes=False)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pools and deferred imports warm up in the background; the first request does not wait for them.
+    warmup.warm_in_background()
+    yield
+    # Write what streaming connections left in the write-behind; the rest was never acked and is resent.
+    await stream_ingest.drain(settings.hakilix_web_graceful_timeout_s)
+
+app = FastAPI(title="Hakilix API", version="1.0.0", redirect_slashes=False, lifespan=lifespan,
+              default_response_class=ORJSONResponse)
 
-from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
-try:
-    FastAPIInstrumentor.instrument_app(app)
-except Exception:
-    pass
+instrument_app(app)
 
 @app.middleware("http")
 async def request_mw(request: Request, call_next: Callable):
     rid = request.headers.get("X-Request-Id") or str(uuid.uuid4())
     start = time.time()
     try:
-        response: Response = await call_next(request)
+        # Over the in-flight threshold of this request's priority: refuse before doing any work.
+        shed = admission.shed(request.method, request.url.path)
+        if shed:
+            response = throttled("overloaded", f"shedding {shed} requests", 1)
+        else:
+            with admission.in_flight(request.url.path):
+                response = await call_next(request)
     finally:
         dur = time.time() - start
         REQ_LAT.labels(path=request.url.path).observe(dur)
@@ -98,14 +120,31 @@ async def http_exc(request: Request, exc: HTTPException):
     if exc.status_code == 401: code = "unauthorized"
     if exc.status_code == 403: code = "forbidden"
     if exc.status_code == 404: code = "not_found"
-    return problem(exc.status_code, "Request failed", code, str(exc.detail))
+    resp = problem(exc.status_code, "Request failed", code, str(exc.detail))
+    resp.headers.update(exc.headers or {})
+    return resp
+
+@app.exception_handler(admission.Throttled)
+async def throttled_exc(request: Request, exc: admission.Throttled):
+    return throttled("rate_limited", f"{exc.reason} rate limit exceeded", exc.retry_after_s)
 
 @app.get("/v1/health")
 def health():
     return {"status":"ok","service":"hakilix_api","time": datetime.now(timezone.utc).isoformat()}
 
+@app.get("/v1/ready")
+def ready():
+    # Readiness: 503 until DB pools and deferred imports are warm, then a DB round trip.
+    ok, body = warmup.ready()
+    return JSONResponse(status_code=200 if ok else 503, content=body)
+
 @app.get("/v1/metrics")
 def metrics():
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        # Under gunicorn: every worker's metrics, not just those of the worker serving this request.
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return Response(content=generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
     return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 @app.post("/v1/auth/token", response_model=TokenResponse)
@@ -136,15 +175,17 @@ def login_json(payload: LoginIn):
 @app.get("/v1/residents", response_model=list[ResidentOut])
 def list_residents(principal: dict = Depends(require_auth)):
     tid = principal["agency_id"]
-    with db_session(tenant_id=tid) as db:
-        rows = db.execute(text("SELECT id, agency_id, display_name, created_at FROM hakilix.residents ORDER BY id")).mappings().all()
-        return [ResidentOut(**dict(r)) for r in rows]
+    with db_session(tenant_id=tid, workload=READ) as db:
+        rows = db.execute(text("SELECT id, agency_id, display_name, created_at FROM hakilix.residents WHERE deleted_at IS NULL ORDER BY id")).mappings().all()
+    return trusted([dict(r) for r in rows], list[ResidentOut])
 
 @app.post("/v1/residents", response_model=ResidentOut)
 def create_resident(payload: ResidentCreate, principal: dict = Depends(require_role({"agency_admin","clinician"}))):
     tid = principal["agency_id"]
     now = datetime.now(timezone.utc)
     with db_session(tenant_id=tid) as db:
+        if db.execute(text("SELECT deleted_at FROM hakilix.residents WHERE id=:id"), {"id": payload.id}).scalar():
+            raise HTTPException(status_code=409, detail="resident_deleting")
         db.execute(text("INSERT INTO hakilix.residents(id, agency_id, display_name, created_at) VALUES (:id,:aid,:dn,:t) ON CONFLICT (id) DO UPDATE SET display_name=EXCLUDED.display_name"),
                    {"id": payload.id, "aid": tid, "dn": payload.display_name, "t": now})
         db.execute(text("INSERT INTO hakilix.audit_log(time, agency_id, actor_user_id, action, resource, resource_id, detail) VALUES (:t,:aid,:uid,'resident.upsert','resident',:rid,:d)"),
@@ -152,40 +193,54 @@ def create_resident(payload: ResidentCreate, principal: dict = Depends(require_r
         row = db.execute(text("SELECT id, agency_id, display_name, created_at FROM hakilix.residents WHERE id=:id"), {"id": payload.id}).mappings().first()
         return ResidentOut(**dict(row))
 
-@app.delete("/v1/residents/{resident_id}")
-def delete_resident(resident_id: str, principal: dict = Depends(require_role({"agency_admin"}))):
+@app.delete("/v1/residents/{resident_id}", status_code=202)
+def delete_resident(resident_id: str, background: BackgroundTasks, response: Response,
+                    principal: dict = Depends(require_role({"agency_admin"}))):
+    # Tombstone now; the time-series rows are deleted in batches by a background job.
     tid = principal["agency_id"]
     now = datetime.now(timezone.utc)
     with db_session(tenant_id=tid) as db:
-        # Ensure resident exists under tenant. If not, return 404.
-        exists = db.execute(text("SELECT id FROM hakilix.residents WHERE id=:id"), {"id": resident_id}).scalar()
-        if not exists:
+        row = db.execute(text("SELECT id, deleted_at FROM hakilix.residents WHERE id=:id"), {"id": resident_id}).mappings().first()
+        if not row:
             raise HTTPException(status_code=404, detail="resident_not_found")
+        job_id = jobs.active(db, jobs.RESIDENT_DELETE, resident_id) if row["deleted_at"] else None
+        if not job_id:
+            db.execute(text("UPDATE hakilix.residents SET deleted_at=:t WHERE id=:id"), {"t": now, "id": resident_id})
+            # Unassign devices right away so no new telemetry lands on the resident.
+            db.execute(text("UPDATE hakilix.devices SET resident_id=NULL WHERE resident_id=:id"), {"id": resident_id})
+            job_id = jobs.create(db, tid, jobs.RESIDENT_DELETE, resident_id, principal["sub"])
+            db.execute(text("INSERT INTO hakilix.audit_log(time, agency_id, actor_user_id, action, resource, resource_id, detail) VALUES (:t,:aid,:uid,'resident.delete_requested','resident',:rid,:d)"),
+                       {"t": now, "aid": tid, "uid": principal["sub"], "rid": resident_id, "d": json.dumps({"job_id": job_id})})
+    # Runs after the response; the audit entry with counts is written when it finishes.
+    background.add_task(jobs.run, job_id, tid)
+    response.headers["Location"] = f"/v1/jobs/{job_id}"
+    return {"status": "accepted", "resident_id": resident_id, "job_id": job_id}
+
+@app.get("/v1/jobs/{job_id}", response_model=JobOut)
+def get_job(job_id: str, principal: dict = Depends(require_auth)):
+    tid = principal["agency_id"]
+    with db_session(tenant_id=tid, workload=READ) as db:
+        job = jobs.get(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="job_not_found")
+    return JobOut(**job)
 
-        # Safe cleanup before deletion:
-        # - Unassign devices (FK safety)
-        # - Remove resident-bound time-series rows (demo hygiene)
-        # - Keep audit history but add a deletion audit entry with counts
-        dev_cnt = db.execute(text("UPDATE hakilix.devices SET resident_id=NULL WHERE resident_id=:id"), {"id": resident_id}).rowcount or 0
-        tel_cnt = db.execute(text("DELETE FROM hakilix.telemetry WHERE resident_id=:id"), {"id": resident_id}).rowcount or 0
-        risk_cnt = db.execute(text("DELETE FROM hakilix.risk_events WHERE resident_id=:id"), {"id": resident_id}).rowcount or 0
-
-        db.execute(text("DELETE FROM hakilix.residents WHERE id=:id"), {"id": resident_id})
-
-        db.execute(
-            text(
-                "INSERT INTO hakilix.audit_log(time, agency_id, actor_user_id, action, resource, resource_id, detail) "
-                "VALUES (:t,:aid,:uid,'resident.delete','resident',:rid,:d)"
-            ),
-            {
-                "t": now,
-                "aid": tid,
-                "uid": principal["sub"],
-                "rid": resident_id,
-                "d": json.dumps({"devices_unassigned": dev_cnt, "telemetry_deleted": tel_cnt, "risk_events_deleted": risk_cnt}),
-            },
-        )
-    return {"status":"deleted","resident_id":resident_id}
+
+def _device_agency(db, dev_id: str, token: str) -> str:
+    # Demo: device auth lives under demo tenant. For multi-tenant production, use mTLS
+    # and/or an edge identity token that includes tenant context.
+    row = db.execute(
+        text("SELECT id, agency_id, state, token_hash FROM hakilix.devices WHERE id=:id"),
+        {"id": dev_id},
+    ).mappings().first()
+
+    if not row:
+        raise HTTPException(status_code=401, detail="unknown_device")
+    if row["state"] not in ("active", "rotated"):
+        raise HTTPException(status_code=403, detail="device_not_active")
+    if row["token_hash"] != sha256(token.encode("utf-8")).hexdigest():
+        raise HTTPException(status_code=401, detail="invalid_device_token")
+    return row["agency_id"]
 
 @app.post("/v1/telemetry/ingest")
 def ingest_telemetry(payload: TelemetryIn, request: Request):
@@ -193,25 +248,11 @@ def ingest_telemetry(payload: TelemetryIn, request: Request):
     token = request.headers.get("X-Device-Token")
     if not dev_id or not token:
         raise HTTPException(status_code=401, detail="device_auth_required")
+    charged = admission.admit_device(dev_id)
 
-    token_hash = sha256(token.encode("utf-8")).hexdigest()
-
-    # Demo: device auth lives under demo tenant. For multi-tenant production, use mTLS
-    # and/or an edge identity token that includes tenant context.
-    with db_session(tenant_id=settings.demo_agency_id) as db:
-        row = db.execute(
-            text("SELECT id, agency_id, state, token_hash FROM hakilix.devices WHERE id=:id"),
-            {"id": dev_id},
-        ).mappings().first()
-
-        if not row:
-            raise HTTPException(status_code=401, detail="unknown_device")
-        if row["state"] not in ("active", "rotated"):
-            raise HTTPException(status_code=403, detail="device_not_active")
-        if row["token_hash"] != token_hash:
-            raise HTTPException(status_code=401, detail="invalid_device_token")
-
-        tid = row["agency_id"]
+    with db_session(tenant_id=settings.demo_agency_id, workload=INGEST) as db:
+        tid = _device_agency(db, dev_id, token)
+        admission.admit_agency(dev_id, tid, charged)
 
         # Route via broker if enabled (Cloud Run / Pub/Sub)
         if settings.broker_type.lower() == "pubsub":
@@ -223,7 +264,7 @@ def ingest_telemetry(payload: TelemetryIn, request: Request):
                 "agency_id": tid,
                 "device_id": dev_id,
                 "telemetry": payload.model_dump(mode="json"),
-            })
+            }, ordering_key=f"{tid}:{payload.resident_id}")
             from hakilix.pipeline import audit
             audit(db, agency_id=tid, actor_device_id=dev_id, action="telemetry.queued", resource="resident", resource_id=payload.resident_id)
             return {"status": "queued"}
@@ -235,33 +276,213 @@ def ingest_telemetry(payload: TelemetryIn, request: Request):
         audit(db, agency_id=tid, actor_device_id=dev_id, action="telemetry.ingest", resource="resident", resource_id=payload.resident_id)
         return {"status": "ok"}
 
+def _open_stream(dev_id: str | None, token: str | None) -> stream_ingest.Conn:
+    # One device check (and one rate-limit token) per connection; readings are charged in groups later.
+    if not dev_id or not token:
+        raise HTTPException(status_code=401, detail="device_auth_required")
+    if settings.broker_type.lower() == "pubsub" and not settings.pubsub_topic:
+        raise HTTPException(status_code=500, detail="pubsub_topic_not_configured")
+    charged = admission.admit_device(dev_id)
+
+    def authenticate() -> str:
+        with db_session(tenant_id=settings.demo_agency_id, workload=INGEST) as db:
+            return _device_agency(db, dev_id, token)
+    tid = authenticate()
+    admission.admit_agency(dev_id, tid, charged)
+    return stream_ingest.Conn(dev_id, tid, authenticate)
+
+@app.post("/v1/telemetry/stream")
+async def ingest_stream(request: Request):
+    # Chunked NDJSON readings in, NDJSON cumulative acks out (see hakilix/stream_ingest.py).
+    conn = await run_in_threadpool(_open_stream, request.headers.get("X-Device-Id"), request.headers.get("X-Device-Token"))
+    acks = (json.dumps(a).encode() + b"\n" async for a in stream_ingest.session(conn, request.stream()))
+    return DuplexStreamingResponse(acks, media_type="application/x-ndjson")
+
+@app.websocket("/v1/telemetry/stream")
+async def ingest_stream_ws(ws: WebSocket):
+    try:
+        conn = await run_in_threadpool(_open_stream, ws.headers.get("X-Device-Id"), ws.headers.get("X-Device-Token"))
+    except HTTPException as e:
+        await ws.close(code=1008, reason=str(e.detail))
+        return
+    except admission.Throttled as e:
+        await ws.close(code=1013, reason=f"{e.reason} rate limit exceeded, retry after {e.retry_after_s}s")
+        return
+    await ws.accept()
+
+    async def lines():
+        async for frame in ws.iter_text():
+            yield frame.encode() + b"\n"
+    try:
+        async for ack in stream_ingest.session(conn, lines()):
+            await ws.send_json(ack)
+        await ws.close()
+    except (WebSocketDisconnect, RuntimeError, OSError):
+        pass  # the gateway closed first; it resends from the last ack it saw
 
 
+
+def _require_resident(db, resident_id: str) -> None:
+    # Tombstoned residents read as gone while their rows are still being deleted (and cached reads
+    # or continuous aggregates would otherwise keep serving them).
+    if not db.execute(text("SELECT 1 FROM hakilix.residents WHERE id=:id AND deleted_at IS NULL"), {"id": resident_id}).scalar():
+        raise HTTPException(status_code=404, detail="resident_not_found")
+
 @app.get("/v1/residents/{resident_id}/latest", response_model=RiskSummary)
 def latest_risk(resident_id: str, principal: dict = Depends(require_auth)):
     tid = principal["agency_id"]
-    with db_session(tenant_id=tid) as db:
-        row = db.execute(text("""
-            SELECT time, resident_id, falls_risk, resp_risk, dehydration_risk, delirium_uti_risk, model_version, explain
-            FROM hakilix.risk_events
-            WHERE resident_id=:rid
-            ORDER BY time DESC
-            LIMIT 1
-        """), {"rid": resident_id}).mappings().first()
-        if not row: raise HTTPException(status_code=404, detail="no_risk_yet")
-        return RiskSummary(**dict(row))
-
-@app.get("/v1/telemetry/{resident_id}/recent")
+    def load():
+        with db_session(tenant_id=tid, workload=READ) as db:
+            _require_resident(db, resident_id)
+            row = db.execute(text("""
+                SELECT time, resident_id, falls_risk, resp_risk, dehydration_risk, delirium_uti_risk, model_version, explain
+                FROM hakilix.risk_events
+                WHERE resident_id=:rid
+                ORDER BY time DESC
+                LIMIT 1
+            """), {"rid": resident_id}).mappings().first()
+            if not row: raise HTTPException(status_code=404, detail="no_risk_yet")
+        return dict(row)
+    return trusted(coalesce.read("latest", (tid, resident_id), load), RiskSummary)
+
+@app.get("/v1/telemetry/{resident_id}/recent", response_model=TelemetryRecent)
 def recent_telemetry(resident_id: str, principal: dict = Depends(require_auth), limit: int = 180):
     tid = principal["agency_id"]
-    with db_session(tenant_id=tid) as db:
-        rows = db.execute(text("""
-            SELECT time, hr, spo2, rr, temp_c,
-                   gait_instability, orthostatic_hypotension, night_wandering,
-                   intake_ml, sleep_fragmentation, agitation, toileting_freq
-            FROM hakilix.telemetry
-            WHERE resident_id=:rid
-            ORDER BY time DESC
-            LIMIT :lim
-        """), {"rid": resident_id, "lim": int(limit)}).mappings().all()
+    def load():
+        with db_session(tenant_id=tid, workload=READ) as db:
+            _require_resident(db, resident_id)
+            rows = db.execute(text("""
+                SELECT time, hr, spo2, rr, temp_c,
+                       gait_instability, orthostatic_hypotension, night_wandering,
+                       intake_ml, sleep_fragmentation, agitation, toileting_freq
+                FROM hakilix.telemetry
+                WHERE resident_id=:rid
+                ORDER BY time DESC
+                LIMIT :lim
+            """), {"rid": resident_id, "lim": int(limit)}).mappings().all()
         return {"resident_id": resident_id, "points": [dict(r) for r in rows]}
+    return trusted(coalesce.read("recent", (tid, resident_id, int(limit)), load), TelemetryRecent, utc_z=False)
+
+def _range_bounds(start: datetime | None, end: datetime | None) -> tuple[datetime, datetime]:
+    end = (end or datetime.now(timezone.utc)).astimezone(timezone.utc)
+    start = (start or end - timedelta(hours=24)).astimezone(timezone.utc)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="invalid_range")
+    return start, end
+
+@app.get("/v1/telemetry/{resident_id}/range")
+def telemetry_range(resident_id: str, principal: dict = Depends(require_auth), start: datetime | None = None,
+                    end: datetime | None = None, limit: int = 5000):
+    # Raw rows oldest first; archived months are read from Parquet.
+    tid = principal["agency_id"]
+    start, end = _range_bounds(start, end)
+    it = archive.iter_range(tid, resident_id, start, end)
+    try:
+        rows = list(islice(it, max(1, min(int(limit), 50000))))
+    finally:
+        it.close()  # releases the open DB session when the limit cut the range short
+    return {"resident_id": resident_id, "points": rows}
+
+@app.get("/v1/telemetry/{resident_id}/export")
+def telemetry_export(resident_id: str, principal: dict = Depends(require_auth), start: datetime | None = None,
+                     end: datetime | None = None):
+    # NDJSON, streamed month by month; archived months are read from Parquet.
+    tid = principal["agency_id"]
+    start, end = _range_bounds(start, end)
+    lines = (json.dumps(r, default=str) + "\n" for r in archive.iter_range(tid, resident_id, start, end))
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+@app.get("/v1/telemetry/{resident_id}/trend")
+def telemetry_trend(resident_id: str, principal: dict = Depends(require_auth), start: datetime | None = None,
+                    end: datetime | None = None, resolution: str = "auto"):
+    # min/max/avg/count per bucket from the 1m/1h/1d rollups; "auto" keeps it to ~500 points.
+    if resolution != "auto" and resolution not in rollups.RESOLUTIONS:
+        raise HTTPException(status_code=400, detail="invalid_resolution")
+    tid = principal["agency_id"]
+    start, end = _range_bounds(start, end)
+    res = rollups.pick_resolution(start, end) if resolution == "auto" else resolution
+    with db_session(tenant_id=tid, workload=READ) as db:
+        _require_resident(db, resident_id)
+        points = rollups.trend(db, tid, resident_id, start, end, res, realtime=settings.hakilix_rollups_realtime)
+    return {"resident_id": resident_id, "resolution": res, "points": points}
+
+@app.get("/v1/audit")
+def audit_log_query(principal: dict = Depends(require_role({"agency_admin"})), resource: str | None = None,
+                    resource_id: str | None = None, action: str | None = None, start: datetime | None = None,
+                    end: datetime | None = None, limit: int = 100, cursor: str | None = None, format: str = "json"):
+    # Newest first, keyset-paginated via next_cursor; format=ndjson streams every matching row.
+    if format not in ("json", "ndjson"):
+        raise HTTPException(status_code=400, detail="invalid_format")
+    tid = principal["agency_id"]
+    filters = {"resource": resource, "resource_id": resource_id, "action": action, "start": start, "end": end}
+    try:
+        if cursor:
+            audit_query.decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid_cursor")
+    if format == "ndjson":
+        lines = (json.dumps(r, default=str) + "\n" for r in audit_query.iter_all(tid, filters, cursor))
+        return StreamingResponse(lines, media_type="application/x-ndjson")
+    with db_session(tenant_id=tid, workload=READ) as db:
+        items, nxt = audit_query.page(db, tid, filters, cursor, max(1, min(int(limit), 1000)))
+    return {"items": items, "next_cursor": nxt}
+
+RULE_COLS = "id, agency_id, name, metric, op, threshold, consecutive, cooldown_s, severity, enabled, created_at, updated_at"
+
+@app.get("/v1/alert-rules", response_model=list[AlertRuleOut])
+def list_alert_rules(principal: dict = Depends(require_auth)):
+    tid = principal["agency_id"]
+    with db_session(tenant_id=tid, workload=READ) as db:
+        rows = db.execute(text(f"SELECT {RULE_COLS} FROM hakilix.alert_rules ORDER BY id")).mappings().all()
+        return [AlertRuleOut(**dict(r)) for r in rows]
+
+@app.put("/v1/alert-rules/{rule_id}", response_model=AlertRuleOut)
+def upsert_alert_rule(rule_id: str, payload: AlertRuleIn, principal: dict = Depends(require_role({"agency_admin","clinician"}))):
+    # Picked up by the alert engine within ALERT_RULES_REFRESH_S.
+    if payload.id != rule_id:
+        raise HTTPException(status_code=400, detail="rule_id_mismatch")
+    tid = principal["agency_id"]
+    now = datetime.now(timezone.utc)
+    with db_session(tenant_id=tid) as db:
+        db.execute(text("""
+            INSERT INTO hakilix.alert_rules(id, agency_id, name, metric, op, threshold, consecutive, cooldown_s, severity, enabled, created_at, updated_at)
+            VALUES (:id,:aid,:name,:metric,:op,:threshold,:consecutive,:cooldown_s,:severity,:enabled,:t,:t)
+            ON CONFLICT (agency_id, id) DO UPDATE SET name=EXCLUDED.name, metric=EXCLUDED.metric, op=EXCLUDED.op,
+                threshold=EXCLUDED.threshold, consecutive=EXCLUDED.consecutive, cooldown_s=EXCLUDED.cooldown_s,
+                severity=EXCLUDED.severity, enabled=EXCLUDED.enabled, updated_at=EXCLUDED.updated_at
+        """), {**payload.model_dump(), "aid": tid, "t": now})
+        db.execute(text("INSERT INTO hakilix.audit_log(time, agency_id, actor_user_id, action, resource, resource_id, detail) VALUES (:t,:aid,:uid,'alert_rule.upsert','alert_rule',:rid,:d)"),
+                   {"t": now, "aid": tid, "uid": principal["sub"], "rid": rule_id, "d": json.dumps(payload.model_dump())})
+        row = db.execute(text(f"SELECT {RULE_COLS} FROM hakilix.alert_rules WHERE id=:id"), {"id": rule_id}).mappings().first()
+        return AlertRuleOut(**dict(row))
+
+@app.delete("/v1/alert-rules/{rule_id}")
+def delete_alert_rule(rule_id: str, principal: dict = Depends(require_role({"agency_admin","clinician"}))):
+    tid = principal["agency_id"]
+    now = datetime.now(timezone.utc)
+    with db_session(tenant_id=tid) as db:
+        n = db.execute(text("DELETE FROM hakilix.alert_rules WHERE id=:id"), {"id": rule_id}).rowcount or 0
+        if not n:
+            raise HTTPException(status_code=404, detail="rule_not_found")
+        db.execute(text("INSERT INTO hakilix.audit_log(time, agency_id, actor_user_id, action, resource, resource_id, detail) VALUES (:t,:aid,:uid,'alert_rule.delete','alert_rule',:rid,NULL)"),
+                   {"t": now, "aid": tid, "uid": principal["sub"], "rid": rule_id})
+    return {"status": "deleted", "rule_id": rule_id}
+
+@app.get("/v1/alerts", response_model=list[AlertOut])
+def list_alerts(principal: dict = Depends(require_auth), resident_id: str | None = None, limit: int = 100):
+    tid = principal["agency_id"]
+    lim = max(1, min(int(limit), 1000))
+    def load():
+        with db_session(tenant_id=tid, workload=READ) as db:
+            if resident_id is not None:
+                _require_resident(db, resident_id)
+            rows = db.execute(text("""
+                SELECT id, time, resident_id, rule_id, metric, value, threshold, severity, model_version, detail
+                FROM hakilix.alerts a
+                WHERE (CAST(:rid AS text) IS NULL OR resident_id = :rid)
+                  AND NOT EXISTS (SELECT 1 FROM hakilix.residents r WHERE r.id = a.resident_id AND r.deleted_at IS NOT NULL)
+                ORDER BY time DESC
+                LIMIT :lim
+            """), {"rid": resident_id, "lim": lim}).mappings().all()
+        return [dict(r) for r in rows]
+    return trusted(coalesce.read("alerts", (tid, resident_id, lim), load), list[AlertOut])
@@ -1,5 +1,5 @@
 from __future__ import annotations
-import os
+import os, sys
 import uvicorn
 
 mode = os.environ.get("HAKILIX_RUN_MODE", "api").lower()
@@ -7,5 +7,10 @@ if mode == "migrate":
     from hakilix.scripts.migrate_and_seed import main
     main()
 else:
+    from hakilix.config import settings
+    if settings.hakilix_web_workers != 1:
+        # N workers under gunicorn (see hakilix/gunicorn_conf.py); replaces this process.
+        os.execvp(sys.executable, [sys.executable, "-m", "gunicorn", "-c", "python:hakilix.gunicorn_conf", "hakilix.app:app"])
     from hakilix.app import app
-    uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get('PORT','8080')))
+    uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get('PORT','8080')),
+                timeout_keep_alive=settings.hakilix_web_keepalive_s, backlog=settings.hakilix_web_backlog)
@@ -0,0 +1,262 @@
+"""Cold-tier Parquet archive for old telemetry.
+
+Files live under ``HAKILIX_ARCHIVE_URI`` (a local directory, or ``s3://`` /
+``gs://`` through ``pyarrow.fs``), one directory per tenant and UTC month:
+
+    telemetry/agency_id=<agency>/month=YYYY-MM/part-<unix ms>.parquet
+
+Rows are sorted by ``(resident_id, time)`` and written in ``ROW_GROUP_ROWS``
+row groups, so the Parquet min/max statistics let resident and time filters
+skip most of a file.
+
+``hakilix.telemetry_archive`` (migration 0013) lists the files, and only listed
+files are read: a part left behind by an interrupted run or purge is ignored
+(and deleted by the next export of that month). For an archived month,
+``iter_range`` merges the Parquet rows with any rows that reached Postgres after
+the export; other months are read from Postgres only.
+pyarrow is imported lazily, so the API runs without it while the archive is off.
+
+``audit_log`` is archived the same way (``audit_log/agency_id=.../month=...``,
+manifest ``hakilix.audit_archive``) on its own schedule; it has no read-through.
+"""
+from __future__ import annotations
+import heapq, time
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from typing import Iterator
+
+from sqlalchemy import text
+import structlog
+
+from hakilix.config import settings
+from hakilix.db import BULK, db_session
+from hakilix.rollups import COLUMNS as SIGNALS
+
+log = structlog.get_logger(__name__)
+
+COLUMNS = ("time", "resident_id", "device_id") + SIGNALS
+AUDIT_COLUMNS = ("id", "time", "actor_user_id", "actor_device_id", "action", "resource", "resource_id", "detail")
+ROW_GROUP_ROWS = 65536
+
+@dataclass(frozen=True)
+class Dataset:
+    table: str  # source table, also the top-level archive directory
+    manifest: str
+    columns: tuple[str, ...]
+    order: str  # sort order inside a file; leading columns get useful row-group statistics
+
+TELEMETRY = Dataset("telemetry", "telemetry_archive", COLUMNS, "resident_id, time")
+AUDIT = Dataset("audit_log", "audit_archive", AUDIT_COLUMNS, "resource, resource_id, time")
+DATASETS = {d.table: d for d in (TELEMETRY, AUDIT)}
+
+def enabled() -> bool:
+    return bool(settings.hakilix_archive_uri)
+
+def filesystem():
+    """(pyarrow FileSystem, root path) for ``HAKILIX_ARCHIVE_URI``."""
+    from pyarrow import fs
+    return fs.FileSystem.from_uri(settings.hakilix_archive_uri)
+
+def _schema(ds: Dataset):
+    import pyarrow as pa
+    ts = pa.timestamp("us", tz="UTC")
+    if ds is AUDIT:
+        return pa.schema([("id", pa.int64()), ("time", ts)] + [(c, pa.string()) for c in AUDIT_COLUMNS[2:]])
+    # float64, not float32: values round-trip exactly as Postgres returns them.
+    return pa.schema([("time", ts), ("resident_id", pa.string()), ("device_id", pa.string())]
+                     + [(c, pa.float64()) for c in SIGNALS])
+
+def month_start(dt: datetime) -> date:
+    dt = dt.astimezone(timezone.utc)
+    return date(dt.year, dt.month, 1)
+
+def month_bounds(month: date) -> tuple[datetime, datetime]:
+    a = datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+    return a, a.replace(year=a.year + a.month // 12, month=a.month % 12 + 1)
+
+def month_dir(root: str, agency_id: str, month: date, table: str = "telemetry") -> str:
+    return f"{root.rstrip('/')}/{table}/agency_id={agency_id}/month={month:%Y-%m}"
+
+_SELECT = f"SELECT {', '.join(COLUMNS)} FROM hakilix.telemetry"
+
+def write_month(c, agency_id: str, month: date, ds: Dataset = TELEMETRY,
+                batch_rows: int = ROW_GROUP_ROWS) -> tuple[str, int, int]:
+    """Export one tenant-month from Postgres to a new Parquet file; returns (path, rows, bytes).
+
+    The file is written under a hidden temporary name, its row count is checked
+    against what was streamed, and only then moved into place.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    fs, root = filesystem()
+    schema = _schema(ds)
+    a, b = month_bounds(month)
+    d = month_dir(root, agency_id, month, ds.table)
+    fs.create_dir(d, recursive=True)
+    name = f"part-{int(time.time() * 1000)}.parquet"
+    tmp, final = f"{d}/.{name}.tmp", f"{d}/{name}"
+    stmt = text(f"SELECT {', '.join(ds.columns)} FROM hakilix.{ds.table} "
+                f"WHERE agency_id=:aid AND time >= :a AND time < :b ORDER BY {ds.order}")
+    result = c.execute(stmt.execution_options(yield_per=batch_rows), {"aid": agency_id, "a": a, "b": b})
+    rows = 0
+    with fs.open_output_stream(tmp) as out, pq.ParquetWriter(out, schema, compression="zstd") as w:
+        for chunk in result.partitions():
+            cols = list(zip(*chunk))
+            w.write_table(pa.Table.from_arrays([pa.array(cols[i], type=f.type) for i, f in enumerate(schema)], schema=schema),
+                          row_group_size=ROW_GROUP_ROWS)
+            rows += len(chunk)
+    with fs.open_input_file(tmp) as f:
+        written = pq.ParquetFile(f).metadata.num_rows
+    if written != rows:
+        fs.delete_file(tmp)
+        raise RuntimeError(f"archive verification failed for {agency_id} {month:%Y-%m}: wrote {written}, expected {rows}")
+    fs.move(tmp, final)
+    return final, rows, fs.get_file_info(final).size
+
+def archived_months(db, agency_id: str, start: datetime, end: datetime) -> dict[date, tuple[bool, list[str]]]:
+    """month -> (export finished, manifest paths) for the tenant's archived months in range."""
+    rows = db.execute(text("""
+        SELECT month, bool_and(status = 'archived'), array_agg(path ORDER BY path) FROM hakilix.telemetry_archive
+        WHERE agency_id=:aid AND month >= :a AND month < :b GROUP BY month
+    """), {"aid": agency_id, "a": month_start(start), "b": end}).all()
+    return {m: (bool(done), list(paths)) for m, done, paths in rows}
+
+def read_archive(paths: list[str], resident_id: str, start: datetime, end: datetime) -> list[dict]:
+    """One resident's rows within [start, end) from the archive files ``paths``, oldest first."""
+    import pyarrow.dataset as ds
+    fs, _ = filesystem()
+    dataset = ds.dataset(paths, filesystem=fs, format="parquet")
+    flt = (ds.field("resident_id") == resident_id) & (ds.field("time") >= start) & (ds.field("time") < end)
+    return dataset.to_table(columns=list(COLUMNS), filter=flt).sort_by("time").to_pylist()
+
+def _read_db(agency_id: str, resident_id: str, start: datetime, end: datetime) -> Iterator[dict]:
+    with db_session(tenant_id=agency_id, workload=BULK) as db:
+        stmt = text(f"{_SELECT} WHERE resident_id=:rid AND time >= :a AND time < :b ORDER BY time")
+        for r in db.execute(stmt.execution_options(yield_per=5000), {"rid": resident_id, "a": start, "b": end}).mappings():
+            yield dict(r)
+
+def iter_range(agency_id: str, resident_id: str, start: datetime, end: datetime) -> Iterator[dict]:
+    """Telemetry rows in [start, end), oldest first, from Parquet for archived months and Postgres otherwise."""
+    with db_session(tenant_id=agency_id, workload=BULK) as db:
+        archived = archived_months(db, agency_id, start, end) if enabled() else {}
+    month = month_start(start)
+    while True:
+        m_a, m_b = month_bounds(month)
+        if m_a >= end:
+            return
+        a, b = max(start, m_a), min(end, m_b)
+        if month not in archived:
+            yield from _read_db(agency_id, resident_id, a, b)
+        else:
+            done, paths = archived[month]
+            cold = read_archive(paths, resident_id, a, b)
+            # While an export is still deleting its rows they are in both tiers; once it is done,
+            # rows in Postgres arrived later and belong to the month too.
+            yield from heapq.merge(cold, _read_db(agency_id, resident_id, a, b), key=lambda r: r["time"]) if done else cold
+        month = m_b.date()
+
+def candidates(c, cutoff: datetime, agency_id: str | None = None, ds: Dataset = TELEMETRY) -> list[tuple[str, date, int]]:
+    """(agency, month, rows in Postgres) for whole UTC months ending on or before ``cutoff``.
+
+    Rows without an agency (possible in audit_log) are never archived.
+    """
+    rows = c.execute(text(f"""
+        SELECT agency_id, CAST(date_trunc('month', time, 'UTC') AS date) AS month, count(*)
+        FROM hakilix.{ds.table}
+        WHERE time < :cut AND agency_id IS NOT NULL AND (CAST(:aid AS text) IS NULL OR agency_id = :aid)
+        GROUP BY 1, 2 ORDER BY 2, 1
+    """), {"cut": cutoff, "aid": agency_id}).all()
+    return [(aid, m, n) for aid, m, n in rows if month_bounds(m)[1] <= cutoff]
+
+def _delete_unlisted(c, agency_id: str, month: date, ds: Dataset) -> None:
+    """Delete part files of the month that the manifest does not list (left by an interrupted export or purge)."""
+    from pyarrow import fs as pafs
+    fs, root = filesystem()
+    listed = {r[0] for r in c.execute(text(f"SELECT path FROM hakilix.{ds.manifest} WHERE agency_id=:aid AND month=:m"),
+                                      {"aid": agency_id, "m": month})}
+    sel = pafs.FileSelector(month_dir(root, agency_id, month, ds.table), allow_not_found=True)
+    for info in fs.get_file_info(sel):
+        if info.type == pafs.FileType.File and info.path.endswith(".parquet") and info.path not in listed:
+            log.warning("archive_delete_unlisted", path=info.path)
+            fs.delete_file(info.path)
+
+def archive_month(c, agency_id: str, month: date, batch_rows: int = 10000, pause_s: float = 0.0,
+                  ds: Dataset = TELEMETRY) -> dict:
+    """Export, verify and delete one tenant-month; safe to re-run after an interruption.
+
+    ``c`` is a migrator connection (no RLS). Rows left by an interrupted delete
+    (status ``deleting``) are already in Parquet and are only deleted; rows that
+    arrived after a month was archived go to a new part file.
+    """
+    a, b = month_bounds(month)
+    p = {"aid": agency_id, "m": month, "a": a, "b": b}
+    status = c.execute(text(f"""
+        SELECT bool_or(status = 'deleting') FROM hakilix.{ds.manifest} WHERE agency_id=:aid AND month=:m
+    """), p).scalar()
+    out = {"agency_id": agency_id, "month": f"{month:%Y-%m}", "exported": 0, "deleted": 0}
+    if not status:
+        _delete_unlisted(c, agency_id, month, ds)
+        path, rows, size = write_month(c, agency_id, month, ds)
+        in_db = c.execute(text(f"SELECT count(*) FROM hakilix.{ds.table} WHERE agency_id=:aid AND time >= :a AND time < :b"),
+                          p).scalar()
+        if in_db != rows:
+            # Rows arrived during the export: leave the month in Postgres and retry next run.
+            fs, _ = filesystem()
+            fs.delete_file(path)
+            c.rollback()
+            return {**out, "skipped": f"{in_db - rows} rows changed during export"}
+        c.execute(text(f"""
+            INSERT INTO hakilix.{ds.manifest}(agency_id, month, path, rows, bytes, status, created_at)
+            VALUES (:aid, :m, :path, :rows, :bytes, 'deleting', now())
+        """), {**p, "path": path, "rows": rows, "bytes": size})
+        c.commit()
+        out.update(exported=rows, path=path, bytes=size)
+    while True:
+        n = c.execute(text(f"""
+            DELETE FROM hakilix.{ds.table} WHERE agency_id=:aid AND time >= :a AND time < :b AND ctid = ANY(ARRAY(
+                SELECT ctid FROM hakilix.{ds.table} WHERE agency_id=:aid AND time >= :a AND time < :b LIMIT :n
+            ))
+        """), {**p, "n": batch_rows}).rowcount or 0
+        c.commit()
+        out["deleted"] += n
+        if n < batch_rows:
+            break
+        if pause_s > 0:
+            time.sleep(pause_s)
+    c.execute(text(f"UPDATE hakilix.{ds.manifest} SET status='archived' WHERE agency_id=:aid AND month=:m"), p)
+    c.commit()
+    return out
+
+def purge_resident(agency_id: str, resident_id: str) -> int:
+    """Rewrite the tenant's archive files without ``resident_id``; returns rows removed.
+
+    Each file is replaced by a new one (manifest updated, then the old file deleted),
+    so an interrupted purge can simply run again.
+    """
+    if not enabled():
+        return 0
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+    fs, _ = filesystem()
+    removed = 0
+    with db_session(tenant_id=agency_id) as db:
+        files = db.execute(text("SELECT month, path FROM hakilix.telemetry_archive WHERE agency_id=:aid"),
+                           {"aid": agency_id}).all()
+    for month, path in files:
+        with fs.open_input_file(path) as f:
+            table = pq.read_table(f)
+        keep = table.filter(pc.not_equal(table["resident_id"], resident_id))
+        if keep.num_rows == table.num_rows:
+            continue
+        new = path.replace(".parquet", f"-r{int(time.time() * 1000)}.parquet")
+        with fs.open_output_stream(new) as out:
+            pq.write_table(keep, out, compression="zstd", row_group_size=ROW_GROUP_ROWS)
+        with db_session(tenant_id=agency_id) as db:
+            db.execute(text("""
+                UPDATE hakilix.telemetry_archive SET path=:new, rows=:rows, bytes=:bytes
+                WHERE agency_id=:aid AND month=:m AND path=:old
+            """), {"new": new, "rows": keep.num_rows, "bytes": fs.get_file_info(new).size, "aid": agency_id,
+                   "m": month, "old": path})
+        fs.delete_file(path)
+        removed += table.num_rows - keep.num_rows
+    return removed
@@ -2,18 +2,18 @@ from __future__ import annotations
 
 import json
 import os
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 import structlog
 
 log = structlog.get_logger()
 
 class Broker:
-    def publish(self, topic: str, message: Dict[str, Any]) -> None:
+    def publish(self, topic: str, message: Dict[str, Any], ordering_key: Optional[str] = None) -> None:
         raise NotImplementedError
 
 class DirectBroker(Broker):
-    def publish(self, topic: str, message: Dict[str, Any]) -> None:
+    def publish(self, topic: str, message: Dict[str, Any], ordering_key: Optional[str] = None) -> None:
         # No-op. Used when API persists directly.
         return
 
@@ -21,12 +21,25 @@ class PubSubBroker(Broker):
     def __init__(self, project_id: str):
         from google.cloud import pubsub_v1
         self.project_id = project_id
-        self.client = pubsub_v1.PublisherClient()
+        # Ordering keys keep each resident's readings in order through the push
+        # worker, which then routes them to the resident's Redis shard stream.
+        self.client = pubsub_v1.PublisherClient(
+            publisher_options=pubsub_v1.types.PublisherOptions(enable_message_ordering=True)
+        )
 
-    def publish(self, topic: str, message: Dict[str, Any]) -> None:
+    def publish(self, topic: str, message: Dict[str, Any], ordering_key: Optional[str] = None) -> None:
         data = json.dumps(message).encode("utf-8")
-        future = self.client.publish(topic, data=data)
-        future.result(timeout=10)
+        if ordering_key:
+            future = self.client.publish(topic, data=data, ordering_key=ordering_key)
+        else:
+            future = self.client.publish(topic, data=data)
+        try:
+            future.result(timeout=10)
+        except Exception:
+            if ordering_key:
+                # A failed publish pauses its ordering key until resumed.
+                self.client.resume_publish(topic, ordering_key)
+            raise
 
 def get_broker() -> Broker:
     if os.getenv("BROKER_TYPE", "direct").lower() != "pubsub":
@@ -0,0 +1,66 @@
+"""Single-flight and micro-cache for tenant-scoped read endpoints.
+
+Dashboards on a ward poll ``/latest`` and ``/recent`` for the same resident every
+few seconds. ``read(endpoint, key, load)`` makes concurrent identical reads share
+one ``load()`` (one DB query): the first caller runs it, callers arriving while
+it is in flight wait for its result (or its exception). A successful result is
+then served from a per-process cache for ``HAKILIX_READ_CACHE_TTL_S`` (0 = only
+coalesce in-flight reads).
+
+Keys always start with the tenant id, so results never cross tenants (the query
+itself still runs under RLS). Results are shared, not copied: callers must not
+mutate them. Each gunicorn worker coalesces on its own.
+"""
+from __future__ import annotations
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable
+
+from cachetools import TTLCache
+from prometheus_client import Counter
+
+from hakilix.config import settings
+
+COALESCE = Counter("hakilix_read_coalesce_total", "Coalesced reads by outcome (query = ran the DB query, "
+                   "shared = waited for an in-flight query, cache = served from the micro-cache)",
+                   ["endpoint", "outcome"])
+
+_lock = threading.Lock()
+_inflight: dict[tuple, Future] = {}
+_cache: TTLCache | None = (TTLCache(maxsize=settings.hakilix_read_cache_max_entries, ttl=settings.hakilix_read_cache_ttl_s)
+                           if settings.hakilix_read_cache_ttl_s > 0 else None)
+
+def read(endpoint: str, key: tuple[Hashable, ...], load: Callable[[], Any]) -> Any:
+    """Return ``load()``, shared with concurrent and recent callers of the same ``(endpoint, key)``.
+
+    ``key`` must start with the tenant id and contain every parameter the result depends on.
+    """
+    if not settings.hakilix_read_coalescing:
+        COALESCE.labels(endpoint=endpoint, outcome="query").inc()
+        return load()
+    k = (endpoint, *key)
+    with _lock:
+        if _cache is not None and k in _cache:
+            COALESCE.labels(endpoint=endpoint, outcome="cache").inc()
+            return _cache[k]
+        fut = _inflight.get(k)
+        leader = fut is None
+        if leader:
+            fut = _inflight[k] = Future()
+    if not leader:
+        COALESCE.labels(endpoint=endpoint, outcome="shared").inc()
+        return fut.result()
+    COALESCE.labels(endpoint=endpoint, outcome="query").inc()
+    try:
+        value = load()
+    except BaseException as e:
+        with _lock:
+            del _inflight[k]
+        fut.set_exception(e)
+        raise
+    with _lock:
+        del _inflight[k]
+        if _cache is not None:
+            _cache[k] = value
+    fut.set_result(value)
+    return value
@@ -1,33 +1,276 @@
+"""Database sessions, with one connection pool per workload.
+
+``db_session(tenant_id, workload=...)`` picks the pool:
+
+- ``default``: API writes and anything that must see the latest data (primary)
+- ``ingest``: telemetry ingest (primary), so dashboard traffic cannot starve it
+- ``read``: interactive GET endpoints
+- ``bulk``: exports and long range scans, kept to a small pool
+
+Pool sizes come from ``HAKILIX_DB_POOLS``. With ``DATABASE_URL_REPLICA`` set,
+``read`` and ``bulk`` sessions use the replica unless it is more than
+``HAKILIX_REPLICA_MAX_LAG_S`` behind, or has not yet replayed the tenant's last
+``default`` write (read-your-writes, checked by WAL position for
+``HAKILIX_REPLICA_RYW_S``); then they fall back to the primary. The tenant's
+last-write position is kept in Redis (``HAKILIX_REPLICA_RYW_BACKEND=redis``) so
+every API worker sees it; while Redis cannot be reached, read sessions go to the
+primary. ``local`` keeps it per process (single-process deployments only).
+Pool usage, checkout waits and routing decisions are Prometheus metrics.
+"""
 from __future__ import annotations
+import threading, time
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from typing import Generator
-from sqlalchemy import create_engine, text
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import TimeoutError as PoolTimeout
 from sqlalchemy.orm import sessionmaker, Session
+import structlog
 from hakilix.config import settings
 
-_engine = None
-_SessionLocal = None
+log = structlog.get_logger(__name__)
+
+DEFAULT, INGEST, READ, BULK = "default", "ingest", "read", "bulk"
+WORKLOADS = (DEFAULT, INGEST, READ, BULK)
+REPLICA_WORKLOADS = (READ, BULK)
+
+# Gauges are updated from pool events (not set_function) so they also work under gunicorn's
+# multiprocess collection, where they are summed over live workers.
+POOL_SIZE = Gauge("hakilix_db_pool_size", "Pool size (persistent connections)", ["pool", "target"],
+                  multiprocess_mode="livesum")
+POOL_CHECKED_OUT = Gauge("hakilix_db_pool_checked_out", "Connections in use", ["pool", "target"],
+                         multiprocess_mode="livesum")
+POOL_OVERFLOW = Gauge("hakilix_db_pool_overflow", "Overflow connections open at the last checkout", ["pool", "target"],
+                      multiprocess_mode="livesum")
+POOL_WAIT = Histogram("hakilix_db_pool_wait_seconds", "Time to check out a connection", ["pool", "target"],
+                      buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10))
+POOL_TIMEOUTS = Counter("hakilix_db_pool_timeouts_total", "Checkouts that timed out", ["pool", "target"])
+READ_ROUTE = Counter("hakilix_db_read_route_total", "read/bulk sessions by target", ["pool", "target", "reason"])
+REPLICA_LAG = Gauge("hakilix_db_replica_lag_seconds", "Replica replay lag as last measured",
+                    multiprocess_mode="livemostrecent")
+
+_lock = threading.Lock()
+_makers: dict[tuple[str, str], sessionmaker] = {}
+_engines: dict[tuple[str, str], object] = {}
+_tenant_lsn: dict[str, tuple[float, str]] = {}  # tenant -> (monotonic time, WAL insert LSN after its last write)
+_lag = {"at": 0.0, "s": None}
+_REDIS_TIMEOUT_S = 0.1
+_REDIS_RETRY_S = 5.0
+_ryw = {"client": None, "script": None, "down_until": 0.0}
+
+# KEYS[1]: the tenant's key; ARGV: LSN, TTL ms. Keeps the highest LSN written by any worker.
+_RYW_LUA = """
+local function pos(lsn)
+  local hi, lo = string.match(lsn, '^(%x+)/(%x+)$')
+  return tonumber(hi, 16) * 4294967296 + tonumber(lo, 16)
+end
+local cur = redis.call('GET', KEYS[1])
+if cur and pos(cur) >= pos(ARGV[1]) then
+  redis.call('PEXPIRE', KEYS[1], ARGV[2])
+else
+  redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+end
+return 1
+"""
+
+def pool_settings() -> dict[str, tuple[int, int]]:
+    """``HAKILIX_DB_POOLS`` parsed to {workload: (pool_size, max_overflow)}; unlisted workloads get 5+5."""
+    out = {w: (5, 5) for w in WORKLOADS}
+    for part in settings.hakilix_db_pools.split(","):
+        if "=" in part:
+            name, spec = part.split("=", 1)
+            size, _, over = spec.partition("+")
+            out[name.strip()] = (int(size), int(over or 0))
+    return out
+
+def _note_write(conn, cursor, statement, parameters, context, executemany):
+    if statement.lstrip()[:6].upper() in ("INSERT", "UPDATE", "DELETE"):
+        conn.info["wrote"] = True
+
+def _watch_pool(eng, workload: str, target: str) -> None:
+    labels = {"pool": workload, "target": target}
+    POOL_SIZE.labels(**labels).set(eng.pool.size())
+    checked_out, overflow = POOL_CHECKED_OUT.labels(**labels), POOL_OVERFLOW.labels(**labels)
+    def _checkout(*_):
+        checked_out.inc()
+        overflow.set(max(0, eng.pool.overflow()))
+    def _checkin(*_):
+        # Fires before the pool takes the connection back, so its own counters are not updated yet.
+        checked_out.dec()
+    event.listen(eng, "checkout", _checkout)
+    event.listen(eng, "checkin", _checkin)
+
+def _maker(workload: str, target: str = "primary") -> sessionmaker:
+    key = (workload, target)
+    if key not in _makers:
+        with _lock:
+            if key not in _makers:
+                size, overflow = pool_settings()[workload]
+                url = settings.database_url_replica if target == "replica" else settings.database_url_app
+                eng = create_engine(url, pool_pre_ping=True, future=True, pool_size=size, max_overflow=overflow,
+                                    pool_timeout=settings.hakilix_db_pool_timeout_s)
+                if workload == DEFAULT and target == "primary":
+                    event.listen(eng, "after_cursor_execute", _note_write)
+                _watch_pool(eng, workload, target)
+                _engines[key] = eng
+                _makers[key] = sessionmaker(bind=eng, autocommit=False, autoflush=False, future=True)
+    return _makers[key]
 
 def engine():
-    global _engine, _SessionLocal
-    if _engine is None:
-        _engine = create_engine(settings.database_url_app, pool_pre_ping=True, future=True)
-        _SessionLocal = sessionmaker(bind=_engine, autocommit=False, autoflush=False, future=True)
-    return _engine
+    """The primary engine of the ``default`` pool."""
+    _maker(DEFAULT)
+    return _engines[(DEFAULT, "primary")]
 
 def session_local():
-    if _SessionLocal is None:
-        engine()
-    return _SessionLocal
+    return _maker(DEFAULT)
+
+def warm_pools(connections: int) -> dict[str, int]:
+    """Open up to ``connections`` per pool (replica pools too) so early requests skip the connect.
+
+    The connections are checked out together and then returned, so they stay idle in the pool.
+    """
+    targets = [(w, "primary") for w in WORKLOADS]
+    if settings.database_url_replica:
+        targets += [(w, "replica") for w in REPLICA_WORKLOADS]
+
+    def _warm(key: tuple[str, str]) -> int:
+        _maker(*key)
+        eng, conns = _engines[key], []
+        try:
+            for _ in range(min(connections, pool_settings()[key[0]][0])):
+                conns.append(eng.connect())
+                conns[-1].execute(text("SELECT 1"))
+        finally:
+            for c in conns:
+                c.close()
+        return len(conns)
+
+    with ThreadPoolExecutor(max_workers=len(targets)) as pool:
+        return {f"{w}/{t}": n for (w, t), n in zip(targets, pool.map(_warm, targets))}
+
+def replica_lag_s() -> float | None:
+    """Replica replay lag in seconds (cached ~2 s); None when there is no replica or it cannot be reached."""
+    if not settings.database_url_replica:
+        return None
+    now = time.monotonic()
+    if now - _lag["at"] < 2.0:
+        return _lag["s"]
+    try:
+        with _maker(READ, "replica")() as db:
+            # An idle primary sends no new WAL, so "time since last replay" only counts while behind.
+            lag = db.execute(text("""
+                SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                            ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0) END
+            """)).scalar()
+        _lag["s"] = float(lag)
+        REPLICA_LAG.set(_lag["s"])
+    except Exception as e:
+        log.warning("replica_lag_check_failed", error=repr(e))
+        _lag["s"] = None
+    _lag["at"] = now
+    return _lag["s"]
+
+def _ryw_client():
+    if _ryw["client"] is None:
+        import redis
+        client = redis.Redis.from_url(settings.redis_url, decode_responses=True, socket_timeout=_REDIS_TIMEOUT_S,
+                                      socket_connect_timeout=_REDIS_TIMEOUT_S)
+        _ryw["script"] = client.register_script(_RYW_LUA)
+        _ryw["client"] = client
+    return _ryw["client"]
+
+def _ryw_down(e: Exception) -> None:
+    _ryw["down_until"] = time.monotonic() + _REDIS_RETRY_S
+    log.warning("ryw_redis_unavailable", fallback="primary", retry_in_s=_REDIS_RETRY_S, error=repr(e))
+
+def _record_write(tenant_id: str, lsn: str) -> None:
+    if settings.hakilix_replica_ryw_backend == "redis":
+        if time.monotonic() >= _ryw["down_until"]:
+            try:
+                _ryw_client()
+                _ryw["script"](keys=[f"hakilix:ryw:{tenant_id}"], args=[lsn, int(settings.hakilix_replica_ryw_s * 1000)])
+            except Exception as e:
+                _ryw_down(e)
+        return
+    _tenant_lsn[tenant_id] = (time.monotonic(), lsn)
+
+def _pending_lsn(tenant_id: str | None) -> tuple[bool, str | None]:
+    """(known, LSN the replica must have replayed); not known when Redis cannot be asked."""
+    if not tenant_id:
+        return True, None
+    if settings.hakilix_replica_ryw_backend == "redis":
+        if time.monotonic() < _ryw["down_until"]:
+            return False, None
+        try:
+            return True, _ryw_client().get(f"hakilix:ryw:{tenant_id}")
+        except Exception as e:
+            _ryw_down(e)
+            return False, None
+    if tenant_id not in _tenant_lsn:
+        return True, None
+    at, lsn = _tenant_lsn[tenant_id]
+    if time.monotonic() - at > settings.hakilix_replica_ryw_s:
+        _tenant_lsn.pop(tenant_id, None)
+        return True, None
+    return True, lsn
+
+def _route(workload: str, tenant_id: str | None) -> tuple[str, str, str | None]:
+    """(target, reason, LSN the replica must have replayed) for a session."""
+    if workload not in REPLICA_WORKLOADS:
+        return "primary", "workload", None
+    if not settings.database_url_replica:
+        return "primary", "no_replica", None
+    lag = replica_lag_s()
+    if lag is None:
+        return "primary", "replica_unavailable", None
+    if lag > settings.hakilix_replica_max_lag_s:
+        return "primary", "replica_lag", None
+    known, lsn = _pending_lsn(tenant_id)
+    if not known:
+        return "primary", "read_your_writes_unknown", None
+    return "replica", "ok", lsn
+
+def _checkout(maker: sessionmaker, workload: str, target: str) -> Session:
+    db = maker()
+    t0 = time.perf_counter()
+    try:
+        db.connection().info.pop("wrote", None)
+    except PoolTimeout:
+        POOL_TIMEOUTS.labels(pool=workload, target=target).inc()
+        db.close()
+        raise
+    POOL_WAIT.labels(pool=workload, target=target).observe(time.perf_counter() - t0)
+    return db
+
+def _open(workload: str, tenant_id: str | None) -> Session:
+    if workload not in WORKLOADS:
+        raise ValueError(f"unknown workload {workload!r}")
+    target, reason, lsn = _route(workload, tenant_id)
+    if target == "replica":
+        db = _checkout(_maker(workload, "replica"), workload, "replica")
+        if lsn is None or db.execute(text("SELECT pg_last_wal_replay_lsn() >= CAST(:l AS pg_lsn)"), {"l": lsn}).scalar():
+            READ_ROUTE.labels(pool=workload, target="replica", reason=reason).inc()
+            return db
+        db.close()
+        target, reason = "primary", "read_your_writes"
+    if workload in REPLICA_WORKLOADS:
+        READ_ROUTE.labels(pool=workload, target="primary", reason=reason).inc()
+    return _checkout(_maker(workload), workload, "primary")
 
 @contextmanager
-def db_session(tenant_id: str | None = None) -> Generator[Session, None, None]:
-    db = session_local()()
+def db_session(tenant_id: str | None = None, workload: str = DEFAULT) -> Generator[Session, None, None]:
+    db = _open(workload, tenant_id)
     try:
         if tenant_id:
             db.execute(text("SELECT set_config('app.tenant_id', :tid, true)"), {"tid": tenant_id})
         yield db
+        wrote = db.connection().info.pop("wrote", False)
         db.commit()
+        if wrote and tenant_id and settings.database_url_replica:
+            # Later read sessions for this tenant wait for the replica to replay past this point.
+            _record_write(tenant_id, db.execute(text("SELECT CAST(pg_current_wal_insert_lsn() AS text)")).scalar())
+            db.rollback()
     except:
         db.rollback()
         raise
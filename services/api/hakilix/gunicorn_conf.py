@@ -0,0 +1,45 @@
+"""Gunicorn settings for multi-worker API serving (``HAKILIX_WEB_WORKERS`` != 1).
+
+    gunicorn -c python:hakilix.gunicorn_conf hakilix.app:app
+
+``hakilix.app_entry`` execs this in API mode. The app is imported once in the
+master and forked (``preload_app``); connection pools are created lazily, so
+every worker opens its own. Workers are recycled after
+``HAKILIX_WEB_MAX_REQUESTS`` (with jitter, so they do not restart together) and
+get ``HAKILIX_WEB_GRACEFUL_TIMEOUT_S`` to finish in-flight requests.
+
+Prometheus metrics are collected across workers through
+``PROMETHEUS_MULTIPROC_DIR``, which must be set before ``prometheus_client`` is
+imported, i.e. here, ahead of the preload. ``/v1/metrics`` then aggregates
+every worker's files; a dead worker's live gauges are dropped, and its counters
+are kept.
+"""
+from __future__ import annotations
+import os, shutil, tempfile
+
+from hakilix.config import settings
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8080')}"
+workers = settings.hakilix_web_workers if settings.hakilix_web_workers > 0 else (os.cpu_count() or 1)
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+max_requests = settings.hakilix_web_max_requests
+max_requests_jitter = max_requests // 10
+timeout = settings.hakilix_web_timeout_s
+graceful_timeout = settings.hakilix_web_graceful_timeout_s
+keepalive = settings.hakilix_web_keepalive_s
+backlog = settings.hakilix_web_backlog
+# The worker heartbeat file; on a disk-backed /tmp a slow fsync can get healthy workers killed.
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+accesslog = None  # requests are logged and counted by the app
+
+_prom_dir = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "hakilix-prom"))
+# Gunicorn re-reads this file on HUP; only the first load may wipe files of the previous run.
+if not os.environ.get("_HAKILIX_PROM_DIR_READY"):
+    shutil.rmtree(_prom_dir, ignore_errors=True)
+    os.makedirs(_prom_dir, exist_ok=True)
+    os.environ["_HAKILIX_PROM_DIR_READY"] = "1"
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
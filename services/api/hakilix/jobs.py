@@ -0,0 +1,116 @@
+"""Background jobs recorded in ``hakilix.jobs`` (currently: resident deletion).
+
+A job row is created in the request transaction and the work runs after the
+response (FastAPI ``BackgroundTasks``). Each batch commits its deletes together
+with the job's progress counters, so a job interrupted by a restart can simply be
+run again (``python -m hakilix.scripts.jobs resume``) and the final counts stay
+exact.
+"""
+from __future__ import annotations
+import json, time, uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+import structlog
+
+from hakilix import archive, rollups
+from hakilix.config import settings
+from hakilix.db import db_session
+
+log = structlog.get_logger(__name__)
+
+RESIDENT_DELETE = "resident.delete"
+# Tables holding per-resident rows, deleted in this order before the resident itself.
+RESIDENT_TABLES = ("telemetry", "risk_events", "alerts")
+
+def create(db, agency_id: str, kind: str, resource_id: str, created_by: str | None) -> str:
+    job_id = uuid.uuid4().hex
+    now = datetime.now(timezone.utc)
+    db.execute(text("""
+        INSERT INTO hakilix.jobs(id, agency_id, kind, resource_id, status, progress, created_by, created_at, updated_at)
+        VALUES (:id, :aid, :kind, :rid, 'queued', '{}'::jsonb, :by, :t, :t)
+    """), {"id": job_id, "aid": agency_id, "kind": kind, "rid": resource_id, "by": created_by, "t": now})
+    return job_id
+
+def get(db, job_id: str) -> dict | None:
+    row = db.execute(text("""
+        SELECT id, agency_id, kind, resource_id, status, progress, error, created_by, created_at, updated_at, finished_at
+        FROM hakilix.jobs WHERE id=:id
+    """), {"id": job_id}).mappings().first()
+    return dict(row) if row else None
+
+def active(db, kind: str, resource_id: str) -> str | None:
+    return db.execute(text("""
+        SELECT id FROM hakilix.jobs WHERE kind=:kind AND resource_id=:rid AND status IN ('queued', 'running')
+        ORDER BY created_at DESC LIMIT 1
+    """), {"kind": kind, "rid": resource_id}).scalar()
+
+def _save(db, job_id: str, progress: dict, status: str = "running", error: str | None = None):
+    db.execute(text("""
+        UPDATE hakilix.jobs SET status=:s, progress=CAST(:p AS jsonb), error=:e, updated_at=now(),
+               finished_at = CASE WHEN :s IN ('done', 'failed') THEN now() END
+        WHERE id=:id
+    """), {"id": job_id, "s": status, "p": json.dumps(progress), "e": error})
+
+def _delete_batch(db, table: str, resident_id: str, n: int) -> int:
+    # ctids repeat across partitions/chunks; the outer resident filter keeps a collision harmless.
+    return db.execute(text(f"""
+        DELETE FROM hakilix.{table} WHERE resident_id=:rid AND ctid = ANY(ARRAY(
+            SELECT ctid FROM hakilix.{table} WHERE resident_id=:rid LIMIT :n
+        ))
+    """), {"rid": resident_id, "n": n}).rowcount or 0
+
+def delete_resident(job: dict, batch_rows: int, pause_s: float) -> dict:
+    """Delete a tombstoned resident's rows ``batch_rows`` at a time, then the resident."""
+    aid, rid, job_id = job["agency_id"], job["resource_id"], job["id"]
+    progress = dict(job.get("progress") or {})
+    with db_session(tenant_id=aid) as db:
+        tables = list(RESIDENT_TABLES) + [rel for rel, _ in rollups.RESOLUTIONS.values()
+                                          if rollups.layout(db, rel) == "table"]
+        _save(db, job_id, progress)
+    for table in tables:
+        key = f"{table}_deleted"
+        while True:
+            with db_session(tenant_id=aid) as db:
+                n = _delete_batch(db, table, rid, batch_rows)
+                progress[key] = progress.get(key, 0) + n
+                _save(db, job_id, progress)
+            if n < batch_rows:
+                break
+            if pause_s > 0:
+                time.sleep(pause_s)
+    if "archive_deleted" not in progress:
+        progress["archive_deleted"] = archive.purge_resident(aid, rid)
+    with db_session(tenant_id=aid) as db:
+        progress["devices_unassigned"] = progress.get("devices_unassigned", 0) + (
+            db.execute(text("UPDATE hakilix.devices SET resident_id=NULL WHERE resident_id=:id"), {"id": rid}).rowcount or 0)
+        db.execute(text("DELETE FROM hakilix.residents WHERE id=:id"), {"id": rid})
+        db.execute(
+            text(
+                "INSERT INTO hakilix.audit_log(time, agency_id, actor_user_id, action, resource, resource_id, detail) "
+                "VALUES (:t,:aid,:uid,'resident.delete','resident',:rid,:d)"
+            ),
+            {"t": datetime.now(timezone.utc), "aid": aid, "uid": job.get("created_by"), "rid": rid,
+             "d": json.dumps({"job_id": job_id, **progress})},
+        )
+        _save(db, job_id, progress, status="done")
+    return progress
+
+HANDLERS = {RESIDENT_DELETE: delete_resident}
+
+def run(job_id: str, agency_id: str) -> None:
+    """Run (or re-run) a job to completion; failures are recorded on the job row."""
+    with db_session(tenant_id=agency_id) as db:
+        job = get(db, job_id)
+    if not job or job["status"] == "done":
+        return
+    t0 = time.time()
+    try:
+        progress = HANDLERS[job["kind"]](job, settings.hakilix_delete_batch_rows, settings.hakilix_delete_pause_s)
+        log.info("job_done", job_id=job_id, kind=job["kind"], resource_id=job["resource_id"],
+                 seconds=round(time.time() - t0, 1), progress=progress)
+    except Exception as e:
+        log.error("job_failed", job_id=job_id, kind=job["kind"], error=repr(e))
+        with db_session(tenant_id=agency_id) as db:
+            cur = get(db, job_id) or job
+            _save(db, job_id, cur.get("progress") or {}, status="failed", error=str(e)[:2000])
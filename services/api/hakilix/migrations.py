@@ -0,0 +1,172 @@
+"""Helpers for Alembic migrations that run against tables under live ingest.
+
+    from hakilix import migrations as m
+
+    def upgrade():
+        m.ddl("ALTER TABLE hakilix.telemetry ADD COLUMN IF NOT EXISTS battery real")
+        m.create_index("ix_telemetry_device_time", "telemetry", "(device_id, time DESC)")
+        m.backfill("telemetry", "battery = 0", "battery IS NULL")
+
+- ``ddl`` runs a statement that needs a strong lock with a short ``lock_timeout``
+  and retries with backoff. A plain ``ALTER TABLE`` waits behind any long query
+  and, while it waits, every insert queues behind it; with the timeout it gives
+  up after ``HAKILIX_MIGRATION_LOCK_TIMEOUT`` instead.
+- ``create_index`` builds without blocking writes: ``CONCURRENTLY`` on a plain
+  table, per partition ``CONCURRENTLY`` then attached on a partitioned one, and
+  one chunk per transaction on a hypertable. An INVALID index left by an
+  interrupted build is dropped and rebuilt.
+- ``backfill`` updates rows in committed batches of ``HAKILIX_MIGRATION_BATCH_ROWS``.
+
+All three run in ``autocommit_block``: whatever the migration did before them is
+committed first, and they commit as they go, so a migration using them must be
+safe to re-run (``IF NOT EXISTS`` and so on). In offline mode
+(``alembic upgrade --sql``, used by ``python -m hakilix.scripts.lock_plan``) they
+emit the SQL they would run instead of inspecting the database.
+"""
+from __future__ import annotations
+import hashlib, time
+
+from alembic import context, op
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+import structlog
+
+from hakilix.config import settings
+
+log = structlog.get_logger(__name__)
+
+LOCK_NOT_AVAILABLE = "55P03"
+
+def _offline() -> bool:
+    return context.is_offline_mode()
+
+def _scalar(sql: str, **params):
+    return op.get_bind().execute(text(sql), params).scalar()
+
+def lock_not_available(e: BaseException) -> bool:
+    return getattr(getattr(e, "orig", None), "sqlstate", None) == LOCK_NOT_AVAILABLE
+
+def _with_lock_timeout(conn, timeout: str):
+    prev = conn.execute(text("SHOW lock_timeout")).scalar()
+    conn.execute(text("SELECT set_config('lock_timeout', :v, false)"), {"v": timeout})
+    return prev
+
+def ddl(sql: str, lock_timeout: str | None = None, retries: int | None = None, backoff_s: float = 0.5) -> None:
+    """Run one DDL statement in its own short transaction, retrying on lock timeout."""
+    lock_timeout = lock_timeout or settings.hakilix_migration_lock_timeout
+    retries = settings.hakilix_migration_retries if retries is None else retries
+    if _offline():
+        op.execute(f"SET lock_timeout = '{lock_timeout}'")
+        op.execute(sql)
+        return
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        prev = _with_lock_timeout(conn, lock_timeout)
+        try:
+            for attempt in range(retries + 1):
+                try:
+                    conn.execute(text(sql))
+                    return
+                except DBAPIError as e:
+                    if not lock_not_available(e) or attempt == retries:
+                        raise
+                    wait = min(backoff_s * 2 ** attempt, 30.0)
+                    log.warning("migration_lock_timeout", lock_timeout=lock_timeout, attempt=attempt + 1,
+                                retry_in_s=wait, sql=sql[:80])
+                    time.sleep(wait)
+        finally:
+            _with_lock_timeout(conn, prev)
+
+def _layout(table: str) -> str:
+    if _scalar("SELECT 1 FROM pg_extension WHERE extname='timescaledb'") and _scalar("""
+        SELECT 1 FROM timescaledb_information.hypertables WHERE hypertable_schema='hakilix' AND hypertable_name=:t
+    """, t=table):
+        return "hypertable"
+    if _scalar("SELECT 1 FROM pg_class WHERE oid = to_regclass(:r) AND relkind = 'p'", r=f"hakilix.{table}"):
+        return "partitioned"
+    return "plain"
+
+def _child_index(name: str, child: str) -> str:
+    full = f"{name}_{child}"
+    # Identifiers are cut at 63 bytes; a hash keeps truncated names unique.
+    return full if len(full) <= 63 else f"{full[:54]}_{hashlib.sha1(full.encode()).hexdigest()[:8]}"
+
+def _drop_invalid(name: str) -> None:
+    if _scalar("""
+        SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.oid = to_regclass(:r) AND NOT i.indisvalid
+    """, r=f"hakilix.{name}"):
+        log.warning("migration_drop_invalid_index", index=f"hakilix.{name}")
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS hakilix.{name}")
+
+def create_index(name: str, table: str, columns: str, unique: bool = False, where: str | None = None) -> None:
+    """Build ``CREATE INDEX name ON hakilix.<table> <columns>`` without blocking writes.
+
+    ``columns`` is the parenthesised column list, e.g. ``"(agency_id, time DESC)"``.
+    A unique index on a partitioned table or hypertable must include ``time``.
+    """
+    u = "UNIQUE " if unique else ""
+    tail = f" WHERE {where}" if where else ""
+    if _offline():
+        op.execute(f"CREATE {u}INDEX CONCURRENTLY IF NOT EXISTS {name} ON hakilix.{table} {columns}{tail}")
+        return
+    layout = _layout(table)
+    children = [r[0] for r in op.get_bind().execute(text("""
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(:r) ORDER BY 1
+    """), {"r": f"hakilix.{table}"})] if layout == "partitioned" else []
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        # Concurrent builds wait for older transactions to finish; a lock timeout there
+        # would only leave an INVALID index behind.
+        prev = _with_lock_timeout(conn, "0")
+        try:
+            if layout == "hypertable":
+                op.execute(f"CREATE {u}INDEX IF NOT EXISTS {name} ON hakilix.{table} {columns}{tail} "
+                           f"WITH (timescaledb.transaction_per_chunk)")
+            elif layout == "partitioned":
+                # The parent index is invalid until every partition's index is attached.
+                op.execute(f"CREATE {u}INDEX IF NOT EXISTS {name} ON ONLY hakilix.{table} {columns}{tail}")
+                for child in children:
+                    idx = _child_index(name, child)
+                    _drop_invalid(idx)
+                    op.execute(f"CREATE {u}INDEX CONCURRENTLY IF NOT EXISTS {idx} ON hakilix.{child} {columns}{tail}")
+                    if not _scalar("SELECT 1 FROM pg_inherits WHERE inhrelid = to_regclass(:r)", r=f"hakilix.{idx}"):
+                        op.execute(f"ALTER INDEX hakilix.{name} ATTACH PARTITION hakilix.{idx}")
+            else:
+                _drop_invalid(name)
+                op.execute(f"CREATE {u}INDEX CONCURRENTLY IF NOT EXISTS {name} ON hakilix.{table} {columns}{tail}")
+        finally:
+            _with_lock_timeout(conn, prev)
+
+def backfill(table: str, set_sql: str, where_sql: str, params: dict | None = None,
+             batch_rows: int | None = None, pause_s: float = 0.05) -> int:
+    """``UPDATE hakilix.<table> SET <set_sql> WHERE <where_sql>`` in committed batches; returns rows updated.
+
+    ``where_sql`` must stop matching a row once it is updated (e.g. ``col IS NULL``),
+    otherwise the loop never ends.
+    """
+    n = batch_rows or settings.hakilix_migration_batch_rows
+    if _offline():
+        op.execute(f"UPDATE hakilix.{table} SET {set_sql} WHERE {where_sql} /* in batches of {n} rows */")
+        return 0
+    # ctids repeat across partitions/chunks; repeating where_sql outside keeps a collision harmless.
+    stmt = text(f"""
+        UPDATE hakilix.{table} SET {set_sql} WHERE ({where_sql}) AND ctid = ANY(ARRAY(
+            SELECT ctid FROM hakilix.{table} WHERE {where_sql} LIMIT :_n
+        ))
+    """)
+    total = 0
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        while True:
+            done = conn.execute(stmt, {**(params or {}), "_n": n}).rowcount or 0
+            total += done
+            if done < n:
+                break
+            if total % (n * 20) == 0:
+                log.info("migration_backfill_progress", table=table, rows=total)
+            if pause_s > 0:
+                time.sleep(pause_s)
+    log.info("migration_backfill_done", table=table, rows=total)
+    return total
@@ -35,29 +35,71 @@ def init_logging(service_name: str) -> None:
     logging.getLogger("uvicorn.access").propagate = True
     logging.getLogger("uvicorn.error").propagate = True
 
+def otel_enabled() -> bool:
+    return os.getenv("OTEL_ENABLED", "true").lower() in ("1", "true", "yes")
+
+def _lazy_exporter():
+    """A span exporter that imports and builds the OTLP exporter on its first export.
+
+    The OTLP exporter pulls in protobuf and its HTTP stack; deferring it moves that
+    cost from process start to the batch processor's background thread.
+    """
+    from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+
+    class LazyOTLPSpanExporter(SpanExporter):
+        def __init__(self):
+            self._exporter = None
+
+        def _get(self):
+            if self._exporter is None:
+                from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+                self._exporter = OTLPSpanExporter()  # uses OTEL_EXPORTER_OTLP_ENDPOINT etc.
+            return self._exporter
+
+        def export(self, spans):
+            try:
+                return self._get().export(spans)
+            except Exception:
+                return SpanExportResult.FAILURE
+
+        def shutdown(self):
+            if self._exporter is not None:
+                self._exporter.shutdown()
+
+        def force_flush(self, timeout_millis: int = 30000) -> bool:
+            return self._exporter.force_flush(timeout_millis) if self._exporter is not None else True
+
+    return LazyOTLPSpanExporter()
+
 def init_otel(service_name: str) -> None:
-    if os.getenv("OTEL_ENABLED", "true").lower() not in ("1", "true", "yes"):
+    if not otel_enabled():
         return
     try:
         from opentelemetry import trace
         from opentelemetry.sdk.resources import Resource
         from opentelemetry.sdk.trace import TracerProvider
         from opentelemetry.sdk.trace.export import BatchSpanProcessor
-        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
-        from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
         from opentelemetry.instrumentation.requests import RequestsInstrumentor
-        from opentelemetry.instrumentation.sqlalchemy import SQLAlchemyInstrumentor
 
         resource = Resource.create({
             "service.name": service_name,
             "deployment.environment": os.getenv("HAKILIX_ENV", os.getenv("HAKILIX_ENVIRONMENT","dev")),
         })
         provider = TracerProvider(resource=resource)
-        exporter = OTLPSpanExporter()  # uses OTEL_EXPORTER_OTLP_ENDPOINT etc.
-        provider.add_span_processor(BatchSpanProcessor(exporter))
+        provider.add_span_processor(BatchSpanProcessor(_lazy_exporter()))
         trace.set_tracer_provider(provider)
 
         RequestsInstrumentor().instrument()
         # FastAPI and SQLAlchemy will be instrumented in app factory when available.
     except Exception as e:
         logging.getLogger(__name__).warning("otel_init_failed", extra={"error": str(e)})
+
+def instrument_app(app) -> None:
+    """FastAPI tracing middleware; the instrumentation package is only imported when OTel is on."""
+    if not otel_enabled():
+        return
+    try:
+        from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+        FastAPIInstrumentor.instrument_app(app)
+    except Exception:
+        pass
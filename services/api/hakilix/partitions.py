@@ -0,0 +1,133 @@
+"""Monthly range partitions for the non-Timescale layout (migration 0009).
+
+Partitions are named ``<table>_pYYYY_MM`` and cover one UTC calendar month; the
+pre-migration rows live in ``<table>_legacy`` (``MINVALUE`` up to the first
+monthly partition). Rows past the last monthly partition land in the
+``<table>_default`` DEFAULT partition; ``ensure_future`` moves them into their
+month's partition when it creates it (``scripts/partitions maintain`` daily keeps
+the default partition empty with the default three months of headroom).
+"""
+from __future__ import annotations
+import re
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+_BOUND_RE = re.compile(r"FROM \((.+?)\) TO \((.+?)\)")
+
+@dataclass
+class Partition:
+    name: str
+    lower: datetime | None  # None = MINVALUE
+    upper: datetime | None  # None = MAXVALUE
+
+def _month_start(dt: datetime) -> datetime:
+    dt = dt.astimezone(timezone.utc)
+    return datetime(dt.year, dt.month, 1, tzinfo=timezone.utc)
+
+def add_month(dt: datetime) -> datetime:
+    return dt.replace(year=dt.year + dt.month // 12, month=dt.month % 12 + 1)
+
+def _bound(raw: str) -> datetime | None:
+    raw = raw.strip()
+    if raw.upper() in ("MINVALUE", "MAXVALUE"):
+        return None
+    return datetime.fromisoformat(raw.strip("'")).astimezone(timezone.utc)
+
+def is_partitioned(c: Connection, table: str) -> bool:
+    return bool(c.execute(text("""
+        SELECT 1 FROM pg_class WHERE oid = to_regclass(:t) AND relkind = 'p'
+    """), {"t": f"hakilix.{table}"}).scalar())
+
+def partitions(c: Connection, table: str) -> list[Partition]:
+    rows = c.execute(text("""
+        SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+        FROM pg_inherits i
+        JOIN pg_class child ON child.oid = i.inhrelid
+        WHERE i.inhparent = CAST(:t AS regclass)
+    """), {"t": f"hakilix.{table}"}).all()
+    out = []
+    for name, bound in rows:
+        m = _BOUND_RE.search(bound or "")
+        if m:
+            out.append(Partition(name, _bound(m.group(1)), _bound(m.group(2))))
+    return sorted(out, key=lambda p: p.lower or datetime.min.replace(tzinfo=timezone.utc))
+
+def ensure_future(c: Connection, table: str, months_ahead: int = 3, now: datetime | None = None) -> list[str]:
+    """Create monthly partitions up to ``months_ahead`` months past the current one."""
+    now = now or datetime.now(timezone.utc)
+    existing = partitions(c, table)
+    uppers = [p.upper for p in existing if p.upper is not None]
+    lower = max(uppers) if uppers else _month_start(now)
+    target = _month_start(now)
+    for _ in range(months_ahead + 1):
+        target = add_month(target)
+    created = []
+    while lower < target:
+        upper = add_month(_month_start(lower))
+        name = f"{table}_p{lower:%Y_%m}"
+        # Brief ACCESS EXCLUSIVE on the parent: don't queue behind long queries.
+        c.execute(text("SET LOCAL lock_timeout = '5s'"))
+        if _default_rows(c, table, lower, upper):
+            _create_from_default(c, table, name, lower, upper)
+        else:
+            c.execute(text(f"CREATE TABLE IF NOT EXISTS hakilix.{name} PARTITION OF hakilix.{table} "
+                           f"FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')"))
+        c.commit()
+        created.append(name)
+        lower = upper
+    return created
+
+def _default_rows(c: Connection, table: str, lower: datetime, upper: datetime) -> bool:
+    if not c.execute(text("SELECT to_regclass(:t)"), {"t": f"hakilix.{table}_default"}).scalar():
+        return False
+    return bool(c.execute(text(f"SELECT 1 FROM hakilix.{table}_default WHERE time >= :l AND time < :u LIMIT 1"),
+                          {"l": lower, "u": upper}).scalar())
+
+def _create_from_default(c: Connection, table: str, name: str, lower: datetime, upper: datetime) -> None:
+    """Create a month's partition that already has rows in the DEFAULT partition, in one transaction.
+
+    Creating it with ``PARTITION OF`` would fail; instead the rows are moved into a
+    standalone table which is then attached (the attach re-checks the default partition).
+    """
+    c.execute(text(f"CREATE TABLE hakilix.{name} (LIKE hakilix.{table} INCLUDING DEFAULTS)"))
+    c.execute(text(f"""
+        WITH moved AS (DELETE FROM hakilix.{table}_default WHERE time >= :l AND time < :u RETURNING *)
+        INSERT INTO hakilix.{name} SELECT * FROM moved
+    """), {"l": lower, "u": upper})
+    c.execute(text(f"ALTER TABLE hakilix.{table} ATTACH PARTITION hakilix.{name} "
+                   f"FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')"))
+
+def drop_expired(c: Connection, table: str, cutoff: datetime) -> list[str]:
+    """Detach and drop partitions entirely older than ``cutoff``.
+
+    Uses ``DETACH ... CONCURRENTLY`` (Postgres 14+, no ACCESS EXCLUSIVE on the
+    parent) and falls back to a plain detach on older servers.
+    """
+    dropped = []
+    for p in partitions(c, table):
+        if p.upper is None or p.upper > cutoff:
+            continue
+        c.commit()
+        try:
+            # CONCURRENTLY cannot run inside a transaction block.
+            with c.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as ac:
+                ac.exec_driver_sql(f"ALTER TABLE hakilix.{table} DETACH PARTITION hakilix.{p.name} CONCURRENTLY")
+        except Exception:
+            c.execute(text("SET LOCAL lock_timeout = '5s'"))
+            c.execute(text(f"ALTER TABLE hakilix.{table} DETACH PARTITION hakilix.{p.name}"))
+            c.commit()
+        c.execute(text(f"DROP TABLE IF EXISTS hakilix.{p.name}"))
+        c.commit()
+        dropped.append(p.name)
+    return dropped
+
+def size_bytes(c: Connection, table: str) -> tuple[int, int]:
+    """(total bytes, partition count) summed over the direct partitions."""
+    row = c.execute(text("""
+        SELECT coalesce(sum(pg_total_relation_size(inhrelid)), 0), count(*)
+        FROM pg_inherits WHERE inhparent = CAST(:t AS regclass)
+    """), {"t": f"hakilix.{table}"}).first()
+    return int(row[0]), int(row[1])
@@ -2,23 +2,25 @@ from __future__ import annotations
 
 import json
 from datetime import datetime, timezone
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, List, Tuple
 
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 
 from hakilix.schemas import TelemetryIn
 
-def persist_telemetry(db: Session, agency_id: str, t: TelemetryIn) -> None:
-    db.execute(text("""
-        INSERT INTO hakilix.telemetry
-        (time, agency_id, resident_id, device_id, hr, spo2, rr, temp_c,
-         gait_instability, orthostatic_hypotension, night_wandering, intake_ml,
-         sleep_fragmentation, agitation, toileting_freq)
-        VALUES
-        (:time, :aid, :rid, :did, :hr, :spo2, :rr, :temp_c,
-         :gait, :oh, :wander, :intake, :sleep, :agit, :toilet)
-    """), {
+_INSERT_TELEMETRY = text("""
+    INSERT INTO hakilix.telemetry
+    (time, agency_id, resident_id, device_id, hr, spo2, rr, temp_c,
+     gait_instability, orthostatic_hypotension, night_wandering, intake_ml,
+     sleep_fragmentation, agitation, toileting_freq)
+    VALUES
+    (:time, :aid, :rid, :did, :hr, :spo2, :rr, :temp_c,
+     :gait, :oh, :wander, :intake, :sleep, :agit, :toilet)
+""")
+
+def _telemetry_params(agency_id: str, t: TelemetryIn) -> Dict[str, Any]:
+    return {
         "time": t.time,
         "aid": agency_id,
         "rid": t.resident_id,
@@ -34,7 +36,15 @@ def persist_telemetry(db: Session, agency_id: str, t: TelemetryIn) -> None:
         "sleep": t.sleep_fragmentation,
         "agit": t.agitation,
         "toilet": t.toileting_freq,
-    })
+    }
+
+def persist_telemetry(db: Session, agency_id: str, t: TelemetryIn) -> None:
+    db.execute(_INSERT_TELEMETRY, _telemetry_params(agency_id, t))
+
+def persist_telemetry_batch(db: Session, agency_id: str, readings: List[TelemetryIn]) -> None:
+    # One executemany (pipelined by psycopg) for the whole batch.
+    if readings:
+        db.execute(_INSERT_TELEMETRY, [_telemetry_params(agency_id, t) for t in readings])
 
 def audit(db: Session, agency_id: str, actor_device_id: str|None, action: str, resource: str, resource_id: str, detail: Dict[str,Any]|None=None) -> None:
     db.execute(text("""
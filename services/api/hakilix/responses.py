@@ -0,0 +1,60 @@
+"""orjson response rendering and the trusted-row fast path for hot read endpoints.
+
+``ORJSONResponse`` is the app's default response class: whatever FastAPI has
+already encoded is rendered by orjson instead of the stdlib encoder.
+
+Endpoints returning rows straight from the database go further with
+``trusted(rows, Model)``: the rows already have the model's columns and types, so
+the model instances, FastAPI's response-model validation and ``jsonable_encoder``
+pass are skipped and the dicts are rendered directly. The route keeps
+``response_model=`` for the OpenAPI schema. ``HAKILIX_VALIDATE_RESPONSES=true``
+validates them against the model anyway (development, contract checks).
+"""
+from __future__ import annotations
+from functools import lru_cache
+from typing import Any
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import TypeAdapter
+
+from hakilix.config import settings
+
+def _default(obj: Any) -> Any:
+    # Types orjson has no native encoding for (Decimal, pydantic models, ...): same output as FastAPI's encoder.
+    return jsonable_encoder(obj)
+
+class ORJSONResponse(JSONResponse):
+    option = orjson.OPT_NON_STR_KEYS
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=self.option)
+
+class _ModelJSONResponse(ORJSONResponse):
+    # pydantic writes UTC datetimes with "Z" where jsonable_encoder on a bare datetime writes "+00:00".
+    option = orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+
+class DuplexStreamingResponse(StreamingResponse):
+    """Streams while the request body is still being read (``/v1/telemetry/stream`` acks).
+
+    Starlette's StreamingResponse reads ``receive`` to watch for a disconnect, which
+    would swallow the rest of the request body; here the endpoint's own reads notice it.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+
+@lru_cache(maxsize=None)
+def _adapter(model: Any) -> TypeAdapter:
+    return TypeAdapter(model)
+
+def trusted(content: Any, model: Any = None, status_code: int = 200, utc_z: bool = True) -> ORJSONResponse:
+    """Render DB rows (plain dicts) that already match ``model`` without re-validating them.
+
+    The body is byte-for-byte what FastAPI produced from the model; ``utc_z=False``
+    keeps "+00:00" for endpoints that used to return the rows as a plain dict.
+    """
+    if model is not None and settings.hakilix_validate_responses:
+        _adapter(model).validate_python(content)
+    return (_ModelJSONResponse if utc_z else ORJSONResponse)(content, status_code=status_code)
@@ -0,0 +1,138 @@
+"""Multi-resolution telemetry rollups (``vitals_1m``, ``vitals_1h``, ``vitals_1d``).
+
+Every telemetry column gets ``<col>_min``, ``<col>_max``, ``<col>_avg`` and
+``<col>_count`` per (bucket, agency_id, resident_id), plus ``n`` readings.
+
+Two layouts, chosen per rollup by migration 0010:
+
+- ``cagg``: TimescaleDB continuous aggregates with refresh policies; real-time
+  aggregation (``timescaledb.materialized_only = false``) merges not-yet-materialized
+  rows at query time. Continuous aggregates have no row-level security, so every
+  query must filter on ``agency_id``.
+- ``table``: plain rollup tables (RLS-enabled) maintained incrementally by
+  ``refresh_tables``: each run recomputes only the buckets from the last watermark
+  (minus ``lateness``) onwards, 1 min from telemetry and 1 h / 1 d from the 1 min
+  rollup. With ``realtime`` the API aggregates raw telemetry past the watermark.
+"""
+from __future__ import annotations
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+
+COLUMNS = ("hr", "spo2", "rr", "temp_c", "gait_instability", "orthostatic_hypotension", "night_wandering",
+           "intake_ml", "sleep_fragmentation", "agitation", "toileting_freq")
+
+# resolution -> (relation, date_trunc unit)
+RESOLUTIONS = {
+    "1m": ("vitals_1m", "minute"),
+    "1h": ("vitals_1h", "hour"),
+    "1d": ("vitals_1d", "day"),
+}
+_WIDTH = {"1m": timedelta(minutes=1), "1h": timedelta(hours=1), "1d": timedelta(days=1)}
+# How many buckets a refresh step covers, bounding each transaction.
+_STEP = {"1m": timedelta(hours=6), "1h": timedelta(days=7), "1d": timedelta(days=90)}
+
+def layout(c, rel: str = "vitals_1m") -> str | None:
+    """"cagg", "table", or None when the rollup does not exist."""
+    kind = c.execute(text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:t)"), {"t": f"hakilix.{rel}"}).scalar()
+    if kind is None:
+        return None
+    return "table" if kind in ("r", b"r") else "cagg"
+
+def _floor(dt: datetime, res: str) -> datetime:
+    dt = dt.astimezone(timezone.utc)
+    if res == "1m":
+        return dt.replace(second=0, microsecond=0)
+    if res == "1h":
+        return dt.replace(minute=0, second=0, microsecond=0)
+    return dt.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def _refresh_sql(res: str, from_raw: bool) -> str:
+    rel, unit = RESOLUTIONS[res]
+    names = ", ".join(f"{c}_min, {c}_max, {c}_sum, {c}_count" for c in COLUMNS)
+    updates = ", ".join(f"{c}_{k} = EXCLUDED.{c}_{k}" for c in COLUMNS for k in ("min", "max", "sum", "count"))
+    if from_raw:
+        aggs = ", ".join(f"min({c}), max({c}), sum({c}), count({c})" for c in COLUMNS)
+        source = f"""
+            SELECT date_trunc('{unit}', time), agency_id, resident_id, count(*), {aggs}
+            FROM hakilix.telemetry WHERE time >= :a AND time < :b
+            GROUP BY 1, agency_id, resident_id"""
+    else:
+        aggs = ", ".join(f"min({c}_min), max({c}_max), sum({c}_sum), sum({c}_count)" for c in COLUMNS)
+        source = f"""
+            SELECT date_trunc('{unit}', bucket), agency_id, resident_id, sum(n), {aggs}
+            FROM hakilix.vitals_1m WHERE bucket >= :a AND bucket < :b
+            GROUP BY 1, agency_id, resident_id"""
+    return f"""
+        INSERT INTO hakilix.{rel} (bucket, agency_id, resident_id, n, {names})
+        {source}
+        ON CONFLICT (agency_id, resident_id, bucket) DO UPDATE SET n = EXCLUDED.n, {updates}
+    """
+
+def refresh_tables(c, lateness: timedelta = timedelta(minutes=10), now: datetime | None = None) -> dict[str, int]:
+    """Recompute rollup-table buckets from each watermark (minus ``lateness``) up to now.
+
+    Whole buckets are recomputed and upserted, so late rows within ``lateness`` are
+    picked up and re-running a range is harmless. ``c`` must bypass RLS (migrator).
+    """
+    now = now or datetime.now(timezone.utc)
+    out: dict[str, int] = {}
+    minute_table = layout(c) == "table"
+    for res in ("1m", "1h", "1d"):
+        rel = RESOLUTIONS[res][0]
+        if layout(c, rel) != "table":
+            continue
+        # 1 h / 1 d roll up from the 1 min table when there is one, else from telemetry.
+        from_raw = res == "1m" or not minute_table
+        wm = c.execute(text("SELECT upto FROM hakilix.rollup_watermarks WHERE name=:n"), {"n": rel}).scalar()
+        if wm is None:
+            src = "SELECT min(time) FROM hakilix.telemetry" if from_raw else "SELECT min(bucket) FROM hakilix.vitals_1m"
+            wm = c.execute(text(src)).scalar() or now
+        a = _floor(wm - lateness, res)
+        sql = text(_refresh_sql(res, from_raw))
+        rows = 0
+        while a < now:
+            b = min(a + _STEP[res], _floor(now, res) + _WIDTH[res])
+            c.execute(text("SET LOCAL TIME ZONE 'UTC'"))
+            rows += c.execute(sql, {"a": a, "b": b}).rowcount or 0
+            c.execute(text("""
+                INSERT INTO hakilix.rollup_watermarks(name, upto, refreshed_at) VALUES (:n, :u, now())
+                ON CONFLICT (name) DO UPDATE SET upto = EXCLUDED.upto, refreshed_at = EXCLUDED.refreshed_at
+            """), {"n": rel, "u": min(b, now)})
+            c.commit()
+            a = b
+        out[rel] = rows
+    return out
+
+def pick_resolution(start: datetime, end: datetime, max_points: int = 500) -> str:
+    span = end - start
+    for res in ("1m", "1h", "1d"):
+        if span / _WIDTH[res] <= max_points:
+            return res
+    return "1d"
+
+def trend(db, agency_id: str, resident_id: str, start: datetime, end: datetime, res: str,
+          realtime: bool = True) -> list[dict]:
+    """Rollup rows for one resident in [start, end), oldest first."""
+    rel, unit = RESOLUTIONS[res]
+    cols = ", ".join(f"{c}_min, {c}_max, {c}_avg, {c}_count" for c in COLUMNS)
+    params = {"aid": agency_id, "rid": resident_id, "a": start, "b": end}
+    q = f"""
+        SELECT bucket, n, {cols} FROM hakilix.{rel}
+        WHERE agency_id = :aid AND resident_id = :rid AND bucket >= :a AND bucket < :b
+    """
+    if realtime and layout(db, rel) == "table":
+        # Past the watermark the table may lag: aggregate raw telemetry for the tail.
+        wm = db.execute(text("SELECT upto FROM hakilix.rollup_watermarks WHERE name=:n"), {"n": rel}).scalar()
+        split = _floor(wm, res) if wm else start
+        params["s"] = split
+        raw = ", ".join(f"min({c}), max({c}), avg({c}), count({c})" for c in COLUMNS)
+        q = f"""
+            {q} AND bucket < :s
+            UNION ALL
+            SELECT date_trunc('{unit}', time, 'UTC'), count(*), {raw} FROM hakilix.telemetry
+            WHERE agency_id = :aid AND resident_id = :rid AND time >= greatest(CAST(:a AS timestamptz), :s) AND time < :b
+            GROUP BY 1
+        """
+    rows = db.execute(text(f"SELECT * FROM ({q}) r ORDER BY bucket"), params).mappings().all()
+    return [dict(r) for r in rows]
@@ -1,5 +1,6 @@
 from __future__ import annotations
 from datetime import datetime
+from typing import Literal
 from pydantic import BaseModel, Field
 
 class Problem(BaseModel):
@@ -40,6 +41,24 @@ class TelemetryIn(BaseModel):
     agitation: float | None = None
     toileting_freq: float | None = None
 
+class TelemetryPoint(BaseModel):
+    time: datetime
+    hr: float | None = None
+    spo2: float | None = None
+    rr: float | None = None
+    temp_c: float | None = None
+    gait_instability: float | None = None
+    orthostatic_hypotension: float | None = None
+    night_wandering: float | None = None
+    intake_ml: float | None = None
+    sleep_fragmentation: float | None = None
+    agitation: float | None = None
+    toileting_freq: float | None = None
+
+class TelemetryRecent(BaseModel):
+    resident_id: str
+    points: list[TelemetryPoint]
+
 class RiskSummary(BaseModel):
     time: datetime
     resident_id: str
@@ -49,3 +68,45 @@ class RiskSummary(BaseModel):
     delirium_uti_risk: float
     model_version: str
     explain: str | None = None
+
+AlertMetric = Literal["falls_risk", "resp_risk", "dehydration_risk", "delirium_uti_risk",
+                      "hr", "spo2", "rr", "temp_c", "intake_ml"]
+
+class AlertRuleIn(BaseModel):
+    id: str = Field(..., min_length=2, max_length=64)
+    name: str = Field(..., min_length=2, max_length=255)
+    metric: AlertMetric
+    op: Literal[">", ">=", "<", "<="]
+    threshold: float
+    consecutive: int = Field(1, ge=1, le=1000)
+    cooldown_s: int = Field(3600, ge=0)
+    severity: Literal["low", "medium", "high", "critical"] = "high"
+    enabled: bool = True
+
+class AlertRuleOut(AlertRuleIn):
+    agency_id: str
+    created_at: datetime
+    updated_at: datetime
+
+class AlertOut(BaseModel):
+    id: int
+    time: datetime
+    resident_id: str
+    rule_id: str
+    metric: str
+    value: float
+    threshold: float
+    severity: str
+    model_version: str | None = None
+    detail: str | None = None
+
+class JobOut(BaseModel):
+    id: str
+    kind: str
+    resource_id: str
+    status: Literal["queued", "running", "done", "failed"]
+    progress: dict
+    error: str | None = None
+    created_at: datetime
+    updated_at: datetime
+    finished_at: datetime | None = None
@@ -0,0 +1,71 @@
+"""Archive old telemetry or audit log rows to Parquet (cold tier).
+
+    python -m hakilix.scripts.archive list [--dataset telemetry|audit_log]
+    python -m hakilix.scripts.archive run [--dataset telemetry|audit_log] [--older-than-days 90] [--agency A-001]
+                                          [--batch-rows 10000] [--pause-s 0.1] [--dry-run]
+
+``run`` exports every whole UTC month older than ``--older-than-days`` (default
+``HAKILIX_ARCHIVE_AFTER_DAYS`` for telemetry, ``HAKILIX_AUDIT_ARCHIVE_AFTER_DAYS``
+for the audit log) per tenant to ``HAKILIX_ARCHIVE_URI``, checks the file's row
+count against Postgres, records it in the dataset's manifest and then deletes the
+month's rows in batches. Re-running resumes interrupted months. The rollups are
+not touched, so long-range trends keep working after the raw telemetry is gone.
+
+Runs as the migrator role so row-level security does not hide other tenants' rows.
+"""
+from __future__ import annotations
+import argparse, json, time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine, text
+
+from hakilix import archive
+from hakilix.config import settings
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p_list = sub.add_parser("list")
+    p_run = sub.add_parser("run")
+    for p in (p_list, p_run):
+        p.add_argument("--dataset", choices=sorted(archive.DATASETS), default="telemetry")
+    p_run.add_argument("--older-than-days", type=int, default=None)
+    p_run.add_argument("--agency", default=None)
+    p_run.add_argument("--batch-rows", type=int, default=10000)
+    p_run.add_argument("--pause-s", type=float, default=0.0, help="sleep between delete batches")
+    p_run.add_argument("--dry-run", action="store_true", help="only list the months that would be archived")
+    args = ap.parse_args()
+
+    ds = archive.DATASETS[args.dataset]
+    eng = create_engine(settings.database_url_migrator or settings.database_url_app, future=True, pool_pre_ping=True)
+    if args.cmd == "list":
+        with eng.connect() as c:
+            rows = c.execute(text(f"""
+                SELECT agency_id, month, status, count(*) AS files, sum(rows) AS rows, sum(bytes) AS bytes
+                FROM hakilix.{ds.manifest} GROUP BY 1, 2, 3 ORDER BY 2, 1
+            """)).mappings().all()
+        for r in rows:
+            print(json.dumps(dict(r), default=str))
+        return
+
+    if not archive.enabled() and not args.dry_run:
+        raise SystemExit("HAKILIX_ARCHIVE_URI is not set")
+    days = args.older_than_days
+    if days is None:
+        days = settings.hakilix_audit_archive_after_days if ds is archive.AUDIT else settings.hakilix_archive_after_days
+    if days <= 0:
+        raise SystemExit(f"archiving {ds.table} is disabled (0 days)")
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    with eng.connect() as c:
+        todo = archive.candidates(c, cutoff, args.agency, ds)
+        c.rollback()
+        for agency_id, month, n in todo:
+            if args.dry_run:
+                print(json.dumps({"dataset": ds.table, "agency_id": agency_id, "month": f"{month:%Y-%m}", "rows": n}))
+                continue
+            t0 = time.time()
+            res = archive.archive_month(c, agency_id, month, args.batch_rows, args.pause_s, ds)
+            print(json.dumps({**res, "seconds": round(time.time() - t0, 1)}))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Ward-dashboard load test: DB queries behind /latest and /recent with and without read coalescing.
+
+    python -m hakilix.scripts.bench_coalescing [--modes off,0,1] [--sessions 60] [--residents R-001,...,R-010]
+                                               [--poll-s 2] [--duration-s 30] [--token JWT] [--port 18082]
+
+Each mode starts the API locally (``hakilix.app_entry``, one process unless
+``--workers``) against the configured database: ``off`` sets
+``HAKILIX_READ_COALESCING=false``, a number keeps coalescing on with that
+``HAKILIX_READ_CACHE_TTL_S``. ``--sessions`` simulated dashboards, spread over
+the residents, each poll ``/v1/residents/{id}/latest`` and
+``/v1/telemetry/{id}/recent`` every ``--poll-s`` (with jitter). The DB queries
+the endpoints ran are read from ``hakilix_read_coalesce_total`` on
+``/v1/metrics``. One JSON line per mode: requests, queries, queries per request,
+requests/s, p50/p95 latency and errors.
+
+Needs a migrated, seeded database (``HAKILIX_RUN_MODE=migrate``); without
+``--token`` one is minted for the demo agency.
+"""
+from __future__ import annotations
+import argparse, http.client, json, os, random, signal, subprocess, sys, threading, time
+from collections import defaultdict
+
+from prometheus_client.parser import text_string_to_metric_families
+
+from hakilix.config import settings
+
+def _wait_ready(port: int, timeout_s: float = 60.0) -> None:
+    deadline = time.time() + timeout_s
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/v1/ready")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise SystemExit(f"API did not become ready on port {port}")
+
+def _coalesce_counts(port: int) -> dict[str, float]:
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    conn.request("GET", "/v1/metrics")
+    body = conn.getresponse().read().decode()
+    out: dict[str, float] = defaultdict(float)
+    for fam in text_string_to_metric_families(body):
+        if fam.name == "hakilix_read_coalesce":
+            for s in fam.samples:
+                if s.name.endswith("_total"):
+                    out[s.labels["outcome"]] += s.value
+    return out
+
+def _session(port: int, token: str, rid: str, poll_s: float, deadline: float, lat: list[float], errors: list[int]):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    headers = {"Authorization": f"Bearer {token}"}
+    time.sleep(random.uniform(0, poll_s))
+    while time.time() < deadline:
+        tick = time.time()
+        for path in (f"/v1/residents/{rid}/latest", f"/v1/telemetry/{rid}/recent"):
+            t0 = time.perf_counter()
+            try:
+                conn.request("GET", path, headers=headers)
+                resp = conn.getresponse()
+                resp.read()
+                # 404 no_risk_yet is a valid answer for a resident without risk events.
+                if resp.status >= 400 and resp.status != 404:
+                    errors[0] += 1
+                else:
+                    lat.append(time.perf_counter() - t0)
+            except (OSError, http.client.HTTPException):
+                errors[0] += 1
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        time.sleep(max(0.0, poll_s * random.uniform(0.9, 1.1) - (time.time() - tick)))
+    conn.close()
+
+def bench(mode: str, args, token: str) -> dict:
+    env = {**os.environ, "HAKILIX_RUN_MODE": "api", "HAKILIX_WEB_WORKERS": str(args.workers), "PORT": str(args.port),
+           "OTEL_ENABLED": os.environ.get("OTEL_ENABLED", "false"), "LOG_LEVEL": "WARNING"}
+    if mode == "off":
+        env["HAKILIX_READ_COALESCING"] = "false"
+    else:
+        env.update(HAKILIX_READ_COALESCING="true", HAKILIX_READ_CACHE_TTL_S=mode)
+    server = subprocess.Popen([sys.executable, "-m", "hakilix.app_entry"], env=env)
+    try:
+        _wait_ready(args.port)
+        before = _coalesce_counts(args.port)
+        residents = [r for r in args.residents.split(",") if r.strip()]
+        lat: list[float] = []
+        errors = [0]
+        t0 = time.time()
+        ts = [threading.Thread(target=_session, args=(args.port, token, residents[i % len(residents)], args.poll_s,
+                                                      t0 + args.duration_s, lat, errors)) for i in range(args.sessions)]
+        for t in ts:
+            t.start()
+        for t in ts:
+            t.join()
+        elapsed = time.time() - t0
+        after = _coalesce_counts(args.port)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+    counts = {k: after[k] - before.get(k, 0.0) for k in after}
+    requests = len(lat) + errors[0]
+    lat.sort()
+    pct = lambda p: round(lat[min(len(lat) - 1, int(len(lat) * p))] * 1000, 2) if lat else 0.0
+    return {"mode": "off" if mode == "off" else f"coalesce+cache {mode}s", "sessions": args.sessions,
+            "residents": len(residents), "requests": requests, "queries": int(counts.get("query", 0)),
+            "shared": int(counts.get("shared", 0)), "cached": int(counts.get("cache", 0)),
+            "queries_per_request": round(counts.get("query", 0) / requests, 3) if requests else None,
+            "rps": round(requests / elapsed, 1), "p50_ms": pct(0.50), "p95_ms": pct(0.95), "errors": errors[0]}
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--modes", default="off,0,1", help="off, or a cache TTL in seconds (0 = in-flight sharing only)")
+    ap.add_argument("--sessions", type=int, default=60, help="simulated dashboard sessions")
+    ap.add_argument("--residents", default=",".join(f"R-{i:03d}" for i in range(1, 11)))
+    ap.add_argument("--poll-s", type=float, default=2.0)
+    ap.add_argument("--duration-s", type=float, default=30.0)
+    ap.add_argument("--workers", type=int, default=1)
+    ap.add_argument("--token", default=None)
+    ap.add_argument("--port", type=int, default=18082)
+    args = ap.parse_args()
+    if args.token:
+        token = args.token
+    else:
+        from hakilix.security import create_access_token
+        token = create_access_token(subject="U-001", agency_id=settings.demo_agency_id, role="clinician")
+    base = None
+    for mode in [m.strip() for m in args.modes.split(",") if m.strip()]:
+        res = bench(mode, args, token)
+        base = base or res["queries_per_request"]
+        res["query_reduction"] = round(1 - res["queries_per_request"] / base, 3) if base else None
+        print(json.dumps(res), flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Per-endpoint response serialisation cost: FastAPI response-model path vs. the trusted orjson path.
+
+    python -m hakilix.scripts.bench_serialization [--residents 200] [--recent 180,1000] [--explain-chars 600]
+                                                  [--iterations 2000]
+
+Builds DB-shaped rows for ``GET /v1/residents``, ``/v1/residents/{id}/latest`` and
+``/v1/telemetry/{id}/recent`` and times, per response, what each path does after
+the query returns:
+
+- ``before``: pydantic models from the rows (``ResidentOut(**row)``), FastAPI's
+  ``serialize_response`` through the route's response model (validation and
+  ``jsonable_encoder``) and the stdlib ``JSONResponse``
+- ``after``: ``hakilix.responses.trusted`` on the row dicts (orjson)
+
+Both bodies are checked to be byte-identical before timing. One JSON line per endpoint and
+payload size with the median microseconds per response and the speed-up. No
+database or server is needed.
+"""
+from __future__ import annotations
+import argparse, asyncio, json, random, statistics, time
+from datetime import datetime, timedelta, timezone
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute, serialize_response
+
+from hakilix.app import app
+from hakilix.responses import trusted
+from hakilix.schemas import ResidentOut, RiskSummary, TelemetryRecent
+
+SIGNALS = ("hr", "spo2", "rr", "temp_c", "gait_instability", "orthostatic_hypotension", "night_wandering",
+           "intake_ml", "sleep_fragmentation", "agitation", "toileting_freq")
+
+def _residents(n: int) -> list[dict]:
+    t = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return [{"id": f"res-{i:05d}", "agency_id": "agency-demo", "display_name": f"Resident {i} Example-Surname",
+             "created_at": t + timedelta(minutes=i, microseconds=i)} for i in range(n)]
+
+def _latest(explain_chars: int) -> dict:
+    return {"time": datetime.now(timezone.utc), "resident_id": "res-00001", "falls_risk": 0.4132, "resp_risk": 0.0871,
+            "dehydration_risk": 0.2215, "delirium_uti_risk": 0.1309, "model_version": "risk-v3.2.1",
+            "explain": ("gait_instability↑ night_wandering↑ intake_ml↓ " * explain_chars)[:explain_chars]}
+
+def _recent(n: int) -> dict:
+    rnd = random.Random(n)
+    t = datetime.now(timezone.utc)
+    points = []
+    for i in range(n):
+        p = {"time": t - timedelta(seconds=10 * i)}
+        for s in SIGNALS:
+            p[s] = None if rnd.random() < 0.1 else round(rnd.uniform(0, 120), 3)
+        points.append(p)
+    return {"resident_id": "res-00001", "points": points}
+
+def _field(path: str):
+    return next(r for r in app.routes if isinstance(r, APIRoute) and r.path == path).response_field
+
+async def _before(content, field, model) -> bytes:
+    if model is not None:
+        content = [model(**r) for r in content] if isinstance(content, list) else model(**content)
+    encoded = await serialize_response(field=field, response_content=content, is_coroutine=True)
+    return JSONResponse(encoded).body
+
+def _after(content, model, utc_z: bool) -> bytes:
+    return trusted(content, model, utc_z=utc_z).body
+
+async def _median_us(fn, iterations: int) -> float:
+    samples = []
+    for _ in range(5):
+        t0 = time.perf_counter()
+        for _ in range(iterations):
+            await fn()
+        samples.append((time.perf_counter() - t0) / iterations * 1e6)
+    return statistics.median(samples)
+
+async def run(args) -> None:
+    cases = [("/v1/residents", args.residents, _residents(args.residents), _field("/v1/residents"), ResidentOut,
+              list[ResidentOut], True)]
+    cases.append(("/v1/residents/{id}/latest", 1, _latest(args.explain_chars),
+                  _field("/v1/residents/{resident_id}/latest"), RiskSummary, RiskSummary, True))
+    # /recent had no response model before; FastAPI only ran jsonable_encoder over the dict.
+    cases += [("/v1/telemetry/{id}/recent", n, _recent(n), None, None, TelemetryRecent, False)
+              for n in [int(x) for x in args.recent.split(",") if x.strip()]]
+    for path, rows, content, field, model, schema, utc_z in cases:
+        old = await _before(content, field, model)
+        new = _after(content, schema, utc_z)
+        if old != new:
+            raise SystemExit(f"{path}: response bodies differ")
+        iterations = max(10, args.iterations // max(1, rows // 50))
+        before = await _median_us(lambda: _before(content, field, model), iterations)
+
+        async def after():
+            return _after(content, schema, utc_z)
+        after_us = await _median_us(after, iterations)
+        print(json.dumps({"endpoint": path, "rows": rows, "bytes": len(new), "before_us": round(before, 1),
+                          "after_us": round(after_us, 1), "speedup": round(before / after_us, 2)}), flush=True)
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--residents", type=int, default=200, help="rows in the /v1/residents payload")
+    ap.add_argument("--recent", default="180,1000", help="comma-separated /recent point counts (180 = default limit)")
+    ap.add_argument("--explain-chars", type=int, default=600)
+    ap.add_argument("--iterations", type=int, default=2000)
+    asyncio.run(run(ap.parse_args()))
+
+if __name__ == "__main__":
+    main()
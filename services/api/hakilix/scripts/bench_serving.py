@@ -0,0 +1,108 @@
+"""Throughput of the API served by one uvicorn process vs. gunicorn with N workers.
+
+    python -m hakilix.scripts.bench_serving [--workers 1,2,4] [--path /v1/health] [--token JWT]
+                                            [--clients 64] [--client-procs 4] [--duration-s 15] [--port 18080]
+
+For each entry of ``--workers`` the API is started locally through
+``hakilix.app_entry`` with ``HAKILIX_WEB_WORKERS`` set (1 = the single uvicorn
+process, N = gunicorn with N uvicorn workers), warmed up, and then loaded by
+``--clients`` keep-alive connections spread over ``--client-procs`` processes
+for ``--duration-s``. One JSON line per mode: requests/s, p50/p95/p99 latency and
+errors. ``--path`` with ``--token`` exercises a DB-backed endpoint (e.g.
+``/v1/residents``); the default ``/v1/health`` measures the serving stack alone.
+
+Run it on the instance size you deploy to, leaving cores for the clients.
+"""
+from __future__ import annotations
+import argparse, http.client, json, os, signal, subprocess, sys, threading, time
+from multiprocessing import Pool
+
+def _client(args: tuple) -> tuple[int, int, list[float]]:
+    port, path, token, threads, deadline = args
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    lat: list[list[float]] = [[] for _ in range(threads)]
+    errors = [0] * threads
+
+    def run(i: int):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        while time.time() < deadline:
+            t0 = time.perf_counter()
+            try:
+                conn.request("GET", path, headers=headers)
+                resp = conn.getresponse()
+                resp.read()
+                if resp.status >= 400:
+                    errors[i] += 1
+                else:
+                    lat[i].append(time.perf_counter() - t0)
+            except (OSError, http.client.HTTPException):
+                errors[i] += 1
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        conn.close()
+
+    ts = [threading.Thread(target=run, args=(i,)) for i in range(threads)]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    samples = [x for l in lat for x in l]
+    return len(samples), sum(errors), samples
+
+def _wait_ready(port: int, timeout_s: float = 60.0) -> None:
+    deadline = time.time() + timeout_s
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/v1/health")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise SystemExit(f"API did not become ready on port {port}")
+
+def _pct(xs: list[float], p: float) -> float:
+    return round(xs[min(len(xs) - 1, int(len(xs) * p))] * 1000, 2) if xs else 0.0
+
+def bench(workers: int, args) -> dict:
+    env = {**os.environ, "HAKILIX_RUN_MODE": "api", "HAKILIX_WEB_WORKERS": str(workers), "PORT": str(args.port),
+           "OTEL_ENABLED": os.environ.get("OTEL_ENABLED", "false"), "LOG_LEVEL": "WARNING"}
+    server = subprocess.Popen([sys.executable, "-m", "hakilix.app_entry"], env=env, start_new_session=True)
+    try:
+        _wait_ready(args.port)
+        procs = max(1, args.client_procs)
+        per = max(1, args.clients // procs)
+        with Pool(procs) as pool:
+            pool.map(_client, [(args.port, args.path, args.token, per, time.time() + 2)] * procs)  # warm-up
+            t0 = time.time()
+            results = pool.map(_client, [(args.port, args.path, args.token, per, t0 + args.duration_s)] * procs)
+            elapsed = time.time() - t0
+    finally:
+        server.send_signal(signal.SIGTERM)  # the gunicorn master stops its workers gracefully
+        server.wait(timeout=60)
+    ok = sum(r[0] for r in results)
+    lat = sorted(x for r in results for x in r[2])
+    return {"workers": workers, "mode": "uvicorn" if workers == 1 else "gunicorn", "clients": per * procs,
+            "path": args.path, "requests": ok, "errors": sum(r[1] for r in results),
+            "rps": round(ok / elapsed, 1), "p50_ms": _pct(lat, 0.50), "p95_ms": _pct(lat, 0.95), "p99_ms": _pct(lat, 0.99)}
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--workers", default=f"1,{os.cpu_count() or 2}", help="comma-separated worker counts to compare")
+    ap.add_argument("--path", default="/v1/health")
+    ap.add_argument("--token", default=None, help="bearer token for authenticated paths")
+    ap.add_argument("--clients", type=int, default=64, help="concurrent keep-alive connections")
+    ap.add_argument("--client-procs", type=int, default=4)
+    ap.add_argument("--duration-s", type=float, default=15.0)
+    ap.add_argument("--port", type=int, default=18080)
+    args = ap.parse_args()
+    base = None
+    for w in [int(x) for x in args.workers.split(",") if x.strip()]:
+        res = bench(w, args)
+        base = base or res["rps"]
+        res["speedup"] = round(res["rps"] / base, 2) if base else None
+        print(json.dumps(res), flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Telemetry row-layout benchmark: bytes per row, ingest rate and index size.
+
+    python -m hakilix.scripts.bench_storage [--rows 200000] [--batch 1000] [--uuid-ids] [--keep]
+
+Loads the same synthetic telemetry into scratch tables (``hakilix.bench_tel_*``)
+that differ only in column types, with the telemetry indexes, and prints one
+JSON line per layout:
+
+- ``double``: 0001_init layout (``double precision`` signals)
+- ``real``: 0011_compact_types layout (``real`` signals)
+- ``real_intkeys``: ``real`` plus integer agency/resident/device keys (the
+  surrogate-key option, measured but not adopted)
+- ``scaled_smallint``: signals as fixed-point ``smallint`` (measured but not adopted)
+
+``--uuid-ids`` uses 36-character ids instead of the demo's short ``R-0001`` style,
+which is where integer keys pay off most. Tables are dropped afterwards unless
+``--keep``. Runs as the migrator role.
+"""
+from __future__ import annotations
+import argparse, json, random, time, uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine, text
+
+from hakilix.config import settings
+
+SIGNALS = ("hr", "spo2", "rr", "temp_c", "gait_instability", "orthostatic_hypotension", "night_wandering",
+           "intake_ml", "sleep_fragmentation", "agitation", "toileting_freq")
+# Fixed-point scale for the smallint layout (all values fit in +-32767 after scaling).
+SCALE = {"hr": 10, "spo2": 10, "rr": 10, "temp_c": 100, "gait_instability": 10000, "orthostatic_hypotension": 10000,
+         "night_wandering": 10000, "intake_ml": 1, "sleep_fragmentation": 10000, "agitation": 10000, "toileting_freq": 100}
+
+# layout -> (id column type, signal column type)
+LAYOUTS = {
+    "double": ("varchar(64)", "double precision"),
+    "real": ("varchar(64)", "real"),
+    "real_intkeys": ("integer", "real"),
+    "scaled_smallint": ("varchar(64)", "smallint"),
+}
+
+def _rows(n: int, residents: int, uuid_ids: bool) -> list[dict]:
+    rnd = random.Random(7)
+    ids = [(str(uuid.UUID(int=rnd.getrandbits(128))) if uuid_ids else f"R-{i:04d}") for i in range(residents)]
+    devs = [(str(uuid.UUID(int=rnd.getrandbits(128))) if uuid_ids else f"D-{i:04d}") for i in range(residents)]
+    agency = str(uuid.UUID(int=rnd.getrandbits(128))) if uuid_ids else "A-001"
+    t0 = datetime.now(timezone.utc) - timedelta(seconds=n // residents * 5)
+    out = []
+    for i in range(n):
+        k = i % residents
+        out.append({
+            "time": t0 + timedelta(seconds=(i // residents) * 5), "agency_id": agency, "resident_id": ids[k],
+            "device_id": devs[k], "agency_key": 1, "resident_key": k + 1, "device_key": k + 1,
+            "hr": rnd.gauss(72, 6), "spo2": round(rnd.uniform(93, 99), 1), "rr": rnd.gauss(16, 2),
+            "temp_c": rnd.gauss(36.8, 0.3), "gait_instability": rnd.random(), "orthostatic_hypotension": rnd.random(),
+            "night_wandering": rnd.random(), "intake_ml": rnd.uniform(0, 400), "sleep_fragmentation": rnd.random(),
+            "agitation": rnd.random(), "toileting_freq": rnd.uniform(0, 12),
+        })
+    return out
+
+def _params(layout: str, rows: list[dict]) -> list[dict]:
+    if layout == "real_intkeys":
+        return [{**r, "agency_id": r["agency_key"], "resident_id": r["resident_key"], "device_id": r["device_key"]}
+                for r in rows]
+    if layout == "scaled_smallint":
+        return [{**r, **{s: round(r[s] * SCALE[s]) for s in SIGNALS}} for r in rows]
+    return rows
+
+def bench(eng, layout: str, rows: list[dict], batch: int, keep: bool) -> dict:
+    id_t, sig_t = LAYOUTS[layout]
+    name = f"bench_tel_{layout}"
+    fq = f"hakilix.{name}"
+    sigs = ", ".join(f"{s} {sig_t}" for s in SIGNALS)
+    with eng.begin() as c:
+        c.execute(text(f"DROP TABLE IF EXISTS {fq}"))
+        c.execute(text(f"""CREATE TABLE {fq} (time timestamptz NOT NULL, agency_id {id_t} NOT NULL,
+                           resident_id {id_t} NOT NULL, device_id {id_t} NOT NULL, {sigs})"""))
+        # Same indexes as hakilix.telemetry.
+        for col in ("time", "agency_id", "resident_id", "device_id"):
+            c.execute(text(f"CREATE INDEX ix_{name}_{col} ON {fq} ({col})"))
+        c.execute(text(f"CREATE INDEX ix_{name}_art ON {fq} (agency_id, resident_id, time DESC)"))
+    cols = ("time", "agency_id", "resident_id", "device_id") + SIGNALS
+    ins = text(f"INSERT INTO {fq} ({', '.join(cols)}) VALUES ({', '.join(':' + c for c in cols)})")
+    params = _params(layout, rows)
+    t0 = time.perf_counter()
+    for i in range(0, len(params), batch):
+        with eng.begin() as c:
+            c.execute(ins, params[i:i + batch])
+    elapsed = time.perf_counter() - t0
+    with eng.connect().execution_options(isolation_level="AUTOCOMMIT") as ac:
+        ac.execute(text(f"VACUUM ANALYZE {fq}"))
+        heap = ac.execute(text("SELECT pg_relation_size(CAST(:t AS regclass))"), {"t": fq}).scalar()
+        idx = ac.execute(text("SELECT pg_indexes_size(CAST(:t AS regclass))"), {"t": fq}).scalar()
+        tuple_b = ac.execute(text(f"SELECT avg(pg_column_size(b.*)) FROM (SELECT * FROM {fq} LIMIT 10000) b")).scalar()
+        if not keep:
+            ac.execute(text(f"DROP TABLE {fq}"))
+    n = len(rows)
+    return {"layout": layout, "rows": n, "ingest_rows_per_s": round(n / elapsed),
+            "tuple_bytes": round(float(tuple_b), 1), "heap_bytes_per_row": round(heap / n, 1),
+            "index_bytes_per_row": round(idx / n, 1), "heap_mb": round(heap / 1e6, 1), "index_mb": round(idx / 1e6, 1)}
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--rows", type=int, default=200000)
+    ap.add_argument("--residents", type=int, default=200)
+    ap.add_argument("--batch", type=int, default=1000)
+    ap.add_argument("--layouts", default=",".join(LAYOUTS))
+    ap.add_argument("--uuid-ids", action="store_true")
+    ap.add_argument("--keep", action="store_true", help="leave the scratch tables in place")
+    args = ap.parse_args()
+
+    eng = create_engine(settings.database_url_migrator or settings.database_url_app, future=True, pool_pre_ping=True)
+    rows = _rows(args.rows, args.residents, args.uuid_ids)
+    base = None
+    for layout in args.layouts.split(","):
+        res = bench(eng, layout, rows, args.batch, args.keep)
+        if base is None:
+            base = res
+        res["heap_vs_first"] = round(res["heap_bytes_per_row"] / base["heap_bytes_per_row"], 3)
+        res["index_vs_first"] = round(res["index_bytes_per_row"] / base["index_bytes_per_row"], 3)
+        print(json.dumps(res))
+
+if __name__ == "__main__":
+    main()
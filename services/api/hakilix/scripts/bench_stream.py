@@ -0,0 +1,89 @@
+"""Gateway ingest throughput: one request per reading vs. one streaming connection.
+
+    python -m hakilix.scripts.bench_stream [--api http://localhost:8080] [--readings 5000] [--sensors 40]
+                                           [--concurrency 8] [--device-id D-001] [--device-token TOKEN]
+
+Sends ``--readings`` readings from ``--sensors`` simulated sensors behind one
+gateway device, first as ``POST /v1/telemetry/ingest`` requests (keep-alive,
+``--concurrency`` connections), then as one chunked NDJSON
+``POST /v1/telemetry/stream``. For each, it prints readings/s and, for the
+stream, the final cumulative ack, which must cover every line.
+
+Needs a running API with a migrated, seeded database. The demo device token is
+derived the way ``migrate_and_seed`` creates it unless ``--device-token`` is
+given. Raise ``HAKILIX_RATE_DEVICE`` / ``HAKILIX_RATE_GATEWAY`` /
+``HAKILIX_RATE_AGENCY`` on the API first, or the buckets set the pace.
+"""
+from __future__ import annotations
+import argparse, json, threading, time
+from datetime import datetime, timedelta, timezone
+from hashlib import sha256
+from http.client import HTTPConnection
+from urllib.parse import urlparse
+
+from hakilix.config import settings
+
+def _readings(n: int, sensors: int) -> list[bytes]:
+    t0 = datetime.now(timezone.utc) - timedelta(seconds=n)
+    residents = [f"R-{i:03d}" for i in range(1, 11)]
+    return [json.dumps({"resident_id": residents[i % len(residents)], "device_id": f"S-{i % sensors:03d}",
+                        "time": (t0 + timedelta(milliseconds=i)).isoformat(), "hr": 60 + i % 40,
+                        "spo2": 94 + i % 5, "rr": 12 + i % 8}).encode() for i in range(n)]
+
+def per_request(url, headers: dict, lines: list[bytes], concurrency: int) -> dict:
+    errors = [0]
+    chunks = [lines[i::concurrency] for i in range(concurrency)]
+
+    def run(part: list[bytes]):
+        conn = HTTPConnection(url.hostname, url.port or 80, timeout=30)
+        for body in part:
+            conn.request("POST", "/v1/telemetry/ingest", body=body, headers={**headers, "Content-Type": "application/json"})
+            resp = conn.getresponse()
+            resp.read()
+            if resp.status != 200:
+                errors[0] += 1
+        conn.close()
+    t0 = time.perf_counter()
+    ts = [threading.Thread(target=run, args=(c,)) for c in chunks]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    return {"mode": "request_per_reading", "readings": len(lines), "concurrency": concurrency, "errors": errors[0],
+            "seconds": round(elapsed, 2), "readings_per_s": round(len(lines) / elapsed, 1)}
+
+def streamed(url, headers: dict, lines: list[bytes]) -> dict:
+    conn = HTTPConnection(url.hostname, url.port or 80, timeout=300)
+    t0 = time.perf_counter()
+    conn.request("POST", "/v1/telemetry/stream", body=(line + b"\n" for line in lines),
+                 headers={**headers, "Content-Type": "application/x-ndjson"}, encode_chunked=True)
+    resp = conn.getresponse()
+    acks = [json.loads(x) for x in resp.read().splitlines() if x.strip()]
+    elapsed = time.perf_counter() - t0
+    final = acks[-1] if acks else {}
+    return {"mode": "stream", "readings": len(lines), "status": resp.status, "acks": len(acks), "final_ack": final,
+            "complete": final.get("acked") == len(lines) and "error" not in final,
+            "seconds": round(elapsed, 2), "readings_per_s": round(len(lines) / elapsed, 1)}
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--api", default="http://localhost:8080")
+    ap.add_argument("--readings", type=int, default=5000)
+    ap.add_argument("--sensors", type=int, default=40)
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--device-id", default=settings.demo_device_id)
+    ap.add_argument("--device-token", default=None)
+    args = ap.parse_args()
+    token = args.device_token or "devtok_" + sha256((settings.demo_device_id + settings.demo_agency_id).encode("utf-8")).hexdigest()[:24]
+    headers = {"X-Device-Id": args.device_id, "X-Device-Token": token}
+    url = urlparse(args.api)
+    lines = _readings(args.readings, args.sensors)
+    base = per_request(url, headers, lines, args.concurrency)
+    print(json.dumps(base), flush=True)
+    res = streamed(url, headers, lines)
+    res["speedup"] = round(res["readings_per_s"] / base["readings_per_s"], 2) if base["readings_per_s"] else None
+    print(json.dumps(res), flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Background job maintenance.
+
+    python -m hakilix.scripts.jobs list [--all]
+    python -m hakilix.scripts.jobs resume [--stale-s 300] [--include-failed] [--every-s 60]
+
+``resume`` re-runs jobs left ``queued``/``running`` with no progress for
+``--stale-s`` seconds, and optionally ``failed`` ones. Jobs start as FastAPI
+background tasks, which die with their worker (gunicorn recycling it, SIGTERM on
+deploy); ``--every-s`` keeps ``resume`` running as the ``hakilix-jobs`` compose
+service so such jobs finish without an operator. Jobs are idempotent, so
+re-running a live job only costs a few empty batches.
+
+Jobs are listed as the migrator role (all tenants); each one then runs
+tenant-scoped through the app role, like the API does.
+"""
+from __future__ import annotations
+import argparse, json, time
+
+from sqlalchemy import create_engine, text
+
+from hakilix import jobs
+from hakilix.config import settings
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p_list = sub.add_parser("list")
+    p_list.add_argument("--all", action="store_true", help="include finished jobs")
+    p_res = sub.add_parser("resume")
+    p_res.add_argument("--stale-s", type=float, default=300.0)
+    p_res.add_argument("--include-failed", action="store_true")
+    p_res.add_argument("--every-s", type=float, default=0.0, help="repeat forever at this interval")
+    args = ap.parse_args()
+
+    eng = create_engine(settings.database_url_migrator or settings.database_url_app, future=True, pool_pre_ping=True)
+    if args.cmd == "list":
+        with eng.connect() as c:
+            rows = c.execute(text(f"""
+                SELECT id, agency_id, kind, resource_id, status, progress, error, updated_at FROM hakilix.jobs
+                {'' if args.all else "WHERE status IN ('queued', 'running', 'failed')"}
+                ORDER BY created_at
+            """)).mappings().all()
+        for r in rows:
+            print(json.dumps(dict(r), default=str))
+        return
+
+    statuses = ["queued", "running"] + (["failed"] if args.include_failed else [])
+    while True:
+        with eng.connect() as c:
+            todo = c.execute(text("""
+                SELECT id, agency_id FROM hakilix.jobs
+                WHERE status = ANY(:st) AND updated_at < now() - make_interval(secs => :s)
+                ORDER BY created_at
+            """), {"st": statuses, "s": args.stale_s}).all()
+        if todo or args.every_s <= 0:
+            print(f"resuming {len(todo)} job(s)")
+        for job_id, agency_id in todo:
+            jobs.run(job_id, agency_id)
+        if args.every_s <= 0:
+            return
+        time.sleep(args.every_s)
+
+if __name__ == "__main__":
+    main()
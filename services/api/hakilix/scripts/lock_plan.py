@@ -0,0 +1,241 @@
+"""Dry run of pending migrations: which locks they take and for how long.
+
+    python -m hakilix.scripts.lock_plan [--from REV] [--to head] [--config /app/alembic.ini]
+                                        [--scan-mb-s 200] [--rewrite-mb-s 50] [--sample-s 5]
+                                        [--max-blocking-s 0]
+
+Each pending revision is rendered to SQL with ``alembic upgrade --sql`` (nothing is
+executed), split into statements and classified by the lock Postgres takes on the
+tables it touches. Sizes come from the live database, and the write rate on each
+table is sampled over ``--sample-s`` seconds. The output is one JSON line per
+statement (lock, what it blocks, estimated seconds, writes expected to queue
+meanwhile) and a summary line with the oldest open transaction, which every lock
+has to wait for first.
+
+Revisions that inspect the database while they run cannot be rendered offline;
+they are reported with ``"planned": false``. Migrations written with
+``hakilix.migrations`` render fine. With ``--max-blocking-s`` the exit status is
+2 when a statement is estimated to block writes for longer than that, or when a
+revision is unplanned (its locks are unknown).
+"""
+from __future__ import annotations
+import argparse, io, json, os, re, sys, time
+
+from sqlalchemy import create_engine, text
+
+from hakilix.config import settings
+
+# Postgres table lock modes, weakest first.
+LOCKS = ("none", "ROW EXCLUSIVE", "SHARE UPDATE EXCLUSIVE", "SHARE", "SHARE ROW EXCLUSIVE", "EXCLUSIVE",
+         "ACCESS EXCLUSIVE")
+
+WORK = ("brief", "scan", "index", "rewrite")
+
+# (pattern, lock, blocks, work). First match wins, so specific forms come before general ones.
+# work: "index" (scan + sort), "rewrite" (table copied), "scan" (full read), "brief" (catalog only).
+RULES = [
+    (r"CREATE (UNIQUE )?INDEX CONCURRENTLY", "SHARE UPDATE EXCLUSIVE", "none", "index"),
+    (r"CREATE (UNIQUE )?INDEX .*TRANSACTION_PER_CHUNK", "SHARE", "writes (one chunk at a time)", "index"),
+    (r"CREATE (UNIQUE )?INDEX .* ON ONLY ", "SHARE", "none", "brief"),
+    (r"CREATE (UNIQUE )?INDEX ", "SHARE", "writes", "index"),
+    (r"REINDEX .*CONCURRENTLY", "SHARE UPDATE EXCLUSIVE", "none", "index"),
+    (r"REINDEX ", "SHARE", "writes", "index"),
+    (r"DROP INDEX CONCURRENTLY", "SHARE UPDATE EXCLUSIVE", "none", "brief"),
+    (r"ALTER INDEX .* ATTACH PARTITION", "SHARE UPDATE EXCLUSIVE", "none", "brief"),
+    (r"DETACH PARTITION .*CONCURRENTLY", "SHARE UPDATE EXCLUSIVE", "none", "brief"),
+    (r"ATTACH PARTITION", "ACCESS EXCLUSIVE", "reads+writes (attached partition)", "scan"),
+    (r"CREATE_HYPERTABLE\(.*MIGRATE_DATA", "ACCESS EXCLUSIVE", "reads+writes", "rewrite"),
+    (r"ALTER COLUMN .* TYPE ", "ACCESS EXCLUSIVE", "reads+writes", "rewrite"),
+    (r"ADD COLUMN .* GENERATED ALWAYS AS .* STORED", "ACCESS EXCLUSIVE", "reads+writes", "rewrite"),
+    (r"VALIDATE CONSTRAINT", "SHARE UPDATE EXCLUSIVE", "none", "scan"),
+    (r"ADD CONSTRAINT .* FOREIGN KEY .* NOT VALID", "SHARE ROW EXCLUSIVE", "writes", "brief"),
+    (r"ADD CONSTRAINT .* NOT VALID", "ACCESS EXCLUSIVE", "reads+writes", "brief"),
+    (r"ADD CONSTRAINT .* USING INDEX", "ACCESS EXCLUSIVE", "reads+writes", "brief"),
+    (r"ADD CONSTRAINT .*(PRIMARY KEY|UNIQUE)", "ACCESS EXCLUSIVE", "reads+writes", "index"),
+    (r"ADD CONSTRAINT .* FOREIGN KEY", "SHARE ROW EXCLUSIVE", "writes", "scan"),
+    (r"ADD CONSTRAINT", "ACCESS EXCLUSIVE", "reads+writes", "scan"),
+    (r"SET NOT NULL", "ACCESS EXCLUSIVE", "reads+writes", "scan"),
+    (r"(DE)?COMPRESS_CHUNK", "EXCLUSIVE", "writes (one chunk at a time)", "rewrite"),
+    (r"REFRESH MATERIALIZED VIEW CONCURRENTLY", "EXCLUSIVE", "writes", "rewrite"),
+    (r"REFRESH MATERIALIZED VIEW", "ACCESS EXCLUSIVE", "reads+writes", "rewrite"),
+    (r"^(ALTER TABLE|DROP TABLE|DROP MATERIALIZED VIEW|DROP INDEX|CREATE POLICY|DROP POLICY|TRUNCATE)",
+     "ACCESS EXCLUSIVE", "reads+writes", "brief"),
+    (r"^(UPDATE|DELETE|INSERT INTO .* SELECT)", "ROW EXCLUSIVE", "rows it touches", "scan"),
+]
+_RULES = [(re.compile(p, re.S), lock, blocks, work) for p, lock, blocks, work in RULES]
+# Inside a DO block statements follow IF/THEN/EXECUTE, so the start-of-statement anchors are relaxed.
+_DO_RULES = [(re.compile(p.replace("^", r"\b"), re.S), lock, blocks, work) for p, lock, blocks, work in RULES]
+_REL = re.compile(r"\bHAKILIX\.(\w+)", re.I)
+
+def split_sql(sql: str) -> list[str]:
+    """Split a SQL script on top-level ``;``, keeping quoted strings, ``$tag$`` bodies and comments intact."""
+    out, buf, i, n = [], [], 0, len(sql)
+    while i < n:
+        ch = sql[i]
+        if ch == "-" and sql.startswith("--", i):
+            j = sql.find("\n", i)
+            j = n if j < 0 else j
+            buf.append(sql[i:j]); i = j
+            continue
+        if ch == "'":
+            j = i + 1
+            while j < n and not (sql[j] == "'" and not sql.startswith("''", j)):
+                j += 2 if sql.startswith("''", j) else 1
+            buf.append(sql[i:j + 1]); i = j + 1
+            continue
+        if ch == "$":
+            m = re.match(r"\$\w*\$", sql[i:])
+            if m:
+                j = sql.find(m.group(0), i + len(m.group(0)))
+                j = n if j < 0 else j + len(m.group(0))
+                buf.append(sql[i:j]); i = j
+                continue
+        if ch == ";":
+            out.append("".join(buf)); buf = []
+        else:
+            buf.append(ch)
+        i += 1
+    out.append("".join(buf))
+    stmts = []
+    for s in out:
+        body = "\n".join(l for l in s.strip().splitlines() if not l.strip().startswith("--")).strip()
+        if body:
+            stmts.append(body)
+    return stmts
+
+def classify(stmt: str) -> dict:
+    """Lock, blocked operations and kind of work for one statement; DO blocks take their strongest inner lock."""
+    flat = " ".join(stmt.upper().split())
+    body = re.search(r"\$(\w*)\$(.*)\$\1\$", stmt, re.S) if flat.startswith("DO ") else None
+    parts, rules = (split_sql(body.group(2)), _DO_RULES) if body else ([stmt], _RULES)
+    best = {"lock": "none", "blocks": "none", "work": "brief"}
+    for part in parts:
+        p = " ".join(part.upper().split())
+        for rx, lock, blocks, work in rules:
+            if rx.search(p):
+                if (LOCKS.index(lock), WORK.index(work)) > (LOCKS.index(best["lock"]), WORK.index(best["work"])):
+                    best = {"lock": lock, "blocks": blocks, "work": work}
+                break
+    if flat.startswith("DO "):
+        best["note"] = "inside a DO block; may not run at all"
+    if "IN BATCHES OF" in flat:
+        best.update(blocks="none", note="batched backfill (hakilix.migrations.backfill)")
+    return best
+
+def relations(c) -> dict[str, dict]:
+    """hakilix tables with bytes, estimated rows and cumulative writes, chunks/partitions summed into their root."""
+    roots = {}
+    for child, root in c.execute(text("""
+        SELECT format('%I.%I', cn.nspname, c.relname), format('%I.%I', rn.nspname, r.relname)
+        FROM pg_inherits i
+        JOIN pg_class p ON p.oid = i.inhparent
+        JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_namespace cn ON cn.oid = c.relnamespace
+        JOIN pg_class r ON r.oid = pg_partition_root(i.inhrelid) JOIN pg_namespace rn ON rn.oid = r.relnamespace
+        WHERE p.relkind = 'p' AND p.relnamespace = 'hakilix'::regnamespace
+    """)):
+        roots[child] = root
+    if c.execute(text("SELECT 1 FROM pg_extension WHERE extname='timescaledb'")).scalar():
+        for child, root in c.execute(text("""
+            SELECT format('%I.%I', chunk_schema, chunk_name), format('%I.%I', hypertable_schema, hypertable_name)
+            FROM timescaledb_information.chunks WHERE hypertable_schema = 'hakilix'
+        """)):
+            roots[child] = root
+    out: dict[str, dict] = {}
+    for rel, size, rows, writes in c.execute(text("""
+        SELECT format('%I.%I', s.schemaname, s.relname), pg_total_relation_size(s.relid),
+               greatest(c.reltuples, 0)::bigint, s.n_tup_ins + s.n_tup_upd + s.n_tup_del
+        FROM pg_stat_user_tables s JOIN pg_class c ON c.oid = s.relid
+    """)):
+        root = roots.get(rel, rel)
+        if not root.startswith("hakilix."):
+            continue
+        r = out.setdefault(root.split(".", 1)[1], {"bytes": 0, "rows": 0, "writes": 0})
+        r["bytes"] += size; r["rows"] += rows; r["writes"] += writes
+    return out
+
+def render(config: str, down: str | None, rev: str) -> str:
+    from alembic import command
+    from alembic.config import Config
+    buf = io.StringIO()
+    command.upgrade(Config(config, output_buffer=buf), f"{down}:{rev}" if down else rev, sql=True)
+    return buf.getvalue()
+
+def pending(config: str, start: str | None, end: str) -> list[tuple[str | None, str]]:
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+    script = ScriptDirectory.from_config(Config(config))
+    revs = list(script.iterate_revisions(end, start or "base"))
+    return [(r.down_revision, r.revision) for r in reversed(revs)]
+
+def plan(config: str = "/app/alembic.ini", start: str | None = None, end: str = "head", scan_mb_s: float = 200.0,
+         rewrite_mb_s: float = 50.0, sample_s: float = 5.0) -> tuple[list[dict], dict]:
+    """(one dict per statement, summary) for the revisions between ``start`` (default: current) and ``end``."""
+    os.environ.setdefault("DATABASE_URL_MIGRATOR", settings.database_url_migrator or settings.database_url_app)
+    eng = create_engine(os.environ["DATABASE_URL_MIGRATOR"], future=True)
+    with eng.connect() as c:
+        if start is None and c.execute(text("SELECT to_regclass('public.alembic_version')")).scalar():
+            start = c.execute(text("SELECT version_num FROM public.alembic_version")).scalar()
+        before = relations(c)
+        c.rollback()
+        time.sleep(sample_s)
+        after = relations(c)
+        oldest = c.execute(text("""
+            SELECT coalesce(max(extract(epoch FROM now() - xact_start)), 0) FROM pg_stat_activity
+            WHERE xact_start IS NOT NULL AND state <> 'idle' AND pid <> pg_backend_pid()
+        """)).scalar()
+    rates = {k: max(0, v["writes"] - before.get(k, v)["writes"]) / max(sample_s, 0.001) for k, v in after.items()}
+
+    rows, unplanned = [], []
+    for down, rev in pending(config, start, end):
+        try:
+            sql = render(config, down, rev)
+        except Exception as e:
+            unplanned.append(rev)
+            rows.append({"revision": rev, "planned": False, "error": str(e).splitlines()[0][:200] if str(e) else repr(e)})
+            continue
+        for stmt in split_sql(sql):
+            if "alembic_version" in stmt:
+                continue
+            info = classify(stmt)
+            if info["lock"] == "none":
+                continue
+            rels = [r.lower() for r in _REL.findall(stmt)]
+            table = max(rels, key=lambda r: after.get(r, {}).get("bytes", -1), default=None)
+            st = after.get(table, {"bytes": 0, "rows": 0})
+            mb = st["bytes"] / 1e6
+            seconds = {"index": mb / scan_mb_s * 1.5, "rewrite": mb / rewrite_mb_s, "scan": mb / scan_mb_s}.get(info["work"], 0.0)
+            blocks_writes = "writes" in info["blocks"]
+            rows.append({
+                "revision": rev, "planned": True, "statement": " ".join(stmt.split())[:160], "table": table,
+                "table_mb": round(mb, 1), "rows_est": st["rows"], **info, "est_seconds": round(seconds, 1),
+                "writes_per_s": round(rates.get(table, 0.0), 1),
+                "writes_queued_est": int(rates.get(table, 0.0) * seconds) if blocks_writes else 0,
+            })
+    blocking = [r for r in rows if r.get("planned") and "writes" in r["blocks"]]
+    summary = {
+        "from": start or "base", "to": end, "statements": sum(1 for r in rows if r.get("planned")),
+        "unplanned_revisions": unplanned,
+        "max_write_block_s": max((r["est_seconds"] for r in blocking), default=0.0),
+        "oldest_open_transaction_s": round(float(oldest or 0), 1),
+    }
+    return rows, summary
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--from", dest="start", default=None, help="default: the database's current revision")
+    ap.add_argument("--to", dest="end", default="head")
+    ap.add_argument("--config", default="/app/alembic.ini")
+    ap.add_argument("--scan-mb-s", type=float, default=200.0, help="assumed sequential scan / index build throughput")
+    ap.add_argument("--rewrite-mb-s", type=float, default=50.0, help="assumed table rewrite throughput")
+    ap.add_argument("--sample-s", type=float, default=5.0, help="how long to sample write rates")
+    ap.add_argument("--max-blocking-s", type=float, default=0.0, help="exit 2 if writes would block longer (0 = off)")
+    args = ap.parse_args()
+    rows, summary = plan(args.config, args.start, args.end, args.scan_mb_s, args.rewrite_mb_s, args.sample_s)
+    for r in rows:
+        print(json.dumps(r))
+    print(json.dumps({"summary": summary}))
+    if args.max_blocking_s > 0 and (summary["max_write_block_s"] > args.max_blocking_s or summary["unplanned_revisions"]):
+        sys.exit(2)
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,31 @@ def main():
     if not db_url:
         raise SystemExit("No database URL configured (set DATABASE_URL_APP or DATABASE_URL_MIGRATOR)")
 
+    if settings.hakilix_migration_max_blocking_s > 0:
+        from hakilix.scripts import lock_plan
+        rows, summary = lock_plan.plan(sample_s=2.0)
+        print("Migration lock plan:", json.dumps(summary))
+        allowed = {r.strip() for r in settings.hakilix_migration_allow_unplanned.split(",") if r.strip()}
+        unplanned = [rev for rev in summary["unplanned_revisions"] if rev not in allowed]
+        if unplanned:
+            for r in rows:
+                if not r.get("planned") and r["revision"] in unplanned:
+                    print(json.dumps(r))
+            raise SystemExit(
+                f"Pending revisions {', '.join(unplanned)} cannot be planned offline, so their locks are unknown; "
+                "review them and list them in HAKILIX_MIGRATION_ALLOW_UNPLANNED, or run `alembic upgrade head` "
+                "in a maintenance window"
+            )
+        if summary["max_write_block_s"] > settings.hakilix_migration_max_blocking_s:
+            for r in rows:
+                if r.get("planned") and "writes" in r["blocks"] and r["est_seconds"] > settings.hakilix_migration_max_blocking_s:
+                    print(json.dumps(r))
+            raise SystemExit(
+                f"Pending migrations would block writes for ~{summary['max_write_block_s']}s "
+                f"(HAKILIX_MIGRATION_MAX_BLOCKING_S={settings.hakilix_migration_max_blocking_s}); "
+                "run `alembic upgrade head` in a maintenance window or rewrite them with hakilix.migrations"
+            )
+
     # Run migrations
     subprocess.run([sys.executable, "-m", "alembic", "-c", "/app/alembic.ini", "upgrade", "head"], check=True)
 
@@ -0,0 +1,50 @@
+"""Partition maintenance for the non-Timescale layout.
+
+    python -m hakilix.scripts.partitions list
+    python -m hakilix.scripts.partitions maintain [--months-ahead 3]
+
+``maintain`` pre-creates monthly partitions ``--months-ahead`` months past the
+current one for telemetry, risk_events and audit_log, then detaches and drops
+partitions that are entirely older than ``HAKILIX_RETENTION_*_DAYS`` (0 = keep).
+Run it daily (cron / Cloud Scheduler). Does nothing for tables that are not
+natively partitioned (e.g. TimescaleDB hypertables).
+"""
+from __future__ import annotations
+import argparse, json
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine
+
+from hakilix import partitions
+from hakilix.scripts.storage_policies import policies
+from hakilix.config import settings
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("list")
+    p_m = sub.add_parser("maintain")
+    p_m.add_argument("--months-ahead", type=int, default=3)
+    args = ap.parse_args()
+
+    eng = create_engine(settings.database_url_migrator or settings.database_url_app, future=True, pool_pre_ping=True)
+    with eng.connect() as c:
+        for p in policies():
+            if not partitions.is_partitioned(c, p.table):
+                print(f"{p.table}: not partitioned; skipping")
+                continue
+            if args.cmd == "list":
+                for part in partitions.partitions(c, p.table):
+                    print(json.dumps({"table": p.table, "partition": part.name,
+                                      "from": part.lower.isoformat() if part.lower else "MINVALUE",
+                                      "to": part.upper.isoformat() if part.upper else "MAXVALUE"}))
+                continue
+            for name in partitions.ensure_future(c, p.table, args.months_ahead):
+                print(f"{p.table}: created {name}")
+            if p.retention_days > 0:
+                cutoff = datetime.now(timezone.utc) - timedelta(days=p.retention_days)
+                for name in partitions.drop_expired(c, p.table, cutoff):
+                    print(f"{p.table}: dropped {name}")
+
+if __name__ == "__main__":
+    main()
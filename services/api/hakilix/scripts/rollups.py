@@ -0,0 +1,87 @@
+"""Telemetry rollup maintenance (vitals_1m / vitals_1h / vitals_1d).
+
+    python -m hakilix.scripts.rollups status
+    python -m hakilix.scripts.rollups refresh [--lateness-min 10] [--every-s 60]
+    python -m hakilix.scripts.rollups realtime on|off
+    python -m hakilix.scripts.rollups rebuild
+
+``refresh`` brings the plain-Postgres rollup tables up to date incrementally
+(only buckets past each watermark, minus the lateness allowance); keep it running
+with ``--every-s`` or schedule it. Continuous aggregates are refreshed by their
+Timescale policies and are skipped.
+
+``realtime`` toggles Timescale real-time aggregation on the continuous aggregates
+(``timescaledb.materialized_only``); for the table layout set
+``HAKILIX_ROLLUPS_REALTIME`` on the API instead.
+
+``rebuild`` recomputes every rollup over all of telemetry: a full
+``refresh_continuous_aggregate`` for continuous aggregates (needed after they are
+recreated, e.g. by migration 0011), watermark reset plus refresh for tables.
+
+Runs as the migrator role so row-level security does not hide other tenants' rows.
+"""
+from __future__ import annotations
+import argparse, json, time
+from datetime import timedelta
+
+from sqlalchemy import create_engine, text
+
+from hakilix import rollups
+from hakilix.config import settings
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("status")
+    p_ref = sub.add_parser("refresh")
+    p_ref.add_argument("--lateness-min", type=float, default=10.0, help="re-aggregate this far behind each watermark")
+    p_ref.add_argument("--every-s", type=float, default=0.0, help="repeat forever at this interval")
+    p_rt = sub.add_parser("realtime")
+    p_rt.add_argument("state", choices=["on", "off"])
+    sub.add_parser("rebuild")
+    args = ap.parse_args()
+
+    eng = create_engine(settings.database_url_migrator or settings.database_url_app, future=True, pool_pre_ping=True)
+    if args.cmd == "status":
+        with eng.connect() as c:
+            marks = dict(c.execute(text("SELECT name, upto FROM hakilix.rollup_watermarks")).all())
+            for rel, _ in rollups.RESOLUTIONS.values():
+                print(json.dumps({"rollup": rel, "layout": rollups.layout(c, rel), "watermark": marks.get(rel)}, default=str))
+        return
+
+    if args.cmd == "realtime":
+        with eng.begin() as c:
+            for rel, _ in rollups.RESOLUTIONS.values():
+                if rollups.layout(c, rel) != "cagg":
+                    print(f"{rel}: not a continuous aggregate, skipped")
+                    continue
+                only = "false" if args.state == "on" else "true"
+                c.execute(text(f"ALTER MATERIALIZED VIEW hakilix.{rel} SET (timescaledb.materialized_only = {only})"))
+                print(f"{rel}: real-time aggregation {args.state}")
+        return
+
+    if args.cmd == "rebuild":
+        with eng.connect().execution_options(isolation_level="AUTOCOMMIT") as ac:
+            # refresh_continuous_aggregate cannot run inside a transaction block.
+            for rel, _ in rollups.RESOLUTIONS.values():
+                if rollups.layout(ac, rel) == "cagg":
+                    t0 = time.time()
+                    ac.execute(text(f"CALL refresh_continuous_aggregate('hakilix.{rel}', NULL, NULL)"))
+                    print(f"{rel}: rebuilt in {time.time() - t0:.1f}s")
+        with eng.connect() as c:
+            c.execute(text("DELETE FROM hakilix.rollup_watermarks"))
+            c.commit()
+            print(json.dumps({"refreshed": rollups.refresh_tables(c, lateness=timedelta(0))}))
+        return
+
+    while True:
+        t0 = time.time()
+        with eng.connect() as c:
+            rows = rollups.refresh_tables(c, lateness=timedelta(minutes=args.lateness_min))
+        print(json.dumps({"refreshed": rows, "seconds": round(time.time() - t0, 3)}))
+        if args.every_s <= 0:
+            return
+        time.sleep(args.every_s)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Import-time profile and time-to-first-request benchmark for the API.
+
+    python -m hakilix.scripts.startup_profile imports [--runs 3] [--top 15]
+    python -m hakilix.scripts.startup_profile ttfr [--runs 5] [--port 18081] [--target-s 1.0] [--ready-timeout-s 30]
+
+``imports`` runs ``python -X importtime -c "import hakilix.app"`` in fresh
+processes and prints the median total and the packages with the largest self
+time (summed over their modules), i.e. what to defer next.
+
+``ttfr`` starts the API the way the container does (``python -m hakilix.app_entry``)
+and measures, per run, the time from spawn to the first ``GET /v1/health`` that
+answers 200 (time-to-first-request) and to the first ``GET /v1/ready`` that
+answers 200 (pools and caches warm; needs a reachable database). With
+``--target-s`` the exit status is 2 when the median time-to-first-request is above it.
+"""
+from __future__ import annotations
+import argparse, http.client, json, os, statistics, subprocess, sys, time
+from collections import defaultdict
+
+def import_profile(runs: int) -> tuple[float, dict[str, float]]:
+    totals, self_us = [], defaultdict(list)
+    for _ in range(runs):
+        p = subprocess.run([sys.executable, "-X", "importtime", "-c", "import hakilix.app"], capture_output=True, text=True,
+                           env={**os.environ, "LOG_LEVEL": "WARNING"})
+        per_pkg: dict[str, int] = defaultdict(int)
+        total = 0
+        for line in p.stderr.splitlines():
+            if not line.startswith("import time:") or "self [us]" in line:
+                continue
+            own, cumulative, name = line[len("import time:"):].split("|")
+            name = name.strip()
+            per_pkg[name.split(".")[0]] += int(own)
+            if name == "hakilix.app":
+                total = int(cumulative)
+        totals.append(total / 1e6)
+        for k, v in per_pkg.items():
+            self_us[k].append(v)
+    return statistics.median(totals), {k: statistics.median(v) / 1e3 for k, v in self_us.items()}
+
+def _get(port: int, path: str) -> int | None:
+    try:
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+        conn.request("GET", path)
+        status = conn.getresponse().status
+        conn.close()
+        return status
+    except OSError:
+        return None
+
+def time_to_first_request(port: int, ready_timeout_s: float) -> dict:
+    env = {**os.environ, "HAKILIX_RUN_MODE": "api", "PORT": str(port), "LOG_LEVEL": "WARNING"}
+    t0 = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-m", "hakilix.app_entry"], env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    out: dict = {"first_request_s": None, "ready_s": None}
+    try:
+        deadline = t0 + 60
+        while time.perf_counter() < deadline and server.poll() is None:
+            if _get(port, "/v1/health") == 200:
+                out["first_request_s"] = round(time.perf_counter() - t0, 3)
+                break
+            time.sleep(0.01)
+        deadline = time.perf_counter() + ready_timeout_s
+        while out["first_request_s"] is not None and time.perf_counter() < deadline:
+            if _get(port, "/v1/ready") == 200:
+                out["ready_s"] = round(time.perf_counter() - t0, 3)
+                break
+            time.sleep(0.05)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    return out
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p_imp = sub.add_parser("imports")
+    p_imp.add_argument("--runs", type=int, default=3)
+    p_imp.add_argument("--top", type=int, default=15)
+    p_ttfr = sub.add_parser("ttfr")
+    p_ttfr.add_argument("--runs", type=int, default=5)
+    p_ttfr.add_argument("--port", type=int, default=18081)
+    p_ttfr.add_argument("--target-s", type=float, default=0.0)
+    p_ttfr.add_argument("--ready-timeout-s", type=float, default=30.0)
+    args = ap.parse_args()
+
+    if args.cmd == "imports":
+        total, pkgs = import_profile(args.runs)
+        print(json.dumps({"import_hakilix_app_s": round(total, 3), "runs": args.runs}))
+        for name, ms in sorted(pkgs.items(), key=lambda kv: -kv[1])[:args.top]:
+            print(json.dumps({"package": name, "self_ms": round(ms, 1)}))
+        return
+
+    runs = [time_to_first_request(args.port, args.ready_timeout_s) for _ in range(args.runs)]
+    for r in runs:
+        print(json.dumps(r))
+    first = [r["first_request_s"] for r in runs if r["first_request_s"] is not None]
+    ready = [r["ready_s"] for r in runs if r["ready_s"] is not None]
+    summary = {"runs": len(runs), "first_request_median_s": statistics.median(first) if first else None,
+               "first_request_max_s": max(first) if first else None,
+               "ready_median_s": statistics.median(ready) if ready else None}
+    print(json.dumps({"summary": summary}))
+    if args.target_s > 0 and (not first or summary["first_request_median_s"] > args.target_s):
+        sys.exit(2)
+
+if __name__ == "__main__":
+    main()
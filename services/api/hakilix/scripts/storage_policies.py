@@ -0,0 +1,97 @@
+"""Compression and retention policy management.
+
+    python -m hakilix.scripts.storage_policies report
+    python -m hakilix.scripts.storage_policies apply [--compress-now] [--allow-uncompressed]
+    python -m hakilix.scripts.storage_policies run-retention [--batch-rows 10000] [--pause-s 0.1] [--every-s 3600]
+
+``apply`` syncs the TimescaleDB compression/retention jobs with
+``HAKILIX_COMPRESS_AFTER_DAYS`` and ``HAKILIX_RETENTION_{TELEMETRY,RISK,AUDIT}_DAYS``
+(0 = keep forever) and prints the size report before and after; ``--compress-now``
+compresses already-eligible chunks instead of waiting for the background job.
+A hypertable whose compression is requested but unavailable (TimescaleDB refuses
+compression on tables with row-level security, which all three have) is reported
+as ``compression: unavailable (RLS)`` and makes ``apply`` exit non-zero after the
+retention jobs are synced, unless ``--allow-uncompressed`` is given.
+
+``run-retention`` enforces the same retention by dropping chunks (hypertables) or
+by batched deletes (plain Postgres, e.g. Cloud SQL). Schedule it with cron /
+Cloud Scheduler, or keep it running with ``--every-s``.
+
+Runs as the migrator role so row-level security does not hide other tenants' rows.
+"""
+from __future__ import annotations
+import argparse, json, sys, time
+
+from sqlalchemy import create_engine
+
+from hakilix import storage
+from hakilix.config import settings
+
+def policies() -> list[storage.Policy]:
+    return [
+        storage.Policy("telemetry", settings.hakilix_compress_after_days, settings.hakilix_retention_telemetry_days),
+        storage.Policy("risk_events", settings.hakilix_compress_after_days, settings.hakilix_retention_risk_days),
+        storage.Policy("audit_log", settings.hakilix_compress_after_days, settings.hakilix_retention_audit_days),
+    ]
+
+def _print_report(c, label: str):
+    for row in storage.report(c):
+        print(json.dumps({"report": label, **row}, default=str))
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("report")
+    p_apply = sub.add_parser("apply")
+    p_apply.add_argument("--compress-now", action="store_true")
+    p_apply.add_argument("--allow-uncompressed", action="store_true",
+                         help="exit 0 even if compression cannot be enabled on a hypertable")
+    p_ret = sub.add_parser("run-retention")
+    p_ret.add_argument("--batch-rows", type=int, default=10000)
+    p_ret.add_argument("--pause-s", type=float, default=0.0, help="sleep between delete batches")
+    p_ret.add_argument("--every-s", type=float, default=0.0, help="repeat forever at this interval")
+    args = ap.parse_args()
+
+    eng = create_engine(settings.database_url_migrator or settings.database_url_app, future=True, pool_pre_ping=True)
+    if args.cmd == "report":
+        with eng.connect() as c:
+            _print_report(c, "current")
+        return
+
+    if args.cmd == "apply":
+        with eng.connect() as c:
+            _print_report(c, "before")
+            print("timescaledb:", storage.is_timescale(c))
+        with eng.begin() as c:
+            for p in policies():
+                for line in storage.apply_policy(c, p):
+                    print(line)
+        if args.compress_now:
+            with eng.begin() as c:
+                for p in policies():
+                    if p.compress_after_days > 0:
+                        print(f"{p.table}: compressed {storage.compress_now(c, p.table, p.compress_after_days)} chunk(s)")
+        with eng.connect() as c:
+            _print_report(c, "after")
+            missing = [(p.table, storage.compression_status(c, p.table)) for p in policies()
+                       if p.compress_after_days > 0 and storage.is_hypertable(c, p.table)
+                       and not storage.compression_enabled(c, p.table)]
+        if missing and not args.allow_uncompressed:
+            for table, status in missing:
+                print(f"ERROR {table}: compression {status}; HAKILIX_COMPRESS_AFTER_DAYS="
+                      f"{settings.hakilix_compress_after_days} has no effect", file=sys.stderr)
+            sys.exit(1)
+        return
+
+    while True:
+        with eng.connect() as c:
+            for p in policies():
+                n = storage.run_retention(c, p.table, p.retention_days, args.batch_rows, args.pause_s)
+                if p.retention_days > 0:
+                    print(json.dumps({"table": p.table, "retention_days": p.retention_days, "removed": n}))
+        if args.every_s <= 0:
+            return
+        time.sleep(args.every_s)
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,14 @@
 from __future__ import annotations
 
-import os
-from typing import Optional
+import os, threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional
 
 from cachetools import TTLCache
 
 _cache = TTLCache(maxsize=256, ttl=300)
+_client = None
+_client_lock = threading.Lock()
 
 def _is_sm_ref(v: str) -> bool:
     return v.startswith("sm://")
@@ -36,11 +39,37 @@ def resolve_secret(value_or_ref: Optional[str]) -> Optional[str]:
     if v in _cache:
         return _cache[v]
 
-    from google.cloud import secretmanager
-
     project, resource = _parse_sm_ref(v)
-    client = secretmanager.SecretManagerServiceClient()
-    resp = client.access_secret_version(name=resource)
+    resp = _sm_client().access_secret_version(name=resource)
     secret = resp.payload.data.decode("utf-8")
     _cache[v] = secret
     return secret
+
+def _sm_client():
+    # One client per process: creating it (channel, credentials) costs more than a secret lookup.
+    global _client
+    with _client_lock:
+        if _client is None:
+            from google.cloud import secretmanager
+            _client = secretmanager.SecretManagerServiceClient()
+    return _client
+
+def _prefetch(ref: str) -> None:
+    try:
+        resolve_secret(ref)
+    except Exception:
+        pass  # left uncached: the field that needs it fetches again and reports the real error
+
+def prefetch_env(names: Iterable[str]) -> int:
+    """Resolve the ``sm://`` values of the env vars ``names`` concurrently; returns how many were tried.
+
+    Called before ``Settings()`` is built, so its validators hit the cache instead of
+    fetching one secret after another. Failures are ignored here.
+    """
+    env = {k.upper(): v.strip() for k, v in os.environ.items()}
+    refs = sorted({v for v in (env.get(n.upper(), "") for n in names) if _is_sm_ref(v) and v not in _cache})
+    if not refs:
+        return 0
+    with ThreadPoolExecutor(max_workers=min(8, len(refs))) as pool:
+        list(pool.map(_prefetch, refs))
+    return len(refs)
@@ -1,18 +1,21 @@
 from __future__ import annotations
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from typing import Any, Dict
-from argon2 import PasswordHasher
-from jose import jwt
 from hakilix.config import settings
 
-ph = PasswordHasher(time_cost=3, memory_cost=65536, parallelism=2, hash_len=32, salt_len=16)
+# argon2 and python-jose are imported on first use (or by /v1/ready), not at API import time.
+@lru_cache(maxsize=1)
+def password_hasher():
+    from argon2 import PasswordHasher
+    return PasswordHasher(time_cost=3, memory_cost=65536, parallelism=2, hash_len=32, salt_len=16)
 
 def hash_password(pw: str) -> str:
-    return ph.hash(pw)
+    return password_hasher().hash(pw)
 
 def verify_password(hash_: str, pw: str) -> bool:
     try:
-        ph.verify(hash_, pw)
+        password_hasher().verify(hash_, pw)
         return True
     except Exception:
         return False
@@ -29,9 +32,11 @@ def create_access_token(subject: str, agency_id: str, role: str) -> str:
         "iat": int(now.timestamp()),
         "exp": int(exp.timestamp()),
     }
+    from jose import jwt
     return jwt.encode(payload, settings.hakilix_jwt_secret, algorithm="HS256")
 
 def decode_token(token: str) -> Dict[str, Any]:
+    from jose import jwt
     return jwt.decode(
         token,
         settings.hakilix_jwt_secret,
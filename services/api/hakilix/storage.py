@@ -0,0 +1,167 @@
+"""Storage layout helpers for the time-series tables.
+
+Used by ``hakilix.scripts.storage_policies``. Everything here takes an open
+SQLAlchemy connection on the migrator role (table owner, so RLS does not hide
+other tenants' rows) and works both with and without TimescaleDB.
+"""
+from __future__ import annotations
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+import structlog
+from sqlalchemy.engine import Connection
+
+from hakilix import partitions
+
+log = structlog.get_logger(__name__)
+
+# Tables with a ``time`` column that policies apply to.
+TIME_SERIES_TABLES = ("telemetry", "risk_events", "audit_log")
+
+@dataclass
+class Policy:
+    table: str
+    compress_after_days: int  # 0 = no compression policy
+    retention_days: int  # 0 = keep forever
+
+def is_timescale(c: Connection) -> bool:
+    return bool(c.execute(text("SELECT 1 FROM pg_extension WHERE extname='timescaledb'")).scalar())
+
+def is_hypertable(c: Connection, table: str) -> bool:
+    if not is_timescale(c):
+        return False
+    return bool(c.execute(text("""
+        SELECT 1 FROM timescaledb_information.hypertables
+        WHERE hypertable_schema='hakilix' AND hypertable_name=:t
+    """), {"t": table}).scalar())
+
+def compression_enabled(c: Connection, table: str) -> bool:
+    if not is_hypertable(c, table):
+        return False
+    return bool(c.execute(text("""
+        SELECT compression_enabled FROM timescaledb_information.hypertables
+        WHERE hypertable_schema='hakilix' AND hypertable_name=:t
+    """), {"t": table}).scalar())
+
+def has_rls(c: Connection, table: str) -> bool:
+    return bool(c.execute(text("SELECT relrowsecurity FROM pg_class WHERE oid = to_regclass(:r)"),
+                          {"r": f"hakilix.{table}"}).scalar())
+
+def compression_status(c: Connection, table: str) -> str:
+    """``enabled``, ``unavailable (RLS)``, ``not enabled`` or ``not a hypertable``.
+
+    TimescaleDB refuses ``timescaledb.compress`` on a table with row-level security,
+    and every time-series table here has RLS (0003), so 0008 leaves them uncompressed
+    on such builds; this names that state instead of reporting a bare ``False``.
+    """
+    if not is_hypertable(c, table):
+        return "not a hypertable"
+    if compression_enabled(c, table):
+        return "enabled"
+    return "unavailable (RLS)" if has_rls(c, table) else "not enabled"
+
+def table_size(c: Connection, table: str) -> dict:
+    """On-disk size (indexes and TOAST included) plus compression stats where available."""
+    fq = f"hakilix.{table}"
+    out: dict = {"table": table, "hypertable": is_hypertable(c, table)}
+    if out["hypertable"]:
+        out["total_bytes"] = c.execute(text("SELECT hypertable_size(CAST(:t AS regclass))"), {"t": fq}).scalar()
+        out["rows_estimate"] = c.execute(text("SELECT approximate_row_count(CAST(:t AS regclass))"), {"t": fq}).scalar()
+        out["chunks"] = c.execute(text("SELECT count(*) FROM show_chunks(CAST(:t AS regclass))"), {"t": fq}).scalar()
+        out["compression"] = compression_status(c, table)
+        if out["compression"] == "enabled":
+            st = c.execute(text("""
+                SELECT number_compressed_chunks, before_compression_total_bytes, after_compression_total_bytes
+                FROM hypertable_compression_stats(CAST(:t AS regclass))
+            """), {"t": fq}).mappings().first()
+            if st:
+                out.update(compressed_chunks=st["number_compressed_chunks"],
+                           before_compression_bytes=st["before_compression_total_bytes"],
+                           after_compression_bytes=st["after_compression_total_bytes"])
+    elif partitions.is_partitioned(c, table):
+        out["partitioned"] = True
+        out["total_bytes"], out["partitions"] = partitions.size_bytes(c, table)
+        out["rows_estimate"] = c.execute(text("""
+            SELECT coalesce(sum(greatest(reltuples, 0)), 0)::bigint FROM pg_class
+            WHERE oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = CAST(:t AS regclass))
+        """), {"t": fq}).scalar()
+    else:
+        out["total_bytes"] = c.execute(text("SELECT pg_total_relation_size(CAST(:t AS regclass))"), {"t": fq}).scalar()
+        out["rows_estimate"] = c.execute(text("SELECT reltuples::bigint FROM pg_class WHERE oid = CAST(:t AS regclass)"),
+                                         {"t": fq}).scalar()
+    return out
+
+def report(c: Connection, tables=TIME_SERIES_TABLES) -> list[dict]:
+    return [table_size(c, t) for t in tables]
+
+def apply_policy(c: Connection, p: Policy) -> list[str]:
+    """Sync Timescale background policies with ``p``; returns what changed.
+
+    Plain tables get nothing here: their retention runs through ``run_retention``.
+    """
+    if not is_hypertable(c, p.table):
+        return [f"{p.table}: not a hypertable, retention via run-retention"]
+    fq, done = f"hakilix.{p.table}", []
+    if compression_enabled(c, p.table):
+        c.execute(text("SELECT remove_compression_policy(CAST(:t AS regclass), if_exists => TRUE)"), {"t": fq})
+        if p.compress_after_days > 0:
+            c.execute(text("SELECT add_compression_policy(CAST(:t AS regclass), make_interval(days => :d))"),
+                      {"t": fq, "d": p.compress_after_days})
+            done.append(f"{p.table}: compress chunks older than {p.compress_after_days} days")
+        else:
+            done.append(f"{p.table}: compression policy removed")
+    elif p.compress_after_days > 0:
+        done.append(f"{p.table}: compression {compression_status(c, p.table)}, chunks stay uncompressed")
+    c.execute(text("SELECT remove_retention_policy(CAST(:t AS regclass), if_exists => TRUE)"), {"t": fq})
+    if p.retention_days > 0:
+        c.execute(text("SELECT add_retention_policy(CAST(:t AS regclass), make_interval(days => :d))"),
+                  {"t": fq, "d": p.retention_days})
+        done.append(f"{p.table}: drop chunks older than {p.retention_days} days")
+    else:
+        done.append(f"{p.table}: no retention")
+    return done
+
+def compress_now(c: Connection, table: str, older_than_days: int) -> int:
+    """Compress eligible chunks immediately instead of waiting for the policy job."""
+    if not compression_enabled(c, table):
+        return 0
+    return len(c.execute(text("""
+        SELECT compress_chunk(ch, if_not_compressed => TRUE)
+        FROM show_chunks(CAST(:t AS regclass), older_than => make_interval(days => :d)) ch
+    """), {"t": f"hakilix.{table}", "d": older_than_days}).all())
+
+def run_retention(c: Connection, table: str, days: int, batch_rows: int = 10000, pause_s: float = 0.0) -> int:
+    """Remove rows older than ``days``; returns rows (or chunks, for hypertables) removed.
+
+    Hypertables drop whole chunks. Natively partitioned tables drop whole expired
+    partitions first. Remaining expired rows are deleted in ``batch_rows`` batches,
+    each committed on its own so locks and WAL bursts stay small.
+    """
+    if days <= 0:
+        return 0
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    fq = f"hakilix.{table}"
+    if is_hypertable(c, table):
+        n = len(c.execute(text("SELECT drop_chunks(CAST(:t AS regclass), older_than => CAST(:cut AS timestamptz))"),
+                          {"t": fq, "cut": cutoff}).all())
+        c.commit()
+        return n
+    total = 0
+    # ctids repeat across partitions; the outer time filter keeps a collision to expired rows.
+    if partitions.is_partitioned(c, table):
+        for name in partitions.drop_expired(c, table, cutoff):
+            log.info("retention_dropped_partition", table=table, partition=name)
+    while True:
+        n = c.execute(text(f"""
+            DELETE FROM {fq} WHERE time < :cut AND ctid = ANY(ARRAY(
+                SELECT ctid FROM {fq} WHERE time < :cut LIMIT :n
+            ))
+        """), {"cut": cutoff, "n": batch_rows}).rowcount or 0
+        c.commit()
+        total += n
+        if n < batch_rows:
+            return total
+        if pause_s > 0:
+            time.sleep(pause_s)
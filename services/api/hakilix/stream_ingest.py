@@ -0,0 +1,345 @@
+"""Streaming ingest for edge gateways: authenticate once, then stream readings.
+
+    POST /v1/telemetry/stream   chunked NDJSON request body, NDJSON acks in the response
+    WS   /v1/telemetry/stream   NDJSON lines in text frames, acks as JSON text frames
+
+A gateway authenticates once with ``X-Device-Id`` / ``X-Device-Token`` on the
+request or the WebSocket handshake, then sends one ``TelemetryIn`` object per
+line. Lines are parsed as they arrive and handed, in groups, to the per-process
+write-behind. It writes batches of up to ``HAKILIX_STREAM_BATCH_ROWS`` readings
+in one transaction per agency (one executemany plus one audit row per device and
+resident), or publishes them with ``BROKER_TYPE=pubsub``.
+
+Acks are cumulative. ``{"acked": n, "rejected": r}`` means the first ``n`` lines
+of the connection are done: each was either persisted or rejected, as invalid or
+because the database refused the row (e.g. a time with no partition), and
+rejected lines are counted in ``r``. Each agency's readings are written in their
+own transaction; when one is refused, that agency's batch is retried row by row
+so only the offending line is rejected. Acks are sent every
+``HAKILIX_STREAM_ACK_MS`` when ``n`` has moved, and once more at the end, with
+``"error"`` if the stream was cut short. Delivery is at-least-once: after a
+disconnect or an error, the gateway resends every line past the last ack it
+received.
+
+Backpressure: the write-behind holds at most ``HAKILIX_STREAM_BUFFER_ROWS``
+readings per process. A connection that finds it full stops reading until a
+batch has been written, so a slow database slows gateways down through TCP flow
+control rather than growing memory. Device and agency rate limits are charged per
+group of readings, and an empty bucket pauses the connection the same way. The
+device is re-checked every ``HAKILIX_STREAM_REAUTH_S``.
+"""
+from __future__ import annotations
+import asyncio, time
+from collections import Counter as Tally, deque
+from typing import AsyncIterator, Callable
+
+import anyio
+from prometheus_client import Counter, Gauge, Histogram
+from pydantic import ValidationError
+from sqlalchemy.exc import DBAPIError, OperationalError
+import structlog
+
+from hakilix import admission
+from hakilix.config import settings
+from hakilix.db import db_session, INGEST
+from hakilix.schemas import TelemetryIn
+
+log = structlog.get_logger(__name__)
+
+CONNECTIONS = Gauge("hakilix_stream_connections", "Open streaming ingest connections", multiprocess_mode="livesum")
+READINGS = Counter("hakilix_stream_readings_total", "Streamed readings by outcome", ["outcome"])
+BUFFERED = Gauge("hakilix_stream_buffered_rows", "Readings waiting in the write-behind", multiprocess_mode="livesum")
+FLUSH = Histogram("hakilix_stream_flush_seconds", "Write-behind batch write time")
+BACKPRESSURE = Counter("hakilix_stream_backpressure_seconds_total",
+                       "Time connections stopped reading, by cause (write_behind, device, agency)", ["cause"])
+
+MAX_LINE = 64 * 1024
+_ATTEMPTS = 3
+
+class StreamError(Exception):
+    """Ends a stream; the message becomes the final ack's ``error``."""
+
+class Conn:
+    """One gateway connection and its cumulative-ack bookkeeping."""
+
+    def __init__(self, device_id: str, agency_id: str, authenticate: Callable[[], str]):
+        self.device_id, self.agency_id, self.authenticate = device_id, agency_id, authenticate
+        self.received = 0  # lines read so far (valid or not)
+        self.rejected = 0
+        self.pending: deque[int] = deque()  # accepted lines not yet written, oldest first
+        self.eof = False
+        self.error: str | None = None
+        self.wakeup = asyncio.Event()
+
+    @property
+    def acked(self) -> int:
+        return self.pending[0] - 1 if self.pending else self.received
+
+    @property
+    def done(self) -> bool:
+        return self.error is not None or (self.eof and not self.pending)
+
+    def ack(self) -> dict:
+        out = {"acked": self.acked, "rejected": self.rejected}
+        if self.error:
+            out["error"] = self.error
+        return out
+
+_broker = None
+
+def _is_transient(e: Exception) -> bool:
+    return isinstance(e, OperationalError) or (isinstance(e, DBAPIError) and e.connection_invalidated)
+
+def _audit(db, agency_id: str, rows: list[tuple[str, TelemetryIn]], pubsub: bool) -> None:
+    from hakilix.pipeline import audit
+    for (dev_id, resident_id), n in Tally((dev_id, t.resident_id) for dev_id, t in rows).items():
+        audit(db, agency_id=agency_id, actor_device_id=dev_id,
+              action="telemetry.queued" if pubsub else "telemetry.ingest", resource="resident",
+              resource_id=resident_id, detail={"readings": n, "stream": True})
+
+def _persist(agency_id: str, rows: list[tuple[str, TelemetryIn]]) -> list[bool]:
+    """Write one agency's readings in one transaction; returns True per row."""
+    global _broker
+    from hakilix.pipeline import persist_telemetry_batch
+    pubsub = settings.broker_type.lower() == "pubsub"
+    with db_session(tenant_id=agency_id, workload=INGEST) as db:
+        if pubsub:
+            if _broker is None:
+                from hakilix.broker import get_broker
+                _broker = get_broker()
+            for dev_id, t in rows:
+                _broker.publish(settings.pubsub_topic, {"agency_id": agency_id, "device_id": dev_id,
+                                                        "telemetry": t.model_dump(mode="json")},
+                                ordering_key=f"{agency_id}:{t.resident_id}")
+        else:
+            persist_telemetry_batch(db, agency_id, [t for _, t in rows])
+        _audit(db, agency_id, rows, pubsub)
+    return [True] * len(rows)
+
+def _persist_each(agency_id: str, rows: list[tuple[str, TelemetryIn]]) -> list[bool]:
+    """Like ``_persist``, one savepoint per row: rows the database refuses are left out (False)."""
+    from hakilix.pipeline import persist_telemetry_batch
+    ok = []
+    with db_session(tenant_id=agency_id, workload=INGEST) as db:
+        for _, t in rows:
+            try:
+                with db.begin_nested():
+                    persist_telemetry_batch(db, agency_id, [t])
+                ok.append(True)
+            except DBAPIError as e:
+                if _is_transient(e):
+                    raise
+                ok.append(False)
+        _audit(db, agency_id, [r for r, good in zip(rows, ok) if good], False)
+    return ok
+
+class WriteBehind:
+    """Bounded, batching writer shared by the connections of one process (runs on its event loop)."""
+
+    def __init__(self, capacity: int, batch_rows: int, flush_s: float):
+        self.capacity, self.batch_rows, self.flush_s = capacity, batch_rows, flush_s
+        self._queue: deque[tuple[Conn, int, TelemetryIn]] = deque()
+        self._room = capacity
+        self._room_freed = asyncio.Condition()
+        self._ready = asyncio.Event()
+        self._busy = False
+        self._task: asyncio.Task | None = None
+
+    async def submit(self, conn: Conn, group: list[tuple[int, TelemetryIn]]) -> None:
+        n = len(group)
+        if self._room < n:
+            t0 = time.perf_counter()
+            async with self._room_freed:
+                await self._room_freed.wait_for(lambda: self._room >= n)
+            BACKPRESSURE.labels(cause="write_behind").inc(time.perf_counter() - t0)
+        self._room -= n
+        was_empty = not self._queue
+        self._queue.extend((conn, line, t) for line, t in group)
+        BUFFERED.inc(n)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        if was_empty or len(self._queue) >= self.batch_rows:
+            self._ready.set()
+
+    async def _run(self) -> None:
+        while True:
+            if not self._queue:
+                await self._ready.wait()
+            self._ready.clear()
+            if len(self._queue) < self.batch_rows:
+                # Give a partial batch up to flush_s to fill.
+                try:
+                    await asyncio.wait_for(self._ready.wait(), self.flush_s)
+                except asyncio.TimeoutError:
+                    pass
+                self._ready.clear()
+            batch = [self._queue.popleft() for _ in range(min(self.batch_rows, len(self._queue)))]
+            self._busy = True
+            try:
+                outcomes = await self._write(batch)
+            finally:
+                self._busy = False
+            for (conn, _, _), outcome in zip(batch, outcomes):
+                if conn.error:
+                    continue
+                if outcome == "write_failed":
+                    conn.error = outcome
+                else:
+                    conn.pending.popleft()  # FIFO per connection: this batch's lines are its oldest
+                    if outcome == "rejected":
+                        conn.rejected += 1
+                if conn.done:
+                    conn.wakeup.set()
+            self._room += len(batch)
+            BUFFERED.dec(len(batch))
+            async with self._room_freed:
+                self._room_freed.notify_all()
+
+    async def _write(self, batch: list[tuple[Conn, int, TelemetryIn]]) -> list[str | None]:
+        """Outcome per reading: None (written), "rejected" or "write_failed".
+
+        Each agency is written in its own transaction, so one tenant's failure never
+        fails another's readings. A connection's readings all belong to one agency.
+        """
+        groups: dict[str, list[int]] = {}
+        for i, (conn, _, _) in enumerate(batch):
+            groups.setdefault(conn.agency_id, []).append(i)
+        outcomes: list[str | None] = [None] * len(batch)
+        for agency_id, idx in groups.items():
+            rows = [(batch[i][0].device_id, batch[i][2]) for i in idx]
+            for i, outcome in zip(idx, await self._write_agency(agency_id, rows)):
+                outcomes[i] = outcome
+        return outcomes
+
+    async def _write_agency(self, agency_id: str, rows: list[tuple[str, TelemetryIn]]) -> list[str | None]:
+        isolate, attempt = False, 0
+        pubsub = settings.broker_type.lower() == "pubsub"
+        while True:
+            t0 = time.perf_counter()
+            try:
+                ok = await anyio.to_thread.run_sync(_persist_each if isolate else _persist, agency_id, rows)
+                break
+            except Exception as e:
+                if not isolate and not pubsub and not _is_transient(e):
+                    # The database refused a row (e.g. no partition for its time): find it row by row.
+                    isolate = True
+                    continue
+                attempt += 1
+                log.warning("stream_write_failed", agency_id=agency_id, readings=len(rows), attempt=attempt,
+                            attempts=_ATTEMPTS, error=repr(e))
+                if attempt >= _ATTEMPTS:
+                    READINGS.labels(outcome="failed").inc(len(rows))
+                    return ["write_failed"] * len(rows)
+                await asyncio.sleep(0.5 * 2 ** (attempt - 1))
+        FLUSH.observe(time.perf_counter() - t0)
+        written = sum(ok)
+        READINGS.labels(outcome="persisted").inc(written)
+        if written < len(rows):
+            READINGS.labels(outcome="rejected").inc(len(rows) - written)
+            log.warning("stream_readings_rejected", agency_id=agency_id, readings=len(rows) - written)
+        return [None if good else "rejected" for good in ok]
+
+    async def drain(self, timeout_s: float) -> None:
+        deadline = time.monotonic() + timeout_s
+        while (self._queue or self._busy) and time.monotonic() < deadline:
+            self._ready.set()
+            await asyncio.sleep(0.05)
+
+_wb: WriteBehind | None = None
+
+def write_behind() -> WriteBehind:
+    global _wb
+    if _wb is None:
+        _wb = WriteBehind(settings.hakilix_stream_buffer_rows, settings.hakilix_stream_batch_rows,
+                          settings.hakilix_stream_flush_ms / 1000)
+    return _wb
+
+async def drain(timeout_s: float) -> None:
+    """Write what is buffered before the process exits (lines not written stay un-acked)."""
+    if _wb is not None:
+        await _wb.drain(timeout_s)
+
+async def _admit(conn: Conn, n: int) -> None:
+    while True:
+        try:
+            if settings.hakilix_rate_limit_backend == "redis":
+                await anyio.to_thread.run_sync(admission.admit_stream, conn.device_id, conn.agency_id, n)
+            else:
+                admission.admit_stream(conn.device_id, conn.agency_id, n)
+            return
+        except admission.Throttled as e:
+            BACKPRESSURE.labels(cause=e.reason).inc(e.retry_after_s)
+            await asyncio.sleep(e.retry_after_s)
+
+async def _read(conn: Conn, chunks: AsyncIterator[bytes], wb: WriteBehind) -> None:
+    quota = max(1, min(wb.batch_rows, wb.capacity, admission.stream_quota(conn.agency_id)))
+    reauth_at = time.monotonic() + settings.hakilix_stream_reauth_s
+    group: list[tuple[int, TelemetryIn]] = []
+
+    async def hand_over():
+        await _admit(conn, len(group))
+        await wb.submit(conn, group[:])
+        group.clear()
+
+    def parse(line: bytes):
+        if not line.strip():
+            return
+        conn.received += 1
+        try:
+            group.append((conn.received, TelemetryIn.model_validate_json(line)))
+            conn.pending.append(conn.received)
+        except ValidationError:
+            conn.rejected += 1
+            READINGS.labels(outcome="rejected").inc()
+
+    carry = b""
+    try:
+        async for chunk in chunks:
+            lines = (carry + chunk).split(b"\n")
+            carry = lines.pop()
+            if len(carry) > MAX_LINE:
+                raise StreamError("line_too_long")
+            for line in lines:
+                parse(line)
+                if len(group) >= quota:
+                    await hand_over()
+            if group:
+                await hand_over()  # do not hold readings back waiting for the next chunk
+            if time.monotonic() >= reauth_at:
+                try:
+                    await anyio.to_thread.run_sync(conn.authenticate)
+                except Exception:
+                    raise StreamError("device_auth_failed")
+                reauth_at = time.monotonic() + settings.hakilix_stream_reauth_s
+        parse(carry)
+        if group:
+            await hand_over()
+    except StreamError as e:
+        conn.error = str(e)
+    except Exception as e:
+        conn.error = "read_failed"
+        log.warning("stream_read_failed", device_id=conn.device_id, error=repr(e))
+    finally:
+        conn.eof = True
+        conn.wakeup.set()
+
+async def session(conn: Conn, chunks: AsyncIterator[bytes]) -> AsyncIterator[dict]:
+    """Read ``chunks`` (NDJSON bytes) into the write-behind; yield acks until every line is acked or the stream fails."""
+    CONNECTIONS.inc()
+    reader = asyncio.create_task(_read(conn, chunks, write_behind()))
+    ack_s = settings.hakilix_stream_ack_ms / 1000
+    last = 0
+    try:
+        while not conn.done:
+            try:
+                await asyncio.wait_for(conn.wakeup.wait(), ack_s)
+            except asyncio.TimeoutError:
+                pass
+            conn.wakeup.clear()
+            if conn.acked != last and not conn.done:
+                last = conn.acked
+                yield conn.ack()
+        yield conn.ack()
+    finally:
+        reader.cancel()
+        CONNECTIONS.dec()
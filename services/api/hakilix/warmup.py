@@ -0,0 +1,78 @@
+"""Start-up warm-up behind ``GET /v1/ready``.
+
+The API starts serving as soon as it is imported; what the first requests would
+otherwise pay for is done here once per process, in a background thread at
+start-up and again on demand until it succeeds:
+
+- imports deferred at module load (argon2, python-jose, OIDC when enabled)
+- ``HAKILIX_READY_WARM_CONNECTIONS`` connections per DB pool, replica included
+- the replica-lag probe and the OIDC JWKS cache
+
+``/v1/ready`` returns 503 until a run has succeeded, then only checks the DB.
+"""
+from __future__ import annotations
+import threading, time
+
+from sqlalchemy import text
+import structlog
+
+from hakilix import db
+from hakilix.config import settings
+
+log = structlog.get_logger(__name__)
+
+_lock = threading.Lock()
+_state: dict = {"ready": False, "report": None, "error": None}
+
+def _step(report: dict, name: str, fn):
+    t0 = time.perf_counter()
+    out = fn()
+    report[f"{name}_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    return out
+
+def _imports():
+    import jose.jwt  # noqa: F401
+    from hakilix import security
+    security.password_hasher()
+    if settings.oidc_enabled:
+        from hakilix import oidc
+        oidc._get_jwks(settings.oidc_jwks_url)
+
+def warm() -> dict:
+    """Run the warm-up once (concurrent callers wait for it); returns the timing report."""
+    with _lock:
+        if _state["ready"]:
+            return _state["report"]
+        report: dict = {}
+        try:
+            _step(report, "imports", _imports)
+            report["pools"] = _step(report, "pools", lambda: db.warm_pools(settings.hakilix_ready_warm_connections))
+            _step(report, "replica_lag", db.replica_lag_s)
+        except Exception as e:
+            _state["error"] = repr(e)
+            log.error("warmup_failed", error=repr(e))
+            raise
+        _state.update(ready=True, report=report, error=None)
+        log.info("warmup_done", report=report)
+        return report
+
+def warm_in_background() -> None:
+    def run():
+        try:
+            warm()
+        except Exception:
+            pass  # reported by /v1/ready, which retries
+    threading.Thread(target=run, name="hakilix-warmup", daemon=True).start()
+
+def ready() -> tuple[bool, dict]:
+    if not _state["ready"]:
+        try:
+            warm()
+        except Exception as e:
+            return False, {"status": "warming", "error": repr(e)}
+    try:
+        with db.db_session() as s:
+            s.execute(text("SELECT 1"))
+    except Exception as e:
+        return False, {"status": "db_unavailable", "error": repr(e)}
+    return True, {"status": "ready", "warmup": _state["report"]}
@@ -112,8 +112,12 @@ class ApiClient:
         # Backend binds the resident to the caller's tenant (agency_id from JWT).        
         return self._req("POST", "/v1/residents", json_body={"id": resident_id, "display_name": display_name})
 
-    def delete_resident(self, resident_id: str) -> None:
-        self._req("DELETE", f"/v1/residents/{resident_id}")
+    def delete_resident(self, resident_id: str) -> Dict[str, Any]:
+        # 202: the resident is hidden at once, its data is removed by a background job.
+        return self._req("DELETE", f"/v1/residents/{resident_id}") or {}
+
+    def job(self, job_id: str) -> Dict[str, Any]:
+        return self._req("GET", f"/v1/jobs/{job_id}")
 
     def latest_risk(self, resident_id: str) -> Dict[str, Any]:
         return self._req("GET", f"/v1/residents/{resident_id}/latest")
@@ -124,6 +128,16 @@ class ApiClient:
             return resp.get("points") or []
         return resp or []
 
+    def trend(self, resident_id: str, hours: float, resolution: str = "auto") -> Tuple[str, List[Dict[str, Any]]]:
+        end = time.time()
+        params = {
+            "start": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(end - hours * 3600)),
+            "end": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(end)),
+            "resolution": resolution,
+        }
+        resp = self._req("GET", f"/v1/telemetry/{resident_id}/trend", params=params) or {}
+        return resp.get("resolution", resolution), resp.get("points") or []
+
 
 def _badge(level: str) -> str:
     lv = (level or "").lower()
@@ -272,6 +286,14 @@ def _resident_admin(client: ApiClient) -> Tuple[List[Dict[str, Any]], Optional[s
 
     # delete
     st.sidebar.markdown("#### Delete")
+    job_id = st.session_state.get("_delete_job")
+    if job_id:
+        try:
+            job = client.job(job_id)
+            deleted = sum(v for k, v in (job.get("progress") or {}).items() if k.endswith("_deleted"))
+            st.sidebar.caption(f"Last deletion ({job.get('resource_id')}): {job.get('status')}, {deleted} rows removed")
+        except ApiError:
+            pass
     with st.sidebar.form("resident_delete", clear_on_submit=True):
         del_id = st.text_input("Resident ID to delete", value=selected or "", key="resident_delete_id")
         confirm = st.checkbox("Confirm delete", value=False, key="resident_delete_confirm")
@@ -285,8 +307,9 @@ def _resident_admin(client: ApiClient) -> Tuple[List[Dict[str, Any]], Optional[s
             st.sidebar.error("Please confirm delete")
         else:
             try:
-                client.delete_resident(del_id)
-                st.sidebar.success("Deleted")
+                res = client.delete_resident(del_id)
+                st.session_state["_delete_job"] = res.get("job_id")
+                st.sidebar.success("Deletion started")
                 # Attempt to move selection to the next available resident.
                 try:
                     refreshed = client.list_residents()
@@ -410,6 +433,44 @@ def _render_trends(points: List[Dict[str, Any]]) -> None:
             st.line_chart(df.set_index("time")["temp_c"], height=180)
 
 
+# Sidebar label -> hours of history; None = raw recent telemetry.
+TREND_WINDOWS: Dict[str, Optional[float]] = {
+    "Live (raw)": None,
+    "Last 6 hours": 6,
+    "Last 24 hours": 24,
+    "Last 7 days": 24 * 7,
+    "Last 90 days": 24 * 90,
+}
+
+
+def _render_rollup_trends(resolution: str, points: List[Dict[str, Any]]) -> None:
+    if not points:
+        st.caption("No telemetry in this window yet.")
+        return
+
+    import pandas as pd
+
+    df = pd.DataFrame(points)
+    df["bucket"] = pd.to_datetime(df["bucket"], errors="coerce")
+    df = df.sort_values("bucket").set_index("bucket")
+    unit = {"1m": "minute", "1h": "hour", "1d": "day"}.get(resolution, resolution)
+    st.caption(f"Per-{unit} min / avg / max")
+
+    rows = [
+        [("rr", "Resp. rate"), ("spo2", "SpO2"), ("temp_c", "Temp (C)")],
+        [("gait_instability", "Gait instability"), ("intake_ml", "Intake (ml)"), ("sleep_fragmentation", "Sleep fragmentation")],
+    ]
+    for row in rows:
+        cols = st.columns(3)
+        for col, (name, label) in zip(cols, row):
+            series = [f"{name}_{k}" for k in ("min", "avg", "max") if f"{name}_{k}" in df.columns]
+            if not series:
+                continue
+            with col:
+                st.markdown(f"**{label}**")
+                st.line_chart(df[series].apply(pd.to_numeric, errors="coerce"), height=180)
+
+
 def main() -> None:
     st.set_page_config(page_title="Hakilix Clinical", layout="wide")
     st.markdown(f"<style>{_load_css()}</style>", unsafe_allow_html=True)
@@ -433,6 +494,7 @@ def main() -> None:
 
     live = st.sidebar.toggle("Live mode", value=True, key="live_mode")
     refresh_s = st.sidebar.slider("Refresh interval (sec)", min_value=2, max_value=10, value=3, step=1, key="refresh_s")
+    trend_window = st.sidebar.selectbox("Trend window", options=list(TREND_WINDOWS), index=0, key="trend_window")
 
     residents, selected_id = _resident_admin(client)
 
@@ -472,7 +534,14 @@ def main() -> None:
 
         with trends_ph.container():
             st.markdown("### Trends")
-            _render_trends(pts)
+            hours = TREND_WINDOWS.get(trend_window)
+            if hours is None:
+                _render_trends(pts)
+            else:
+                try:
+                    _render_rollup_trends(*client.trend(selected_id, hours))
+                except ApiError as e:
+                    st.error(f"Trend error: {e.detail}")
 
     _live_section()
 
@@ -0,0 +1,317 @@
+"""Streaming alert rules over the risk stream.
+
+    python -m inference.alerts
+
+Consumes the sharded risk stream (``INFERENCE_RISK_STREAM``, published by the
+inference worker for every scored reading) in the ``alerts`` consumer group and
+evaluates the tenant's ``hakilix.alert_rules``: a rule fires when
+``metric <op> threshold`` holds for ``consecutive`` readings in a row.
+
+Rules are compiled per agency into groups sharing (metric, op, consecutive) with
+thresholds sorted. "value > t for the last n readings" is "min(last n) > t", so
+each group keeps one sliding-window min (or max) per resident in a monotonic deque,
+and the rules that start holding are a ``bisect`` range of the thresholds. An event
+costs O(groups x log rules) plus O(alerts raised), independent of rule count per group.
+
+Alerts are edge-triggered (a rule fires when its condition starts holding, not on
+every reading while it holds), and a Redis ``SET NX EX cooldown_s`` key per
+(rule, resident) de-duplicates across restarts, redeliveries and replicas. Fired
+alerts are written to ``hakilix.alerts`` and to the ``ALERTS_STREAM`` stream for
+notifiers. Rules are reloaded every ``ALERT_RULES_REFRESH_S``.
+
+Window state is per process, bounded by ``ALERT_MAX_RESIDENTS`` (LRU) and
+``ALERT_IDLE_TTL_S`` (residents without a reading for that long are dropped); a
+dropped resident's windows refill from its next readings. A batch's window
+updates are rolled back when its alerts cannot be written, so the redelivered
+batch is evaluated from the same state and fires again.
+"""
+from __future__ import annotations
+import bisect, json, os, socket, time
+from collections import OrderedDict, defaultdict, deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from prometheus_client import Counter, start_http_server
+from sqlalchemy import text
+
+from inference.consumer import RISK_STREAM, Entry, consume, engine, install_signal_handlers, r, release_consumer
+from inference.shards import owned_shards, stream_name
+
+GROUP = "alerts"
+CONSUMER = os.environ.get("ALERTS_CONSUMER") or f"alerts-{socket.gethostname()}-{os.getpid()}"
+RULES_REFRESH_S = float(os.environ.get("ALERT_RULES_REFRESH_S", "60"))
+ALERTS_STREAM = os.environ.get("ALERTS_STREAM", "hakilix.alerts")
+ALERTS_STREAM_MAXLEN = int(os.environ.get("ALERTS_STREAM_MAXLEN", "100000"))
+METRICS_PORT = int(os.environ.get("ALERTS_METRICS_PORT", "9118"))
+COOLDOWN_PREFIX = "hakilix.alert:"
+MAX_RESIDENTS = int(os.environ.get("ALERT_MAX_RESIDENTS", "50000"))
+IDLE_TTL_S = float(os.environ.get("ALERT_IDLE_TTL_S", str(48 * 3600)))
+
+METRICS = ("falls_risk", "resp_risk", "dehydration_risk", "delirium_uti_risk", "hr", "spo2", "rr", "temp_c", "intake_ml")
+OPS = (">", ">=", "<", "<=")
+
+ALERTS_FIRED = Counter("hakilix_alerts_fired_total", "Alerts written", ["severity"])
+ALERTS_COOLDOWN = Counter("hakilix_alerts_cooldown_total", "Rule firings suppressed by cool-down")
+
+@dataclass(frozen=True)
+class Rule:
+    id: str
+    agency_id: str
+    name: str
+    metric: str
+    op: str
+    threshold: float
+    consecutive: int = 1
+    cooldown_s: int = 3600
+    severity: str = "high"
+
+@dataclass(frozen=True)
+class Firing:
+    rule: Rule
+    resident_id: str
+    value: float
+
+class RuleGroup:
+    """Rules with the same (metric, op, consecutive), sorted by threshold."""
+    __slots__ = ("key", "metric", "op", "n", "lower", "thresholds", "rules")
+
+    def __init__(self, metric: str, op: str, n: int, rules: list[Rule]):
+        self.key = (metric, op, n)
+        self.metric, self.op, self.n = metric, op, n
+        # ">"/">=" compare the window minimum; "<"/"<=" the maximum.
+        self.lower = op in (">", ">=")
+        self.rules = sorted(rules, key=lambda x: x.threshold)
+        self.thresholds = [x.threshold for x in self.rules]
+
+    def newly_holding(self, prev: float | None, cur: float | None) -> list[Rule]:
+        """Rules that hold for window extreme ``cur`` but did not for ``prev`` (None = window not full)."""
+        if cur is None:
+            return []
+        ths = self.thresholds
+        if self.op == ">":
+            lo, hi = (0 if prev is None else bisect.bisect_left(ths, prev)), bisect.bisect_left(ths, cur)
+        elif self.op == ">=":
+            lo, hi = (0 if prev is None else bisect.bisect_right(ths, prev)), bisect.bisect_right(ths, cur)
+        elif self.op == "<":
+            lo, hi = bisect.bisect_right(ths, cur), (len(ths) if prev is None else bisect.bisect_right(ths, prev))
+        else:
+            lo, hi = bisect.bisect_left(ths, cur), (len(ths) if prev is None else bisect.bisect_left(ths, prev))
+        return self.rules[lo:hi] if hi > lo else []
+
+class Window:
+    """Sliding min (or max) over the last n values, amortised O(1) per push."""
+    __slots__ = ("n", "lower", "seq", "q", "extreme")
+
+    def __init__(self, n: int, lower: bool):
+        self.n, self.lower = n, lower
+        self.seq = 0
+        self.q: deque = deque()  # (seq, value), values monotonic from the front
+        self.extreme: float | None = None  # None until n values have been seen
+
+    def push(self, v: float) -> float | None:
+        q, i = self.q, self.seq
+        if self.lower:
+            while q and q[-1][1] >= v:
+                q.pop()
+        else:
+            while q and q[-1][1] <= v:
+                q.pop()
+        q.append((i, v))
+        if q[0][0] <= i - self.n:
+            q.popleft()
+        self.seq = i + 1
+        self.extreme = q[0][1] if self.seq >= self.n else None
+        return self.extreme
+
+    def copy(self) -> "Window":
+        w = Window(self.n, self.lower)
+        w.seq, w.q, w.extreme = self.seq, deque(self.q), self.extreme
+        return w
+
+def compile_rules(rules: list[Rule]) -> dict[str, list[RuleGroup]]:
+    """metric -> groups for one agency's rules."""
+    buckets: dict[tuple, list[Rule]] = defaultdict(list)
+    for rule in rules:
+        if rule.metric in METRICS and rule.op in OPS and rule.consecutive >= 1:
+            buckets[(rule.metric, rule.op, rule.consecutive)].append(rule)
+    by_metric: dict[str, list[RuleGroup]] = defaultdict(list)
+    for (metric, op, n), members in buckets.items():
+        by_metric[metric].append(RuleGroup(metric, op, n, members))
+    return dict(by_metric)
+
+class RuleEngine:
+    """Per-agency compiled rules plus per-(resident, group) window state; no I/O."""
+
+    def __init__(self, max_residents: int = MAX_RESIDENTS, idle_ttl_s: float = IDLE_TTL_S):
+        self._rules: dict[str, dict[str, list[RuleGroup]]] = {}
+        # (agency, resident) -> (last seen, group key -> Window), least recently seen first;
+        # keyed by group shape so state survives rule reloads.
+        self._state: "OrderedDict[tuple[str, str], tuple[float, dict[tuple, Window]]]" = OrderedDict()
+        self._max = max_residents
+        self._ttl = idle_ttl_s
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._state)
+
+    def set_rules(self, agency_id: str, rules: list[Rule]):
+        self._rules[agency_id] = compile_rules(rules)
+
+    def evaluate(self, agency_id: str, resident_id: str, values: dict[str, float],
+                 undo: dict | None = None) -> list[Firing]:
+        """Push one reading; ``undo`` collects the resident's prior state for ``rollback``."""
+        groups = self._rules.get(agency_id)
+        if not groups:
+            return []
+        key = (agency_id, resident_id)
+        entry = self._state.pop(key, None)
+        if undo is not None and key not in undo:
+            undo[key] = None if entry is None else (entry[0], {k: w.copy() for k, w in entry[1].items()})
+        state = entry[1] if entry is not None else {}
+        self._state[key] = (time.monotonic(), state)
+        while len(self._state) > self._max:
+            self._state.popitem(last=False)
+            self.evicted += 1
+        fired: list[Firing] = []
+        for metric, v in values.items():
+            for g in groups.get(metric, ()):
+                w = state.get(g.key)
+                if w is None:
+                    w = state[g.key] = Window(g.n, g.lower)
+                prev = w.extreme
+                cur = w.push(v)
+                for rule in g.newly_holding(prev, cur):
+                    fired.append(Firing(rule, resident_id, cur))
+        return fired
+
+    def rollback(self, undo: dict):
+        """Restore the residents in ``undo`` to their state before the batch."""
+        for key, entry in undo.items():
+            self._state.pop(key, None)
+            if entry is not None:
+                self._state[key] = (time.monotonic(), entry[1])
+
+    def evict_idle(self, now: float | None = None) -> int:
+        """Drop residents not seen for ``idle_ttl_s``; the LRU order makes this a prefix scan."""
+        cutoff = (now if now is not None else time.monotonic()) - self._ttl
+        n = 0
+        while self._state and next(iter(self._state.values()))[0] < cutoff:
+            self._state.popitem(last=False)
+            n += 1
+        self.evicted += n
+        return n
+
+engine_state = RuleEngine()
+_loaded_at: dict[str, float] = {}
+
+def load_rules(agency_id: str) -> list[Rule]:
+    with engine().begin() as c:
+        c.execute(text("SELECT set_config('app.tenant_id', :tid, true)"), {"tid": agency_id})
+        rows = c.execute(text("""
+            SELECT id, agency_id, name, metric, op, threshold, consecutive, cooldown_s, severity
+            FROM hakilix.alert_rules WHERE enabled
+        """)).mappings().all()
+    return [Rule(**dict(row)) for row in rows]
+
+def ensure_rules(agency_ids: set[str]):
+    now = time.monotonic()
+    for agency_id in agency_ids:
+        if now - _loaded_at.get(agency_id, float("-inf")) >= RULES_REFRESH_S:
+            engine_state.set_rules(agency_id, load_rules(agency_id))
+            _loaded_at[agency_id] = now
+
+def _values(fields: dict) -> dict[str, float]:
+    out = {}
+    for k in METRICS:
+        v = fields.get(k)
+        if v not in (None, ""):
+            out[k] = float(v)
+    return out
+
+def gate(firings: list[tuple[Firing, dict]]) -> list[tuple[Firing, dict]]:
+    """Keep firings whose (rule, resident) is not cooling down; starts the cool-down for those kept."""
+    if not firings:
+        return []
+    pipe = r.pipeline(transaction=False)
+    for f, _ in firings:
+        pipe.set(f"{COOLDOWN_PREFIX}{f.rule.id}:{f.rule.agency_id}:{f.resident_id}", "1",
+                 nx=True, ex=max(1, int(f.rule.cooldown_s)))
+    kept = [item for item, ok in zip(firings, pipe.execute()) if ok]
+    ALERTS_COOLDOWN.inc(len(firings) - len(kept))
+    return kept
+
+INSERT_ALERT = text("""
+    INSERT INTO hakilix.alerts(time, agency_id, resident_id, rule_id, metric, value, threshold, severity, model_version, detail)
+    VALUES (:t,:aid,:rid,:rule,:m,:v,:th,:sev,:mv,:d)
+""")
+
+def write_alerts(kept: list[tuple[Firing, dict]]):
+    by_agency: dict[str, list[dict]] = defaultdict(list)
+    for f, fields in kept:
+        rule = f.rule
+        by_agency[rule.agency_id].append({
+            "t": datetime.fromisoformat(fields["time"].replace("Z", "+00:00")) if fields.get("time") else datetime.now(timezone.utc),
+            "aid": rule.agency_id, "rid": f.resident_id, "rule": rule.id, "m": rule.metric, "v": f.value,
+            "th": rule.threshold, "sev": rule.severity, "mv": fields.get("model_version"),
+            "d": json.dumps({"rule": rule.name, "op": rule.op, "consecutive": rule.consecutive}),
+        })
+    with engine().begin() as c:
+        for agency_id, params in by_agency.items():
+            c.execute(text("SELECT set_config('app.tenant_id', :tid, true)"), {"tid": agency_id})
+            c.execute(INSERT_ALERT, params)
+    pipe = r.pipeline(transaction=False)
+    for params in by_agency.values():
+        for p in params:
+            pipe.xadd(ALERTS_STREAM, {"agency_id": p["aid"], "resident_id": p["rid"], "rule_id": p["rule"],
+                                      "metric": p["m"], "value": p["v"], "threshold": p["th"],
+                                      "severity": p["sev"], "time": p["t"].isoformat()},
+                      maxlen=ALERTS_STREAM_MAXLEN, approximate=True)
+    pipe.execute()
+
+def handle(entries: list[Entry], stream: str) -> list[str]:
+    """Evaluate a batch in stream order; returns ids safe to acknowledge."""
+    ensure_rules({f.get("agency_id", "") for _, f in entries} - {""})
+    engine_state.evict_idle()
+    firings: list[tuple[Firing, dict]] = []
+    undo: dict = {}
+    for _, fields in entries:
+        agency_id, resident_id = fields.get("agency_id"), fields.get("resident_id")
+        if not agency_id or not resident_id:
+            continue
+        for f in engine_state.evaluate(agency_id, resident_id, _values(fields), undo):
+            firings.append((f, fields))
+    try:
+        kept = gate(firings)
+    except Exception:
+        engine_state.rollback(undo)
+        raise
+    if kept:
+        try:
+            write_alerts(kept)
+        except Exception:
+            # Release the cool-down keys and rewind the windows so the redelivered batch fires again.
+            engine_state.rollback(undo)
+            r.delete(*{f"{COOLDOWN_PREFIX}{f.rule.id}:{f.rule.agency_id}:{f.resident_id}" for f, _ in kept})
+            raise
+        for f, _ in kept:
+            ALERTS_FIRED.labels(severity=f.rule.severity).inc()
+    return [mid for mid, _ in entries]
+
+def main():
+    if not RISK_STREAM:
+        raise SystemExit("INFERENCE_RISK_STREAM is disabled; nothing to consume")
+    engine()
+    install_signal_handlers()
+    if METRICS_PORT > 0:
+        try:
+            start_http_server(METRICS_PORT)
+        except OSError as e:
+            print("metrics exporter disabled:", e)
+    streams = [stream_name(s, base=RISK_STREAM) for s in owned_shards()]
+    print("Alert engine started:", CONSUMER, "streams:", ",".join(streams))
+    consume(handle, consumer=CONSUMER, streams=streams, group=GROUP)
+    release_consumer(CONSUMER, streams, GROUP)
+    print("Alert engine drained:", CONSUMER)
+
+if __name__ == "__main__":
+    main()
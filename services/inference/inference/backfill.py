@@ -0,0 +1,216 @@
+"""Re-score historical telemetry with a model version and write its risk_events.
+
+    python -m inference.backfill --agency A-001 [--agency A-002] --start 2026-01-01 --end 2026-04-01
+        [--model-version hakilix_risk_v2] [--resident R-001] [--workers 4] [--chunk-hours 24]
+        [--max-rows-per-s 2000] [--checkpoint backfill.json]
+
+Work is split into one unit per (agency, resident); units run in parallel worker
+processes, and each walks its time range chunk by chunk in time order so the
+rolling features see readings in the same order the live consumer did. Each unit
+first replays ``ROLLING_WINDOW_S`` of telemetry before its start (unscored) to warm
+the rolling state.
+
+A chunk is scored with ``predict_batch`` and written in one transaction that first
+deletes the rows it is about to replace (same resident, model_version and time
+range), so re-running a chunk never duplicates rows. Rows keep the telemetry
+timestamp, not the backfill time.
+
+Progress (the end of the last committed chunk per unit) is written to the
+``--checkpoint`` JSON file; re-running the same command resumes from it.
+``--max-rows-per-s`` caps the total write rate across all workers to protect the
+live database.
+"""
+from __future__ import annotations
+import argparse, json, os, time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from multiprocessing import Manager
+from pathlib import Path
+from queue import Empty
+
+from sqlalchemy import create_engine, text
+
+from inference.consumer import DATABASE_URL_APP, engine
+from inference.features import extract_features
+from inference.model import RiskModel
+from inference.registry import ModelRegistry
+from inference.rolling import WINDOW_S, RollingFeatureStore
+from inference.risk_events import EXPLAIN, INSERT_RISK
+
+CHECKPOINT_EVERY_S = 5.0
+
+SELECT_TELEMETRY = text("""
+    SELECT time, hr, spo2, rr, temp_c, gait_instability, orthostatic_hypotension, night_wandering,
+           intake_ml, sleep_fragmentation, agitation, toileting_freq
+    FROM hakilix.telemetry
+    WHERE agency_id=:aid AND resident_id=:rid AND time >= :a AND time < :b
+    ORDER BY time
+""")
+
+DELETE_RISK = text("""
+    DELETE FROM hakilix.risk_events
+    WHERE agency_id=:aid AND resident_id=:rid AND model_version=:mv AND time >= :a AND time < :b
+""")
+
+# Per worker process, set by _init_worker.
+_eng = None
+_model: RiskModel | None = None
+_progress = None
+_rate = 0.0
+
+def _parse_time(v: str) -> datetime:
+    dt = datetime.fromisoformat(v.replace("Z", "+00:00"))
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+def _init_worker(model_path: str, progress, rate: float):
+    global _eng, _model, _progress, _rate
+    _eng = create_engine(DATABASE_URL_APP, future=True, pool_pre_ping=True, pool_size=1, max_overflow=0)
+    _model = RiskModel(model_path)
+    _progress = progress
+    _rate = rate
+
+def _readings(c, agency_id: str, resident_id: str, a: datetime, b: datetime) -> list[dict]:
+    rows = c.execute(SELECT_TELEMETRY, {"aid": agency_id, "rid": resident_id, "a": a, "b": b})
+    # NULL columns behave like keys missing from a live payload.
+    return [{k: v for k, v in row._mapping.items() if v is not None} for row in rows]
+
+def run_unit(agency_id: str, resident_id: str, start: str, end: str, chunk_hours: float) -> tuple[str, int]:
+    """Backfill one resident from ``start`` (the range start or its checkpoint) to ``end``."""
+    key = RollingFeatureStore.key(agency_id, resident_id)
+    a, end_t = _parse_time(start), _parse_time(end)
+    step = timedelta(hours=chunk_hours)
+    rolling = RollingFeatureStore(None)
+    written = 0
+    with _eng.connect() as c:
+        c.execute(text("SELECT set_config('app.tenant_id', :tid, false)"), {"tid": agency_id})
+        for t in _readings(c, agency_id, resident_id, a - timedelta(seconds=WINDOW_S), a):
+            rolling.update(agency_id, resident_id, t)
+        # Commit (not rollback) so the session-level tenant setting survives.
+        c.commit()
+        while a < end_t:
+            b = min(a + step, end_t)
+            began = time.monotonic()
+            readings = _readings(c, agency_id, resident_id, a, b)
+            c.commit()
+            params = []
+            if readings:
+                xs = [extract_features(t).to_array() + rolling.update(agency_id, resident_id, t) for t in readings]
+                for t, sc in zip(readings, _model.predict_batch(xs).tolist()):
+                    params.append({"t": t["time"], "aid": agency_id, "rid": resident_id,
+                                   "f": sc[0], "r": sc[1], "d": sc[2], "u": sc[3],
+                                   "mv": _model.version, "e": EXPLAIN})
+            with c.begin():
+                c.execute(DELETE_RISK, {"aid": agency_id, "rid": resident_id, "mv": _model.version, "a": a, "b": b})
+                if params:
+                    c.execute(INSERT_RISK, params)
+            written += len(params)
+            _progress.put((key, b.isoformat(), len(params)))
+            if _rate > 0 and params:
+                # Spread this worker's share of the global rate over the chunk.
+                pause = len(params) / _rate - (time.monotonic() - began)
+                if pause > 0:
+                    time.sleep(pause)
+            a = b
+    return key, written
+
+def list_residents(agency_id: str, only: list[str] | None) -> list[str]:
+    with engine().connect() as c:
+        c.execute(text("SELECT set_config('app.tenant_id', :tid, false)"), {"tid": agency_id})
+        ids = [row[0] for row in c.execute(text("SELECT id FROM hakilix.residents WHERE deleted_at IS NULL ORDER BY id"))]
+    return [i for i in ids if i in only] if only else ids
+
+def load_checkpoint(path: Path, header: dict) -> dict[str, str]:
+    if not path.exists():
+        return {}
+    data = json.loads(path.read_text())
+    found = {k: data.get(k) for k in header}
+    if found != header:
+        raise SystemExit(f"{path} belongs to a different backfill ({found}); pass another --checkpoint or delete it")
+    return data.get("units", {})
+
+def save_checkpoint(path: Path, header: dict, units: dict[str, str]):
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps({**header, "units": units}, indent=1, sort_keys=True))
+    os.replace(tmp, path)
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--agency", action="append", required=True)
+    ap.add_argument("--resident", action="append", help="limit to these residents (repeatable)")
+    ap.add_argument("--start", required=True)
+    ap.add_argument("--end", required=True)
+    ap.add_argument("--model-version", help="model stem in HAKILIX_MODEL_DIR (default: the active model)")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--chunk-hours", type=float, default=24.0)
+    ap.add_argument("--max-rows-per-s", type=float, default=0.0, help="total across workers; 0 = unthrottled")
+    ap.add_argument("--checkpoint")
+    args = ap.parse_args()
+
+    start, end = _parse_time(args.start), _parse_time(args.end)
+    if end <= start:
+        raise SystemExit("--end must be after --start")
+    registry = ModelRegistry(pin=args.model_version or "")
+    path = registry.select()
+    if path is None:
+        raise SystemExit(f"model {args.model_version or '(active)'} not found in {registry.model_dir}")
+    version = path.stem
+
+    header = {"model_version": version, "start": start.isoformat(), "end": end.isoformat()}
+    ckpt = Path(args.checkpoint or f"backfill_{version}.json")
+    done = load_checkpoint(ckpt, header)
+
+    units = []
+    for agency_id in args.agency:
+        for resident_id in list_residents(agency_id, args.resident):
+            key = RollingFeatureStore.key(agency_id, resident_id)
+            resume = done.get(key, header["start"])
+            if _parse_time(resume) < end:
+                units.append((agency_id, resident_id, resume))
+    print(f"backfill {version} {header['start']}..{header['end']}: {len(units)} unit(s) to run, "
+          f"{len(done)} with progress in {ckpt}")
+
+    workers = max(1, min(args.workers, len(units) or 1))
+    rate = args.max_rows_per_s / workers if args.max_rows_per_s > 0 else 0.0
+    rows, began, failures = 0, time.monotonic(), 0
+    with Manager() as mgr:
+        progress = mgr.Queue()
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(str(path), progress, rate)) as pool:
+            futures = {pool.submit(run_unit, aid, rid, resume, header["end"], args.chunk_hours): (aid, rid)
+                       for aid, rid, resume in units}
+            pending, next_save = set(futures), time.monotonic() + CHECKPOINT_EVERY_S
+
+            def drain(timeout: float):
+                nonlocal rows
+                try:
+                    while True:
+                        key, upto, n = progress.get(timeout=timeout)
+                        done[key] = upto
+                        rows += n
+                        timeout = 0
+                except Empty:
+                    pass
+
+            while pending:
+                drain(1.0)
+                for f in [f for f in pending if f.done()]:
+                    pending.discard(f)
+                    if f.exception() is not None:
+                        failures += 1
+                        print("unit failed:", futures[f], f.exception())
+                if time.monotonic() >= next_save:
+                    save_checkpoint(ckpt, header, done)
+                    next_save = time.monotonic() + CHECKPOINT_EVERY_S
+                    elapsed = time.monotonic() - began
+                    print(f"  {rows} rows, {len(units) - len(pending)}/{len(units)} units, "
+                          f"{rows / elapsed if elapsed else 0:.0f} rows/s")
+            drain(0.1)
+    save_checkpoint(ckpt, header, done)
+    elapsed = time.monotonic() - began
+    print(json.dumps({"model_version": version, "units": len(units), "failed_units": failures, "rows": rows,
+                      "seconds": round(elapsed, 1), "rows_per_s": round(rows / elapsed, 1) if elapsed else None,
+                      "checkpoint": str(ckpt)}))
+    if failures:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
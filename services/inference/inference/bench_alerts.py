@@ -0,0 +1,108 @@
+"""Alert rule evaluation throughput.
+
+    python -m inference.bench_alerts [--rules 10000] [--residents 10000] [--agencies 1] [--events 200000]
+
+Builds random rules (every metric/op, 1-5 consecutive readings) and feeds
+random-walk readings round-robin across residents through ``RuleEngine``, with no
+Redis or database. A naive evaluator (every rule, last-n history per resident)
+replays the first ``--check-events`` readings to confirm both raise the same
+alerts and to give a baseline per-event cost.
+"""
+from __future__ import annotations
+import argparse, json, random, time
+from collections import deque
+
+from inference.alerts import METRICS, OPS, Rule, RuleEngine
+
+_CMP = {">": lambda a, b: a > b, ">=": lambda a, b: a >= b, "<": lambda a, b: a < b, "<=": lambda a, b: a <= b}
+
+def make_rules(n: int, agencies: list[str], rng: random.Random) -> list[Rule]:
+    rules = []
+    for i in range(n):
+        op = rng.choice(OPS)
+        # Clinical rules watch the tails: high thresholds for ">", low ones for "<".
+        threshold = rng.uniform(0.6, 0.99) if op in (">", ">=") else rng.uniform(0.01, 0.4)
+        rules.append(Rule(id=f"rule-{i}", agency_id=agencies[i % len(agencies)], name=f"rule {i}",
+                          metric=rng.choice(METRICS), op=op, threshold=round(threshold, 3),
+                          consecutive=rng.randint(1, 5)))
+    return rules
+
+def make_events(n: int, residents: list[tuple[str, str]], rng: random.Random):
+    """Mean-reverting readings around 0.5 with occasional excursions into the tails."""
+    level = {key: {m: 0.5 for m in METRICS} for key in residents}
+    for i in range(n):
+        key = residents[i % len(residents)]
+        cur = level[key]
+        for m in METRICS:
+            v = cur[m] + 0.2 * (0.5 - cur[m]) + rng.gauss(0.0, 0.03)
+            if rng.random() < 0.01:
+                v += rng.choice((-0.4, 0.4))
+            cur[m] = min(1.0, max(0.0, v))
+        yield key, dict(cur)
+
+def naive(rules: list[Rule], events) -> tuple[float, set]:
+    by_agency: dict[str, list[Rule]] = {}
+    for rule in rules:
+        by_agency.setdefault(rule.agency_id, []).append(rule)
+    history: dict[tuple, deque] = {}
+    holding: set = set()
+    fired = set()
+    start = time.perf_counter()
+    for i, ((agency_id, resident_id), values) in enumerate(events):
+        for rule in by_agency.get(agency_id, ()):
+            h = history.setdefault((resident_id, rule.id), deque(maxlen=rule.consecutive))
+            h.append(values[rule.metric])
+            key = (resident_id, rule.id)
+            ok = len(h) == rule.consecutive and all(_CMP[rule.op](v, rule.threshold) for v in h)
+            if ok and key not in holding:
+                fired.add((i, rule.id))
+            (holding.add if ok else holding.discard)(key)
+    return time.perf_counter() - start, fired
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rules", type=int, default=10000)
+    ap.add_argument("--residents", type=int, default=10000)
+    ap.add_argument("--agencies", type=int, default=1)
+    ap.add_argument("--events", type=int, default=200000)
+    ap.add_argument("--check-events", type=int, default=500)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    agencies = [f"A-{i:03d}" for i in range(1, args.agencies + 1)]
+    residents = [(agencies[i % len(agencies)], f"R-{i:05d}") for i in range(args.residents)]
+    rules = make_rules(args.rules, agencies, rng)
+
+    t0 = time.perf_counter()
+    eng = RuleEngine()
+    for agency_id in agencies:
+        eng.set_rules(agency_id, [rule for rule in rules if rule.agency_id == agency_id])
+    compile_s = time.perf_counter() - t0
+
+    events = list(make_events(args.events, residents, rng))
+    fired = 0
+    start = time.perf_counter()
+    for (agency_id, resident_id), values in events:
+        fired += len(eng.evaluate(agency_id, resident_id, values))
+    elapsed = time.perf_counter() - start
+
+    check = events[:args.check_events]
+    ref = RuleEngine()
+    for agency_id in agencies:
+        ref.set_rules(agency_id, [rule for rule in rules if rule.agency_id == agency_id])
+    compiled = {(i, f.rule.id) for i, ((aid, rid), v) in enumerate(check) for f in ref.evaluate(aid, rid, v)}
+    naive_s, expected = naive(rules, check)
+
+    groups = sum(len(gs) for a in agencies for gs in eng._rules[a].values())
+    print(json.dumps({
+        "rules": args.rules, "residents": args.residents, "agencies": args.agencies, "groups": groups,
+        "compile_ms": round(compile_s * 1e3, 1), "events": args.events, "alerts": fired,
+        "alerts_per_event": round(fired / args.events, 3),
+        "events_per_s": round(args.events / elapsed), "us_per_event": round(elapsed * 1e6 / args.events, 2),
+        "naive_us_per_event": round(naive_s * 1e6 / len(check), 2) if check else None,
+        "matches_naive": compiled == expected,
+    }))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Consumer scaling / crash-recovery benchmark against a real Redis.
+
+    REDIS_URL=redis://localhost:6379/0 python -m inference.bench_consumers --messages 20000 --procs 1,2,4
+
+For each K a fresh stream is filled, K consumer processes drain it through
+``consumer.consume`` with a handler that simulates the per-batch DB commit, and
+one consumer is SIGKILLed half-way through. Survivors must XAUTOCLAIM its
+pending entries; the run fails if any message is never acknowledged.
+"""
+from __future__ import annotations
+import argparse, json, multiprocessing as mp, os, signal, time, uuid
+
+from inference import consumer
+
+def _fill(stream: str, n: int):
+    pipe = consumer.r.pipeline(transaction=False)
+    for i in range(n):
+        pipe.xadd(stream, {"agency_id": "A-001", "resident_id": f"R-{i % 1000:04d}", "payload": json.dumps({"seq": i})})
+        if i % 1000 == 999:
+            pipe.execute()
+    pipe.execute()
+
+def _run_consumer(stream: str, group: str, done_key: str, name: str, batch_ms: float):
+    def handle(entries, stream):
+        time.sleep(batch_ms / 1000.0)  # stands in for the risk_events commit
+        ids = [mid for mid, _ in entries]
+        consumer.r.sadd(done_key, *ids)
+        return ids
+    consumer.install_signal_handlers()
+    consumer.consume(handle=handle, consumer=name, streams=[stream], group=group,
+                   claim_idle_ms=500, claim_interval_s=0.5)
+
+def run(k: int, messages: int, batch_ms: float, kill: bool) -> dict:
+    tag = uuid.uuid4().hex[:8]
+    stream, group, done_key = f"bench.telemetry.{tag}", "bench", f"bench.done.{tag}"
+    consumer.ensure_group(stream, group)
+    _fill(stream, messages)
+
+    ctx = mp.get_context("fork")
+    procs = [ctx.Process(target=_run_consumer, args=(stream, group, done_key, f"bench-{i}", batch_ms)) for i in range(k)]
+    start = time.perf_counter()
+    for p in procs:
+        p.start()
+
+    killed = False
+    while True:
+        done = consumer.r.scard(done_key)
+        if kill and not killed and k > 1 and done >= messages // 2:
+            os.kill(procs[0].pid, signal.SIGKILL)
+            killed = True
+        pending = consumer.r.xpending(stream, group)["pending"]
+        if done >= messages and pending == 0:
+            break
+        if time.perf_counter() - start > 600:
+            break
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - start
+
+    for p in procs:
+        if p.is_alive():
+            os.kill(p.pid, signal.SIGTERM)
+    for p in procs:
+        p.join(timeout=10)
+
+    done = consumer.r.scard(done_key)
+    consumer.r.delete(stream, done_key)
+    return {"consumers": k, "messages": messages, "acked": done, "lost": messages - done,
+            "killed_one": killed, "seconds": round(elapsed, 3), "msgs_per_s": round(done / elapsed, 1)}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--messages", type=int, default=20000)
+    ap.add_argument("--procs", default="1,2,4")
+    ap.add_argument("--batch-ms", type=float, default=5.0, help="simulated commit latency per batch")
+    ap.add_argument("--no-kill", action="store_true")
+    args = ap.parse_args()
+
+    failed = False
+    for k in [int(x) for x in args.procs.split(",")]:
+        res = run(k, args.messages, args.batch_ms, kill=not args.no_kill)
+        print(json.dumps(res))
+        failed = failed or res["lost"] != 0
+    if failed:
+        raise SystemExit("message loss detected")
+
+if __name__ == "__main__":
+    main()
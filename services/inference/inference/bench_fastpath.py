@@ -0,0 +1,59 @@
+"""NumPy fast path vs onnxruntime for the risk model.
+
+    python -m inference.bench_fastpath [--model /app/models/hakilix_risk_v1.onnx] [--batches 1,32,1024]
+
+Without ``--model`` the reference graph from ``bootstrap_model.build_model`` is
+generated in a temp dir. Prints per-call and per-row latency for both backends
+and the max absolute difference between their outputs.
+"""
+from __future__ import annotations
+import argparse, json, tempfile, time
+from pathlib import Path
+import numpy as np
+
+def _time(fn, x, min_s: float = 0.5) -> float:
+    fn(x)  # warm-up
+    n, start = 0, time.perf_counter()
+    while True:
+        fn(x)
+        n += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_s:
+            return elapsed / n
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--model")
+    ap.add_argument("--batches", default="1,32,1024")
+    args = ap.parse_args()
+
+    from inference import model as model_mod
+    from inference.bootstrap_model import build_model
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.model
+        if not path:
+            path = str(Path(tmp) / "hakilix_risk_v1.onnx")
+            build_model(Path(path))
+        model_mod.FASTPATH = True
+        model_mod.FASTPATH_MAX_BATCH = 1 << 30  # measure the NumPy path at every size
+        fast = model_mod.RiskModel(path)
+        model_mod.FASTPATH = False
+        ort = model_mod.RiskModel(path)
+        if fast.backend != "numpy":
+            raise SystemExit(f"graph not supported by the fast path (backend={fast.backend})")
+
+        rng = np.random.default_rng(0)
+        for n in [int(b) for b in args.batches.split(",")]:
+            x = rng.random((n, fast.n_inputs), dtype=np.float32)
+            t_ort, t_fast = _time(ort.predict_batch, x), _time(fast.predict_batch, x)
+            diff = float(np.max(np.abs(ort.predict_batch(x) - fast.predict_batch(x))))
+            print(json.dumps({
+                "batch": n,
+                "onnxruntime_us": round(t_ort * 1e6, 2), "numpy_us": round(t_fast * 1e6, 2),
+                "onnxruntime_us_per_row": round(t_ort * 1e6 / n, 3), "numpy_us_per_row": round(t_fast * 1e6 / n, 3),
+                "speedup": round(t_ort / t_fast, 2), "max_abs_diff": diff,
+            }))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Sharded-stream benchmark at fleet scale against a real Redis.
+
+    REDIS_URL=redis://localhost:6379/0 python -m inference.bench_shards --residents 10000 --readings 100000 --shards 1,2,4,8
+
+For each K: readings for ``--residents`` residents are routed with ``shard_for``
+onto K fresh streams, K consumer processes (one owner per shard) drain them with
+a handler that simulates the per-batch commit, and every consumer checks that
+each resident's sequence numbers arrive strictly increasing. Also prints the
+shard balance (max/mean residents per shard).
+"""
+from __future__ import annotations
+import argparse, json, multiprocessing as mp, time, uuid
+from collections import Counter
+
+from inference import consumer
+from inference.shards import shard_for
+
+AGENCY = "A-001"
+
+def _resident(i: int) -> str:
+    return f"R-{i:05d}"
+
+def balance(residents: int, k: int) -> float:
+    counts = Counter(shard_for(AGENCY, _resident(i), k) for i in range(residents))
+    return max(counts.values()) / (residents / k)
+
+def _fill(streams: list[str], residents: int, readings: int, k: int):
+    pipe = consumer.r.pipeline(transaction=False)
+    seq: Counter = Counter()
+    for n in range(readings):
+        rid = _resident(n % residents)
+        seq[rid] += 1
+        pipe.xadd(streams[shard_for(AGENCY, rid, k)],
+                  {"agency_id": AGENCY, "resident_id": rid, "payload": json.dumps({"seq": seq[rid]})})
+        if n % 2000 == 1999:
+            pipe.execute()
+    pipe.execute()
+
+def _run_owner(stream: str, group: str, done_key: str, errors_key: str, batch_ms: float):
+    last: dict[str, int] = {}
+    def handle(entries, stream):
+        time.sleep(batch_ms / 1000.0)  # stands in for the risk_events commit
+        for _, f in entries:
+            s = json.loads(f["payload"])["seq"]
+            if s <= last.get(f["resident_id"], 0):
+                consumer.r.incr(errors_key)
+            last[f["resident_id"]] = s
+        consumer.r.incrby(done_key, len(entries))
+        return [mid for mid, _ in entries]
+    consumer.install_signal_handlers()
+    consumer.consume(handle=handle, consumer=f"owner-{stream}", streams=[stream], group=group)
+
+def run(k: int, residents: int, readings: int, batch_ms: float) -> dict:
+    tag = uuid.uuid4().hex[:8]
+    streams = [f"bench.shard.{tag}.{s}" for s in range(k)]
+    group, done_key, errors_key = "bench", f"bench.done.{tag}", f"bench.order_errors.{tag}"
+    for s in streams:
+        consumer.ensure_group(s, group)
+    _fill(streams, residents, readings, k)
+
+    ctx = mp.get_context("fork")
+    procs = [ctx.Process(target=_run_owner, args=(s, group, done_key, errors_key, batch_ms)) for s in streams]
+    start = time.perf_counter()
+    for p in procs:
+        p.start()
+    while int(consumer.r.get(done_key) or 0) < readings and time.perf_counter() - start < 900:
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - start
+    for p in procs:
+        p.terminate()
+        p.join(timeout=10)
+
+    done = int(consumer.r.get(done_key) or 0)
+    errors = int(consumer.r.get(errors_key) or 0)
+    consumer.r.delete(*streams, done_key, errors_key)
+    return {"shards": k, "residents": residents, "readings": readings, "processed": done,
+            "order_violations": errors, "max_over_mean": round(balance(residents, k), 3),
+            "seconds": round(elapsed, 3), "msgs_per_s": round(done / elapsed, 1)}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--residents", type=int, default=10000)
+    ap.add_argument("--readings", type=int, default=100000)
+    ap.add_argument("--shards", default="1,2,4,8")
+    ap.add_argument("--batch-ms", type=float, default=5.0, help="simulated commit latency per batch")
+    args = ap.parse_args()
+    for k in [int(x) for x in args.shards.split(",")]:
+        print(json.dumps(run(k, args.residents, args.readings, args.batch_ms)))
+
+if __name__ == "__main__":
+    main()
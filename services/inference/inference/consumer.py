@@ -0,0 +1,120 @@
+"""Redis stream consumer loop and the connections shared by the stream consumers.
+
+The inference worker and the alert engine both consume sharded streams in a
+consumer group with at-least-once delivery. The loop, XAUTOCLAIM recovery,
+signal handling, the Redis client and the app-role engine live here so that
+consumers other than the worker do not load its model registry, rolling store
+and emission policy at import.
+"""
+from __future__ import annotations
+import os, signal, threading, time
+from typing import Callable
+
+import redis
+from sqlalchemy import create_engine
+
+from inference.shards import BASE_STREAM
+
+REDIS_URL = os.environ.get("REDIS_URL", "redis://redis:6379/0")
+DATABASE_URL_APP = os.environ.get("DATABASE_URL_APP")
+BATCH_SIZE = int(os.environ.get("INFERENCE_BATCH_SIZE", "50"))
+BLOCK_MS = int(os.environ.get("INFERENCE_BLOCK_MS", "2000"))
+# Entries pending longer than this on any consumer are considered orphaned.
+CLAIM_IDLE_MS = int(os.environ.get("INFERENCE_CLAIM_IDLE_MS", "60000"))
+CLAIM_INTERVAL_S = float(os.environ.get("INFERENCE_CLAIM_INTERVAL_S", "15"))
+# Every scored reading (written or suppressed) is republished here for the alert
+# rule engine, sharded like the telemetry streams. Empty disables it.
+RISK_STREAM = os.environ.get("INFERENCE_RISK_STREAM", "hakilix.risk")
+# The worker parks entries that keep failing here; inference.dlq inspects and replays them.
+DLQ_STREAM = os.environ.get("INFERENCE_DLQ_STREAM", f"{BASE_STREAM}.dlq")
+
+r = redis.Redis.from_url(REDIS_URL, decode_responses=True)
+_eng = None
+_stop = threading.Event()
+
+Entry = tuple[str, dict]
+
+def engine():
+    global _eng
+    if _eng is None:
+        if not DATABASE_URL_APP:
+            raise SystemExit("DATABASE_URL_APP is required")
+        _eng = create_engine(DATABASE_URL_APP, future=True, pool_pre_ping=True)
+    return _eng
+
+def ensure_group(stream: str, group: str):
+    try:
+        r.xgroup_create(stream, group, id="0-0", mkstream=True)
+    except Exception:
+        pass
+
+def request_stop(signum=None, frame=None):
+    _stop.set()
+
+def install_signal_handlers():
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+def claim_stale(consumer: str, stream: str, group: str, idle_ms: int = CLAIM_IDLE_MS) -> list[Entry]:
+    """XAUTOCLAIM entries left pending by crashed or stuck consumers."""
+    claimed: list[Entry] = []
+    cursor = "0-0"
+    while len(claimed) < BATCH_SIZE:
+        res = r.xautoclaim(stream, group, consumer, idle_ms, start_id=cursor, count=BATCH_SIZE)
+        cursor, entries = res[0], res[1]
+        # Entries trimmed from the stream come back as None payloads.
+        claimed.extend((mid, f) for mid, f in entries if f is not None)
+        if cursor == "0-0":
+            break
+    return claimed
+
+def consume(handle: Callable[[list[Entry], str], list[str]], consumer: str, streams: list[str], group: str,
+            claim_idle_ms: int = CLAIM_IDLE_MS, claim_interval_s: float = CLAIM_INTERVAL_S):
+    """Consume until a stop is requested, then return after the in-flight batch.
+
+    Each stream is handled batch by batch in entry order, so per-resident ordering
+    holds as long as a shard stream has a single owner.
+    """
+    for stream in streams:
+        ensure_group(stream, group)
+    # Our own pending list first (restart under the same name), then new entries.
+    read_ids = {stream: "0" for stream in streams}
+    next_claim = 0.0
+    while not _stop.is_set():
+        try:
+            batches: list[tuple[str, list[Entry]]] = []
+            if time.monotonic() >= next_claim:
+                for stream in streams:
+                    claimed = claim_stale(consumer, stream, group, claim_idle_ms)
+                    if claimed:
+                        batches.append((stream, claimed))
+                next_claim = time.monotonic() + claim_interval_s
+            if not batches:
+                history = any(v != ">" for v in read_ids.values())
+                msgs = r.xreadgroup(group, consumer, read_ids, count=BATCH_SIZE, block=None if history else BLOCK_MS)
+                got = {stream: [(mid, f) for mid, f in batch if f] for stream, batch in (msgs or [])}
+                for stream, last in list(read_ids.items()):
+                    if last == ">":
+                        continue
+                    # Walk our pending history once; anything left unacked is retried via XAUTOCLAIM.
+                    entries = got.get(stream)
+                    read_ids[stream] = entries[-1][0] if entries else ">"
+                batches = [(stream, entries) for stream, entries in got.items() if entries]
+            for stream, entries in batches:
+                ids = handle(entries, stream)
+                # At-least-once: entries are only acknowledged after the batch commit.
+                if ids:
+                    r.xack(stream, group, *ids)
+        except Exception as e:
+            print("inference error:", e)
+            _stop.wait(2)
+
+def release_consumer(consumer: str, streams: list[str], group: str):
+    """Remove an idle consumer from the group(s); keeps it where it still owns entries."""
+    for stream in streams:
+        try:
+            if r.xpending_range(stream, group, min="-", max="+", count=1, consumername=consumer):
+                continue
+            r.xgroup_delconsumer(stream, group, consumer)
+        except Exception:
+            pass
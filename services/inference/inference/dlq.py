@@ -0,0 +1,71 @@
+"""Inspect and replay the inference dead-letter stream.
+
+    python -m inference.dlq list [--count 20]
+    python -m inference.dlq replay [--id <dlq-id> ...] [--all]
+    python -m inference.dlq purge [--id <dlq-id> ...] [--all]
+
+Replayed entries are re-published to their current shard stream without the ``dlq_*``
+fields and removed from the DLQ, so they get a fresh delivery budget.
+"""
+from __future__ import annotations
+import argparse, json
+
+from inference.shards import shard_for, stream_name
+from inference.consumer import r, DLQ_STREAM
+
+def _entries(ids: list[str] | None, count: int | None) -> list[tuple[str, dict]]:
+    if ids:
+        out = []
+        for mid in ids:
+            out.extend(r.xrange(DLQ_STREAM, min=mid, max=mid))
+        return out
+    return r.xrange(DLQ_STREAM, count=count)
+
+def list_entries(count: int = 20) -> list[dict]:
+    return [{"dlq_id": mid, **fields} for mid, fields in r.xrange(DLQ_STREAM, count=count)]
+
+def replay(ids: list[str] | None = None, count: int | None = None) -> int:
+    n = 0
+    for mid, fields in _entries(ids, count):
+        # Route by the current shard map, not the recorded source, so replays survive a reshard.
+        source = stream_name(shard_for(fields.get("agency_id", ""), fields.get("resident_id", "")))
+        original = {k: v for k, v in fields.items() if not k.startswith("dlq_")}
+        pipe = r.pipeline(transaction=True)
+        pipe.xadd(source, original)
+        pipe.xdel(DLQ_STREAM, mid)
+        pipe.execute()
+        n += 1
+    return n
+
+def purge(ids: list[str] | None = None) -> int:
+    if ids:
+        return r.xdel(DLQ_STREAM, *ids)
+    n = r.xlen(DLQ_STREAM)
+    r.delete(DLQ_STREAM)
+    return n
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    ls = sub.add_parser("list")
+    ls.add_argument("--count", type=int, default=20)
+    for name in ("replay", "purge"):
+        p = sub.add_parser(name)
+        p.add_argument("--id", action="append", dest="ids")
+        p.add_argument("--all", action="store_true")
+    args = ap.parse_args()
+
+    if args.cmd == "list":
+        print(json.dumps({"stream": DLQ_STREAM, "length": r.xlen(DLQ_STREAM)}))
+        for e in list_entries(args.count):
+            print(json.dumps(e, ensure_ascii=False))
+        return
+    if not args.ids and not args.all:
+        raise SystemExit("pass --id <dlq-id> (repeatable) or --all")
+    if args.cmd == "replay":
+        print(f"replayed {replay(args.ids)} entr(y/ies)")
+    else:
+        print(f"purged {purge(args.ids)} entr(y/ies)")
+
+if __name__ == "__main__":
+    main()
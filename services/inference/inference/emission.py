@@ -0,0 +1,111 @@
+"""Change-based risk_events emission.
+
+With ``INFERENCE_EMIT_POLICY=change`` (default) a scored reading is only written
+when, compared with the last row written for that resident:
+
+- any score moved by at least ``INFERENCE_EMIT_DELTA``, or
+- any score changed risk band (``INFERENCE_EMIT_BANDS``, the dashboard's LOW/MED/HIGH cut-offs), or
+- ``INFERENCE_EMIT_HEARTBEAT_S`` elapsed (so "latest" never goes stale), or
+- it is the first reading seen for the resident.
+
+``INFERENCE_EMIT_POLICY=all`` restores one row per reading. Last-emitted state is
+kept in memory (LRU-bounded) and, with ``INFERENCE_EMIT_STATE=redis``, mirrored in
+one ``hakilix.emit.last:<agency>:<resident>`` key per resident so restarts and shard
+moves keep suppressing. The keys expire after twice the heartbeat: older state
+would trigger a heartbeat row anyway, so Redis only holds active residents.
+
+Decisions are staged per batch and only recorded after the risk_events commit,
+so a failed write never marks a row as emitted.
+"""
+from __future__ import annotations
+import bisect, json, os
+from collections import OrderedDict
+from typing import Sequence
+
+EMIT_POLICY = os.environ.get("INFERENCE_EMIT_POLICY", "change").lower()
+EMIT_DELTA = float(os.environ.get("INFERENCE_EMIT_DELTA", "0.05"))
+EMIT_HEARTBEAT_S = float(os.environ.get("INFERENCE_EMIT_HEARTBEAT_S", "300"))
+EMIT_BANDS = [float(b) for b in os.environ.get("INFERENCE_EMIT_BANDS", "0.45,0.75").split(",") if b.strip()]
+EMIT_STATE = os.environ.get("INFERENCE_EMIT_STATE", "memory").lower()
+EMIT_MAX_RESIDENTS = int(os.environ.get("INFERENCE_EMIT_MAX_RESIDENTS", "200000"))
+STATE_PREFIX = "hakilix.emit.last:"
+
+# (time, scores) of the last row written for a resident
+Last = tuple[float, list[float]]
+
+class EmissionPolicy:
+    def __init__(self, policy: str = EMIT_POLICY, delta: float = EMIT_DELTA, heartbeat_s: float = EMIT_HEARTBEAT_S,
+                 bands: Sequence[float] = EMIT_BANDS, redis_client=None, max_residents: int = EMIT_MAX_RESIDENTS):
+        self.policy = policy
+        self.delta = delta
+        self.heartbeat_s = heartbeat_s
+        self.bands = sorted(bands)
+        self._r = redis_client if EMIT_STATE == "redis" else None
+        self._max = max_residents
+        self._last: "OrderedDict[str, Last]" = OrderedDict()
+
+    def _band(self, v: float) -> int:
+        return bisect.bisect_right(self.bands, v)
+
+    def reason(self, last: Last | None, scores: Sequence[float], now: float) -> str | None:
+        """Why this reading must be written, or None to suppress it."""
+        if self.policy == "all":
+            return "all"
+        if last is None:
+            return "first"
+        t, prev = last
+        if now - t >= self.heartbeat_s:
+            return "heartbeat"
+        if any(self._band(a) != self._band(b) for a, b in zip(scores, prev)):
+            return "band"
+        if any(abs(a - b) >= self.delta for a, b in zip(scores, prev)):
+            return "delta"
+        return None
+
+    def warm(self, keys: list[str]):
+        if self._r is None:
+            return
+        missing = [k for k in dict.fromkeys(keys) if k not in self._last]
+        if not missing:
+            return
+        try:
+            for k, raw in zip(missing, self._r.mget([STATE_PREFIX + k for k in missing])):
+                if raw:
+                    t, scores = json.loads(raw)
+                    self._remember(k, (t, scores))
+        except Exception as e:
+            print("emission state load failed:", e)
+
+    def decide(self, keys: list[str], scores: list[Sequence[float]], now: float) -> tuple[list[str | None], dict[str, Last]]:
+        """Reasons per row plus the staged state to ``commit`` once the rows are persisted.
+
+        Rows for the same resident within a batch are compared against each other
+        in order, not just against the committed state.
+        """
+        staged: dict[str, Last] = {}
+        reasons: list[str | None] = []
+        for k, sc in zip(keys, scores):
+            why = self.reason(staged.get(k) or self._last.get(k), sc, now)
+            if why is not None:
+                staged[k] = (now, [float(v) for v in sc])
+            reasons.append(why)
+        return reasons, staged
+
+    def _remember(self, key: str, last: Last):
+        self._last[key] = last
+        self._last.move_to_end(key)
+        while len(self._last) > self._max:
+            self._last.popitem(last=False)
+
+    def commit(self, staged: dict[str, Last]):
+        for k, last in staged.items():
+            self._remember(k, last)
+        if self._r is not None and staged:
+            try:
+                ttl = max(1, int(2 * self.heartbeat_s))
+                pipe = self._r.pipeline(transaction=False)
+                for k, v in staged.items():
+                    pipe.set(STATE_PREFIX + k, json.dumps(v), ex=ttl)
+                pipe.execute()
+            except Exception as e:
+                print("emission state save failed:", e)
@@ -0,0 +1,83 @@
+"""Estimate what the emission policy would have saved on historical risk_events.
+
+    python -m inference.emission_estimate --agency A-001 [--since 2026-01-01] [--until 2026-02-01]
+        [--delta 0.05] [--heartbeat-s 300] [--bands 0.45,0.75]
+
+Streams the tenant's rows in (resident, time) order, replays them through
+``EmissionPolicy`` using each row's own timestamp for the heartbeat, and reports
+written vs suppressed rows plus the bytes that would not have been stored
+(average on-disk bytes per risk_events row, indexes included).
+"""
+from __future__ import annotations
+import argparse, json
+from collections import Counter
+
+from sqlalchemy import text
+
+from inference.emission import EMIT_BANDS, EMIT_DELTA, EMIT_HEARTBEAT_S, EmissionPolicy
+from inference.consumer import engine
+
+def _is_hypertable(c) -> bool:
+    if not c.execute(text("SELECT 1 FROM pg_extension WHERE extname='timescaledb'")).scalar():
+        return False
+    return bool(c.execute(text("""
+        SELECT 1 FROM timescaledb_information.hypertables
+        WHERE hypertable_schema='hakilix' AND hypertable_name='risk_events'
+    """)).scalar())
+
+def bytes_per_row(c) -> float | None:
+    """Whole-table bytes (indexes included) per row, from catalog estimates (not RLS-filtered)."""
+    if _is_hypertable(c):
+        size = c.execute(text("SELECT hypertable_size('hakilix.risk_events')")).scalar()
+        rows = c.execute(text("SELECT approximate_row_count('hakilix.risk_events')")).scalar()
+    else:
+        size = c.execute(text("SELECT pg_total_relation_size('hakilix.risk_events')")).scalar()
+        rows = c.execute(text("SELECT reltuples FROM pg_class WHERE oid='hakilix.risk_events'::regclass")).scalar()
+    return (size / rows) if size and rows and rows > 0 else None
+
+def estimate(agency_id: str, since: str | None, until: str | None, policy: EmissionPolicy) -> dict:
+    written, suppressed = Counter(), 0
+    with engine().connect() as c:
+        c.execute(text("SELECT set_config('app.tenant_id', :tid, false)"), {"tid": agency_id})
+        per_row = bytes_per_row(c)
+        q = text("""
+            SELECT resident_id, time, falls_risk, resp_risk, dehydration_risk, delirium_uti_risk
+            FROM hakilix.risk_events
+            WHERE (CAST(:since AS timestamptz) IS NULL OR time >= CAST(:since AS timestamptz))
+              AND (CAST(:until AS timestamptz) IS NULL OR time < CAST(:until AS timestamptz))
+            ORDER BY resident_id, time
+        """)
+        res = c.execution_options(stream_results=True, yield_per=5000).execute(q, {"since": since, "until": until})
+        for row in res:
+            key = f"{agency_id}:{row.resident_id}"
+            scores = [row.falls_risk, row.resp_risk, row.dehydration_risk, row.delirium_uti_risk]
+            reasons, staged = policy.decide([key], [scores], row.time.timestamp())
+            if reasons[0] is None:
+                suppressed += 1
+            else:
+                written[reasons[0]] += 1
+                policy.commit(staged)
+    total = sum(written.values()) + suppressed
+    return {
+        "agency_id": agency_id, "rows": total, "written": sum(written.values()), "written_by_reason": dict(written),
+        "suppressed": suppressed, "suppressed_ratio": round(suppressed / total, 4) if total else 0.0,
+        "bytes_per_row": round(per_row, 1) if per_row else None,
+        "estimated_bytes_saved": int(suppressed * per_row) if per_row else None,
+    }
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--agency", required=True)
+    ap.add_argument("--since")
+    ap.add_argument("--until")
+    ap.add_argument("--delta", type=float, default=EMIT_DELTA)
+    ap.add_argument("--heartbeat-s", type=float, default=EMIT_HEARTBEAT_S)
+    ap.add_argument("--bands", default=",".join(str(b) for b in EMIT_BANDS))
+    args = ap.parse_args()
+    policy = EmissionPolicy(policy="change", delta=args.delta, heartbeat_s=args.heartbeat_s,
+                            bands=[float(b) for b in args.bands.split(",") if b.strip()],
+                            max_residents=1 << 30)
+    print(json.dumps(estimate(args.agency, args.since, args.until, policy)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""Pure-NumPy evaluator for small linear ONNX graphs.
+
+The production risk model is ``MatMul -> Add -> Sigmoid`` on an (N, 11) input;
+at that size onnxruntime's per-call overhead dwarfs the arithmetic. ``compile_model``
+turns graphs built only from the ops below into a closure over the initializers
+and returns ``None`` for anything else, so callers fall back to onnxruntime.
+
+Supported: MatMul, Gemm, Add, Sub, Mul, Sigmoid, Relu, Tanh, Identity.
+"""
+from __future__ import annotations
+from typing import Callable
+import numpy as np
+
+Evaluator = Callable[[np.ndarray], np.ndarray]
+
+def _sigmoid(z):
+    # In place on a temporary; exp(+inf) -> inf -> 1/inf = 0 is the correct limit.
+    with np.errstate(over="ignore"):
+        np.negative(z, out=z)
+        np.exp(z, out=z)
+    z += 1.0
+    return np.reciprocal(z, out=z)
+
+_UNARY = {
+    "Sigmoid": _sigmoid,
+    "Relu": lambda z: np.maximum(z, 0.0, out=z),
+    "Tanh": lambda z: np.tanh(z, out=z),
+    "Identity": lambda z: z,
+}
+_BINARY = {"MatMul": np.matmul, "Add": np.add, "Sub": np.subtract, "Mul": np.multiply}
+
+def _gemm(attrs: dict, b_const: np.ndarray | None):
+    alpha, beta = attrs.get("alpha", 1.0), attrs.get("beta", 1.0)
+    ta, tb = attrs.get("transA", 0), attrs.get("transB", 0)
+    if b_const is not None:
+        # Fold transB/alpha into the weights once at compile time.
+        w = np.ascontiguousarray((b_const.T if tb else b_const) * np.float32(alpha))
+        def run(a, _b, c=None):
+            y = (a.T if ta else a) @ w
+            if c is not None:
+                y += np.float32(beta) * c if beta != 1.0 else c
+            return y
+        return run
+    def run(a, b, c=None):
+        y = alpha * ((a.T if ta else a) @ (b.T if tb else b))
+        return y if c is None else y + beta * c
+    return run
+
+def _linear_head(g, consts: dict, in_name: str, out_name: str) -> Evaluator | None:
+    """Fused ``act(x @ W + b)`` for the MatMul [-> Add] [-> Sigmoid|Relu|Tanh] chain.
+
+    Sigmoid folds the negation into the weights: 1 / (1 + exp(x @ -W - b)), so a
+    call is one matmul and four in-place ufuncs.
+    """
+    nodes = list(g.node)
+    if not nodes or nodes[0].op_type != "MatMul" or list(nodes[0].input)[0] != in_name:
+        return None
+    w = consts.get(nodes[0].input[1])
+    if w is None or w.ndim != 2:
+        return None
+    b, cur, rest = None, nodes[0].output[0], nodes[1:]
+    if rest and rest[0].op_type == "Add":
+        ins = list(rest[0].input)
+        other = ins[1] if ins[0] == cur else ins[0] if ins[1] == cur else None
+        if other not in consts:
+            return None
+        b, cur, rest = consts[other], rest[0].output[0], rest[1:]
+    act = None
+    if rest and rest[0].op_type in ("Sigmoid", "Relu", "Tanh") and list(rest[0].input) == [cur]:
+        act, cur, rest = rest[0].op_type, rest[0].output[0], rest[1:]
+    if rest or cur != out_name:
+        return None
+
+    if act == "Sigmoid":
+        wn = np.ascontiguousarray(-w)
+        bn = None if b is None else np.ascontiguousarray(-b)
+        def evaluate(x):
+            z = x @ wn
+            if bn is not None:
+                z += bn
+            with np.errstate(over="ignore"):
+                np.exp(z, out=z)
+            z += 1.0
+            return np.reciprocal(z, out=z)
+        evaluate.bounded = True
+        return evaluate
+
+    w = np.ascontiguousarray(w)
+    fn = _UNARY.get(act) if act else None
+    def evaluate(x):
+        z = x @ w
+        if b is not None:
+            z += b
+        return fn(z) if fn is not None else z
+    return evaluate
+
+def compile_model(model) -> Evaluator | None:
+    """Compile a loaded ``onnx.ModelProto``; ``None`` if the graph is unsupported.
+
+    A plain linear head is fused (see ``_linear_head``); other supported graphs run
+    through a slot interpreter where unary activations work in place on
+    intermediate buffers.
+    """
+    from onnx import helper, numpy_helper
+
+    g = model.graph
+    consts = {t.name: numpy_helper.to_array(t).astype(np.float32) for t in g.initializer}
+    inputs = [i.name for i in g.input if i.name not in consts]
+    if len(inputs) != 1 or len(g.output) != 1:
+        return None
+    in_name, out_name = inputs[0], g.output[0].name
+    fused = _linear_head(g, consts, in_name, out_name)
+    if fused is not None:
+        return fused
+
+    # Values live in a flat list; a step reads slots and writes one slot.
+    slots: dict[str, int] = {in_name: 0}
+    values: list = [None]
+    for name, arr in consts.items():
+        slots[name] = len(values)
+        values.append(arr)
+    temps: set[int] = set()
+    uses: dict[str, int] = {}
+    for node in g.node:
+        for i in node.input:
+            uses[i] = uses.get(i, 0) + 1
+
+    steps = []
+    for node in g.node:
+        if len(node.output) != 1 or any(i not in slots for i in node.input):
+            return None
+        attrs = {a.name: helper.get_attribute_value(a) for a in node.attribute}
+        ins = tuple(slots[i] for i in node.input)
+        if node.op_type in _UNARY and len(ins) == 1:
+            # In-place only on a temporary nobody else reads.
+            if ins[0] not in temps or uses.get(node.input[0], 0) > 1:
+                if node.op_type == "Identity":
+                    fn = _UNARY["Identity"]
+                else:
+                    inner = _UNARY[node.op_type]
+                    fn = lambda z, _f=inner: _f(np.array(z, dtype=np.float32))
+            else:
+                fn = _UNARY[node.op_type]
+        elif node.op_type in _BINARY and len(ins) == 2:
+            fn = _BINARY[node.op_type]
+        elif node.op_type == "Gemm" and len(ins) in (2, 3):
+            fn = _gemm(attrs, consts.get(node.input[1]))
+        else:
+            return None
+        out = node.output[0]
+        slots[out] = len(values)
+        values.append(None)
+        temps.add(slots[out])
+        steps.append((fn, ins, slots[out]))
+    if out_name not in slots:
+        return None
+    out_slot = slots[out_name]
+
+    def evaluate(x: np.ndarray) -> np.ndarray:
+        v = values.copy()
+        v[0] = x
+        for fn, ins, out in steps:
+            v[out] = fn(*[v[i] for i in ins])
+        return v[out_slot]
+
+    return evaluate
+
+def compile_path(path: str) -> Evaluator | None:
+    try:
+        import onnx
+        return compile_model(onnx.load(path))
+    except Exception as e:
+        print("fast path unavailable for", path, e)
+        return None
+
+def verify(fast: Evaluator, run_ort: Callable[[np.ndarray], np.ndarray], n_inputs: int,
+           atol: float = 1e-5, seed: int = 0) -> bool:
+    """Compare against onnxruntime on random feature batches in the model's 0..1 domain."""
+    rng = np.random.default_rng(seed)
+    for n in (1, 7, 64):
+        x = rng.random((n, n_inputs), dtype=np.float32)
+        if not np.allclose(fast(x), run_ort(x), atol=atol, rtol=1e-4):
+            return False
+    return True
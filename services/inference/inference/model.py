@@ -1,38 +1,127 @@
 from __future__ import annotations
+import hashlib
 import os
+from pathlib import Path
 import numpy as np
 
 MODEL_PATH = os.environ.get("HAKILIX_MODEL_PATH", "/app/models/hakilix_risk_v1.onnx")
 MODEL_VERSION = "hakilix_risk_v1"
 
+# onnxruntime session tuning (unset = onnxruntime defaults).
+ORT_INTRA_OP_THREADS = int(os.environ.get("HAKILIX_ORT_INTRA_OP_THREADS", "0"))
+ORT_INTER_OP_THREADS = int(os.environ.get("HAKILIX_ORT_INTER_OP_THREADS", "0"))
+ORT_GRAPH_OPT = os.environ.get("HAKILIX_ORT_GRAPH_OPT", "all").lower()  # disable|basic|extended|all
+ORT_EXECUTION_MODE = os.environ.get("HAKILIX_ORT_EXECUTION_MODE", "sequential").lower()  # sequential|parallel
+# Compile small linear graphs to a NumPy evaluator (see inference.fastpath); "0" forces onnxruntime.
+FASTPATH = os.environ.get("HAKILIX_MODEL_FASTPATH", "1").lower() not in ("0", "false", "no")
+# Above this many rows onnxruntime's vectorised kernels win again (see inference.bench_fastpath).
+FASTPATH_MAX_BATCH = int(os.environ.get("HAKILIX_MODEL_FASTPATH_MAX_BATCH", "256"))
+# Directory for serialized optimized models; a cache hit skips graph optimisation on cold start.
+ORT_CACHE_DIR = os.environ.get("HAKILIX_ORT_CACHE_DIR", "")
+
+def _graph_opt_level(ort, name: str):
+    return {
+        "disable": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+        "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+        "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    }.get(name, ort.GraphOptimizationLevel.ORT_ENABLE_ALL)
+
+def _session(path: str):
+    import onnxruntime as ort
+    so = ort.SessionOptions()
+    if ORT_INTRA_OP_THREADS > 0:
+        so.intra_op_num_threads = ORT_INTRA_OP_THREADS
+    if ORT_INTER_OP_THREADS > 0:
+        so.inter_op_num_threads = ORT_INTER_OP_THREADS
+    so.execution_mode = (ort.ExecutionMode.ORT_PARALLEL if ORT_EXECUTION_MODE == "parallel"
+                         else ort.ExecutionMode.ORT_SEQUENTIAL)
+    so.graph_optimization_level = _graph_opt_level(ort, ORT_GRAPH_OPT)
+
+    if ORT_CACHE_DIR and ORT_GRAPH_OPT != "disable":
+        # Key the cache on content + level so a replaced file never loads a stale graph.
+        digest = hashlib.sha256(Path(path).read_bytes()).hexdigest()[:16]
+        cached = Path(ORT_CACHE_DIR) / f"{Path(path).stem}.{digest}.{ORT_GRAPH_OPT}.onnx"
+        if cached.exists():
+            so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+            return ort.InferenceSession(str(cached), sess_options=so, providers=["CPUExecutionProvider"])
+        cached.parent.mkdir(parents=True, exist_ok=True)
+        so.optimized_model_filepath = str(cached)
+    return ort.InferenceSession(path, sess_options=so, providers=["CPUExecutionProvider"])
+
 class RiskModel:
-    def __init__(self):
+    def __init__(self, path: str = MODEL_PATH, version: str | None = None):
         self._sess = None
         self._in_name = None
         self._out_name = None
+        self._fast = None
+        self.n_inputs = 11
+        self.path = path
+        self._version = version or (Path(path).stem if path else MODEL_VERSION)
         try:
-            import onnxruntime as ort
-            if os.path.exists(MODEL_PATH):
-                self._sess = ort.InferenceSession(MODEL_PATH, providers=["CPUExecutionProvider"])
+            if os.path.exists(path):
+                self._sess = _session(path)
                 self._in_name = self._sess.get_inputs()[0].name
                 self._out_name = self._sess.get_outputs()[0].name
-        except Exception:
+                width = self._sess.get_inputs()[0].shape[-1]
+                if isinstance(width, int):
+                    self.n_inputs = width
+                if FASTPATH:
+                    self._fast = self._compile_fast(path)
+        except Exception as e:
+            print("model load failed; using fallback scorer:", path, e)
             self._sess = None
 
+    def _run_ort(self, arr: np.ndarray) -> np.ndarray:
+        return np.asarray(self._sess.run([self._out_name], {self._in_name: arr})[0])
+
+    def _compile_fast(self, path: str):
+        from inference.fastpath import compile_path, verify
+        fast = compile_path(path)
+        if fast is None:
+            return None
+        if not verify(fast, self._run_ort, self.n_inputs):
+            print("fast path disagrees with onnxruntime; disabled for", path)
+            return None
+        return fast
+
+    @property
+    def loaded(self) -> bool:
+        return self._sess is not None
+
+    @property
+    def backend(self) -> str:
+        return "numpy" if self._fast is not None else "onnxruntime" if self._sess else "fallback"
+
     @property
     def version(self) -> str:
-        return MODEL_VERSION
+        return self._version
 
-    def predict(self, x: list[float]) -> list[float]:
-        # Output: [falls, respiratory, dehydration, delirium_uti] 0..1
+    def predict_batch(self, xs) -> np.ndarray:
+        """Score an (N, >=11) batch; returns (N, 4) clipped to 0..1.
+
+        Rows may carry extra rolling-feature columns; the model only sees as many
+        columns as its input declares.
+        Output columns: [falls, respiratory, dehydration, delirium_uti].
+        """
+        x = np.asarray(xs, dtype=np.float32)
+        if x.ndim == 1:
+            x = x.reshape(1, -1)
         if not self._sess:
-            falls = min(1.0, 0.45*x[4] + 0.35*x[5] + 0.30*x[6])
-            resp = min(1.0, 0.45*x[1] + 0.35*x[2] + 0.35*x[3])
-            dehyd = min(1.0, 0.55*x[7] + 0.25*x[0])
-            delir = min(1.0, 0.50*x[8] + 0.30*x[9] + 0.20*x[10])
-            return [falls, resp, dehyd, delir]
-
-        arr = np.asarray([x], dtype=np.float32)
-        out = self._sess.run([self._out_name], {self._in_name: arr})[0]
-        out = np.asarray(out).reshape(-1).tolist()
-        return [float(max(0.0, min(1.0, v))) for v in out]
+            falls = 0.45*x[:, 4] + 0.35*x[:, 5] + 0.30*x[:, 6]
+            resp = 0.45*x[:, 1] + 0.35*x[:, 2] + 0.35*x[:, 3]
+            dehyd = 0.55*x[:, 7] + 0.25*x[:, 0]
+            delir = 0.50*x[:, 8] + 0.30*x[:, 9] + 0.20*x[:, 10]
+            return np.minimum(np.stack([falls, resp, dehyd, delir], axis=1), 1.0)
+
+        x = np.ascontiguousarray(x[:, :self.n_inputs])
+        if self._fast is not None and x.shape[0] <= FASTPATH_MAX_BATCH:
+            out = self._fast(x).reshape(x.shape[0], -1)
+            if getattr(self._fast, "bounded", False):
+                return out
+        else:
+            out = np.asarray(self._run_ort(x), dtype=np.float32).reshape(x.shape[0], -1)
+        # In-place clamp; np.clip's Python-level dispatch costs more than the model at small N.
+        return np.minimum(np.maximum(out, 0.0, out=out), 1.0, out=out)
+
+    def predict(self, x: list[float]) -> list[float]:
+        return [float(v) for v in self.predict_batch([x])[0]]
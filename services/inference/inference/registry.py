@@ -0,0 +1,100 @@
+"""Directory-backed model registry with hot reload.
+
+``HAKILIX_MODEL_DIR`` holds versioned ONNX files named ``<name>_v<N>.onnx``; the
+file stem is the ``model_version`` written to risk_events. The active model is,
+in order of precedence:
+
+1. ``HAKILIX_MODEL_VERSION`` (pin a stem, e.g. ``hakilix_risk_v2``)
+2. the stem written in ``<dir>/CURRENT``
+3. the highest ``_v<N>`` in the directory
+
+The directory is polled every ``HAKILIX_MODEL_POLL_S``; when the selection or the
+selected file changes, the new session is built off to the side and swapped in
+with a single reference assignment. Callers take ``current()`` once per batch, so
+in-flight batches finish on the session they started with.
+
+Promote a model without restarting consumers:
+
+    cp hakilix_risk_v2.onnx /app/models/ && echo hakilix_risk_v2 > /app/models/CURRENT
+"""
+from __future__ import annotations
+import os, re, threading, time
+from pathlib import Path
+
+from inference.model import MODEL_PATH, RiskModel
+
+MODEL_DIR = Path(os.environ.get("HAKILIX_MODEL_DIR", str(Path(MODEL_PATH).parent)))
+MODEL_PIN = os.environ.get("HAKILIX_MODEL_VERSION", "")
+POLL_S = float(os.environ.get("HAKILIX_MODEL_POLL_S", "10"))
+
+_VERSION_RE = re.compile(r"_v(\d+)$")
+
+def _version_key(path: Path) -> tuple[int, str]:
+    m = _VERSION_RE.search(path.stem)
+    return (int(m.group(1)) if m else -1, path.stem)
+
+class ModelRegistry:
+    def __init__(self, model_dir: Path = MODEL_DIR, pin: str = MODEL_PIN, poll_s: float = POLL_S):
+        self.model_dir = Path(model_dir)
+        self.pin = pin
+        self.poll_s = poll_s
+        self._lock = threading.Lock()
+        self._signature: tuple | None = None
+        self._next_poll = 0.0
+        self._current: RiskModel | None = None
+        self.reload()
+        if self._current is None:
+            # Empty registry: fall back to HAKILIX_MODEL_PATH (or the built-in scorer).
+            self._current = RiskModel(MODEL_PATH)
+
+    def available(self) -> list[Path]:
+        try:
+            return sorted(self.model_dir.glob("*.onnx"), key=_version_key)
+        except OSError:
+            return []
+
+    def select(self) -> Path | None:
+        files = {p.stem: p for p in self.available()}
+        if self.pin:
+            return files.get(self.pin)
+        current = self.model_dir / "CURRENT"
+        if current.exists():
+            stem = current.read_text().strip()
+            if stem in files:
+                return files[stem]
+            print("CURRENT names unknown model; ignoring:", stem)
+        return max(files.values(), key=_version_key) if files else None
+
+    def reload(self) -> bool:
+        """Load the selected model if it differs from the active one. Returns True on swap."""
+        path = self.select()
+        if path is None:
+            return False
+        st = path.stat()
+        sig = (str(path), st.st_mtime_ns, st.st_size)
+        if sig == self._signature:
+            return False
+        with self._lock:
+            if sig == self._signature:
+                return False
+            candidate = RiskModel(str(path))
+            # Keep serving the previous model if the new file does not load.
+            if not candidate.loaded and self._current is not None and self._current.loaded:
+                print("model reload failed; keeping", self._current.version)
+                self._signature = sig
+                return False
+            previous = self._current.version if self._current is not None else None
+            self._current = candidate
+            self._signature = sig
+        print(f"model active: {candidate.version} (was {previous})")
+        return True
+
+    def current(self) -> RiskModel:
+        now = time.monotonic()
+        if now >= self._next_poll:
+            self._next_poll = now + self.poll_s
+            try:
+                self.reload()
+            except Exception as e:
+                print("model registry poll failed:", e)
+        return self._current
@@ -0,0 +1,22 @@
+"""The ``hakilix.risk_events`` row written for every scored reading.
+
+Shared by the live worker and ``inference.backfill`` so both write identical
+rows; kept apart from ``inference.worker`` so the backfill does not load the
+worker's model registry, rolling store and emission policy at import.
+"""
+from __future__ import annotations
+import json
+
+from sqlalchemy import text
+
+EXPLAIN = json.dumps({
+    "FALLS": "Gait / Hypotension / Wandering",
+    "RESPIRATORY": "RR Trend / SpO₂ / Temp",
+    "DEHYDRATION": "Intake / Tachycardia",
+    "DELIRIUM_UTI": "Sleep / Agitation / Toileting",
+})
+
+INSERT_RISK = text("""
+    INSERT INTO hakilix.risk_events(time, agency_id, resident_id, falls_risk, resp_risk, dehydration_risk, delirium_uti_risk, model_version, explain)
+    VALUES (:t,:aid,:rid,:f,:r,:d,:u,:mv,:e)
+""")
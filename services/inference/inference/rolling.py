@@ -0,0 +1,254 @@
+"""Incremental per-resident rolling features.
+
+Every reading updates a small fixed-size state per resident in O(1):
+
+- EWMA of hr / spo2 / rr (``ROLLING_EWMA_ALPHA``)
+- least-squares slope of rr over the last ``ROLLING_SLOPE_POINTS`` readings,
+  kept as running sums over a ring buffer (add the new point, subtract the evicted one)
+- windowed mean of intake_ml over ``ROLLING_WINDOW_S`` (24 h), kept as hourly
+  sum/count buckets so the window costs the same whatever the device cadence
+
+A reading at or before the resident's ``last_seen`` is skipped: the stream is
+at-least-once, and a batch redelivered after a failed commit (or reclaimed via
+XAUTOCLAIM after a crash) must not count the same readings twice.
+
+State lives in memory, bounded by ``ROLLING_MAX_RESIDENTS`` (LRU) and
+``ROLLING_IDLE_TTL_S`` (inactive residents are dropped), and is checkpointed to
+Redis so a restarted consumer warms up without touching the database.
+"""
+from __future__ import annotations
+import json, math, os, time
+from array import array
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict
+
+EWMA_ALPHA = float(os.environ.get("ROLLING_EWMA_ALPHA", "0.2"))
+SLOPE_POINTS = int(os.environ.get("ROLLING_SLOPE_POINTS", "30"))
+WINDOW_S = float(os.environ.get("ROLLING_WINDOW_S", str(24 * 3600)))
+WINDOW_HOURS = max(1, math.ceil(WINDOW_S / 3600))
+MAX_RESIDENTS = int(os.environ.get("ROLLING_MAX_RESIDENTS", "50000"))
+IDLE_TTL_S = float(os.environ.get("ROLLING_IDLE_TTL_S", str(48 * 3600)))
+CHECKPOINT_INTERVAL_S = float(os.environ.get("ROLLING_CHECKPOINT_INTERVAL_S", "30"))
+CHECKPOINT_PREFIX = "hakilix.rolling:"
+
+# Appended after the 11 base features, in this order, when the model accepts them.
+FEATURE_NAMES = ["hr_ewma", "spo2_ewma", "rr_ewma", "rr_slope", "intake_24h"]
+
+def _norm(x: float | None, lo: float, hi: float) -> float:
+    if x is None:
+        return 0.0
+    return max(0.0, min(1.0, (x - lo) / (hi - lo)))
+
+def _ts(t: Dict[str, Any]) -> float:
+    v = t.get("time")
+    if isinstance(v, datetime):
+        return v.timestamp()
+    if isinstance(v, str):
+        try:
+            return datetime.fromisoformat(v.replace("Z", "+00:00")).timestamp()
+        except ValueError:
+            pass
+    return time.time()
+
+class ResidentState:
+    __slots__ = ("last_seen", "ewma", "ring_t", "ring_y", "head", "n", "sx", "sy", "sxx", "sxy", "t0",
+                 "win_h", "win_sum", "win_n")
+
+    def __init__(self):
+        self.last_seen = 0.0
+        self.ewma: list[float | None] = [None, None, None]  # hr, spo2, rr
+        self.ring_t = array("d", [0.0] * SLOPE_POINTS)
+        self.ring_y = array("d", [0.0] * SLOPE_POINTS)
+        self.head = 0
+        self.n = 0
+        self.sx = self.sy = self.sxx = self.sxy = 0.0
+        self.t0: float | None = None  # slope x-origin keeps the running sums well conditioned
+        # Hourly intake buckets, slot = hour % WINDOW_HOURS; win_h is the hour a slot holds.
+        self.win_h = array("q", [-1] * WINDOW_HOURS)
+        self.win_sum = array("d", [0.0] * WINDOW_HOURS)
+        self.win_n = array("d", [0.0] * WINDOW_HOURS)
+
+    def _add_intake(self, hour: int, total: float, count: float):
+        i = hour % WINDOW_HOURS
+        if self.win_h[i] != hour:
+            if self.win_h[i] > hour:
+                return  # older than the window already held in this slot
+            self.win_h[i], self.win_sum[i], self.win_n[i] = hour, 0.0, 0.0
+        self.win_sum[i] += total
+        self.win_n[i] += count
+
+    def update(self, t: Dict[str, Any], ts: float) -> bool:
+        """Apply one reading; False (and no change) if it is not newer than ``last_seen``."""
+        if ts <= self.last_seen:
+            return False
+        self.last_seen = ts
+        for i, k in enumerate(("hr", "spo2", "rr")):
+            v = t.get(k)
+            if v is None:
+                continue
+            prev = self.ewma[i]
+            self.ewma[i] = float(v) if prev is None else prev + EWMA_ALPHA * (float(v) - prev)
+
+        rr = t.get("rr")
+        if rr is not None:
+            if self.t0 is None:
+                self.t0 = ts
+            x, y = (ts - self.t0) / 3600.0, float(rr)
+            if self.n == SLOPE_POINTS:
+                ox, oy = self.ring_t[self.head], self.ring_y[self.head]
+                self.sx -= ox; self.sy -= oy; self.sxx -= ox * ox; self.sxy -= ox * oy
+            else:
+                self.n += 1
+            self.ring_t[self.head], self.ring_y[self.head] = x, y
+            self.head = (self.head + 1) % SLOPE_POINTS
+            self.sx += x; self.sy += y; self.sxx += x * x; self.sxy += x * y
+
+        intake = t.get("intake_ml")
+        if intake is not None:
+            self._add_intake(int(ts // 3600), float(intake), 1.0)
+        return True
+
+    def intake_mean(self) -> float | None:
+        oldest = int(self.last_seen // 3600) - WINDOW_HOURS
+        total = count = 0.0
+        for h, s, n in zip(self.win_h, self.win_sum, self.win_n):
+            if h > oldest:
+                total += s; count += n
+        return total / count if count else None
+
+    def rr_slope(self) -> float:
+        """rr change per hour over the ring buffer (0 until two points exist)."""
+        if self.n < 2:
+            return 0.0
+        den = self.n * self.sxx - self.sx * self.sx
+        return 0.0 if abs(den) < 1e-12 else (self.n * self.sxy - self.sx * self.sy) / den
+
+    def features(self) -> list[float]:
+        hr, spo2, rr = self.ewma
+        intake_mean = self.intake_mean()
+        # Same orientation as extract_features: higher = more concerning.
+        return [
+            _norm(hr, 45.0, 140.0),
+            1.0 - _norm(spo2 if spo2 is not None else 98.0, 88.0, 100.0),
+            _norm(rr, 8.0, 30.0),
+            _norm(self.rr_slope(), -2.0, 2.0),
+            1.0 - _norm(intake_mean if intake_mean is not None else 800.0, 0.0, 2000.0),
+        ]
+
+    def to_json(self) -> str:
+        order = [(self.head - self.n + i) % SLOPE_POINTS for i in range(self.n)]
+        return json.dumps({
+            "last_seen": self.last_seen, "ewma": self.ewma, "t0": self.t0,
+            "ring": [[self.ring_t[i], self.ring_y[i]] for i in order],
+            "win": [[h, self.win_sum[i], self.win_n[i]] for i, h in enumerate(self.win_h) if h >= 0],
+        }, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, raw: str) -> "ResidentState":
+        d = json.loads(raw)
+        st = cls()
+        st.last_seen, st.ewma, st.t0 = d["last_seen"], d["ewma"], d["t0"]
+        for x, y in d["ring"][-SLOPE_POINTS:]:
+            st.ring_t[st.head], st.ring_y[st.head] = x, y
+            st.head = (st.head + 1) % SLOPE_POINTS
+            st.n += 1
+            st.sx += x; st.sy += y; st.sxx += x * x; st.sxy += x * y
+        for w in d["win"]:
+            # [hour, sum, count] buckets; [ts, value] points from older checkpoints.
+            if len(w) == 3:
+                st._add_intake(int(w[0]), w[1], w[2])
+            else:
+                st._add_intake(int(w[0] // 3600), w[1], 1.0)
+        return st
+
+class RollingFeatureStore:
+    def __init__(self, redis_client=None, max_residents: int = MAX_RESIDENTS, idle_ttl_s: float = IDLE_TTL_S):
+        self._r = redis_client
+        self._max = max_residents
+        self._ttl = idle_ttl_s
+        self._states: "OrderedDict[str, ResidentState]" = OrderedDict()
+        self._dirty: set[str] = set()
+        self._next_checkpoint = time.monotonic() + CHECKPOINT_INTERVAL_S
+        self.evicted = 0
+
+    @staticmethod
+    def key(agency_id: str, resident_id: str) -> str:
+        return f"{agency_id}:{resident_id}"
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def warm(self, keys: list[str]):
+        """Load checkpoints for residents not yet in memory (one MGET per batch)."""
+        missing = [k for k in dict.fromkeys(keys) if k not in self._states]
+        if not missing or self._r is None:
+            return
+        try:
+            raws = self._r.mget([CHECKPOINT_PREFIX + k for k in missing])
+        except Exception as e:
+            print("rolling checkpoint load failed:", e)
+            return
+        for k, raw in zip(missing, raws):
+            if raw:
+                try:
+                    self._put(k, ResidentState.from_json(raw))
+                except Exception:
+                    pass
+
+    def _put(self, key: str, st: ResidentState):
+        self._states[key] = st
+        self._states.move_to_end(key)
+        while len(self._states) > self._max:
+            old, old_st = self._states.popitem(last=False)
+            self._flush({old: old_st})
+            self._dirty.discard(old)
+            self.evicted += 1
+
+    def update(self, agency_id: str, resident_id: str, t: Dict[str, Any]) -> list[float]:
+        key = self.key(agency_id, resident_id)
+        st = self._states.get(key)
+        if st is None:
+            st = ResidentState()
+            self._put(key, st)
+        else:
+            self._states.move_to_end(key)
+        st.update(t, _ts(t))
+        self._dirty.add(key)
+        return st.features()
+
+    def evict_idle(self, now: float | None = None) -> int:
+        """Drop residents not seen for ``idle_ttl_s``; the LRU order makes this a prefix scan."""
+        cutoff = (now if now is not None else time.time()) - self._ttl
+        n = 0
+        while self._states:
+            key, st = next(iter(self._states.items()))
+            if st.last_seen >= cutoff:
+                break
+            self._states.popitem(last=False)
+            if key in self._dirty:
+                self._flush({key: st})
+                self._dirty.discard(key)
+            n += 1
+        self.evicted += n
+        return n
+
+    def _flush(self, states: Dict[str, ResidentState]):
+        if self._r is None or not states:
+            return
+        try:
+            pipe = self._r.pipeline(transaction=False)
+            ttl = max(1, int(self._ttl))
+            for key, st in states.items():
+                pipe.set(CHECKPOINT_PREFIX + key, st.to_json(), ex=ttl)
+            pipe.execute()
+        except Exception as e:
+            print("rolling checkpoint failed:", e)
+
+    def maybe_checkpoint(self, force: bool = False):
+        if not force and time.monotonic() < self._next_checkpoint:
+            return
+        self._next_checkpoint = time.monotonic() + CHECKPOINT_INTERVAL_S
+        self.evict_idle()
+        self._flush({k: self._states[k] for k in self._dirty if k in self._states})
+        self._dirty.clear()
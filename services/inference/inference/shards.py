@@ -0,0 +1,77 @@
+"""Telemetry stream sharding.
+
+Producers route each reading to ``stream_name(shard_for(agency_id, resident_id))``;
+every resident therefore lives on exactly one shard, and as long as each shard is
+read by one consumer at a time its readings are scored in order.
+
+Keep ``shard_for`` in sync with the copies in the broker worker and the simulator
+(crc32 of ``"<agency_id>:<resident_id>"`` modulo ``TELEMETRY_SHARDS``).
+
+    python -m inference.shards status
+"""
+from __future__ import annotations
+import json, os, zlib
+
+BASE_STREAM = os.environ.get("REDIS_STREAM", "hakilix.telemetry")
+SHARDS = max(1, int(os.environ.get("TELEMETRY_SHARDS", "1")))
+
+def shard_for(agency_id: str, resident_id: str, shards: int = SHARDS) -> int:
+    return zlib.crc32(f"{agency_id}:{resident_id}".encode("utf-8")) % shards
+
+def stream_name(shard: int, shards: int = SHARDS, base: str = BASE_STREAM) -> str:
+    # A single shard keeps the historical stream name so K=1 needs no migration.
+    return base if shards == 1 else f"{base}.{shard}"
+
+def _parse_spec(spec: str) -> list[int]:
+    out: set[int] = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            lo, hi = part.split("-", 1)
+            out.update(range(int(lo), int(hi) + 1))
+        else:
+            out.add(int(part))
+    return sorted(s for s in out if 0 <= s < SHARDS)
+
+def owned_shards() -> list[int]:
+    """Shards this consumer process reads.
+
+    ``INFERENCE_SHARDS`` ("0-3,7") pins an explicit subset, e.g. one per replica.
+    Under the supervisor, slot i of n owns every shard with ``shard % n == i``.
+    Otherwise the process reads all shards.
+    """
+    spec = os.environ.get("INFERENCE_SHARDS")
+    if spec:
+        return _parse_spec(spec)
+    slot, slots = os.environ.get("INFERENCE_SLOT"), os.environ.get("INFERENCE_SLOTS")
+    if slot is not None and slots:
+        return [s for s in range(SHARDS) if s % int(slots) == int(slot)]
+    return list(range(SHARDS))
+
+def owned_streams() -> list[str]:
+    return [stream_name(s) for s in owned_shards()]
+
+def status(r, group: str) -> list[dict]:
+    rows = []
+    for s in range(SHARDS):
+        name = stream_name(s)
+        row = {"shard": s, "stream": name, "length": r.xlen(name), "lag": None, "pending": None, "consumers": None}
+        try:
+            for g in r.xinfo_groups(name):
+                if g["name"] == group:
+                    row.update(lag=g.get("lag"), pending=g.get("pending"), consumers=g.get("consumers"))
+        except Exception:
+            pass
+        rows.append(row)
+    return rows
+
+def main():
+    import redis
+    r = redis.Redis.from_url(os.environ.get("REDIS_URL", "redis://redis:6379/0"), decode_responses=True)
+    for row in status(r, "inference"):
+        print(json.dumps(row))
+
+if __name__ == "__main__":
+    main()
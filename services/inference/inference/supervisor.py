@@ -0,0 +1,58 @@
+from __future__ import annotations
+import os, signal, socket, subprocess, sys, time
+
+# Number of consumer processes to run in this container ("auto" = one per core).
+PROCESSES = os.environ.get("INFERENCE_PROCESSES", "1")
+# Seconds to wait for children to drain after SIGTERM before killing them.
+GRACE_S = float(os.environ.get("INFERENCE_DRAIN_GRACE_S", "25"))
+RESTART_BACKOFF_S = 2.0
+
+_stopping = False
+
+def process_count() -> int:
+    if PROCESSES.lower() == "auto":
+        return os.cpu_count() or 1
+    return max(1, int(PROCESSES))
+
+def spawn(slot: int, slots: int) -> subprocess.Popen:
+    # Stable per-slot consumer name: a restarted child re-reads its own pending
+    # entries instead of waiting for XAUTOCLAIM to hand them to someone else.
+    # INFERENCE_SLOT/INFERENCE_SLOTS give each child a disjoint subset of the shard streams.
+    env = dict(os.environ, INFERENCE_CONSUMER=f"{socket.gethostname()}-{slot}",
+               INFERENCE_SLOT=str(slot), INFERENCE_SLOTS=str(slots))
+    return subprocess.Popen([sys.executable, "-m", "inference.worker"], env=env)
+
+def _on_signal(signum, frame):
+    global _stopping
+    _stopping = True
+
+def drain(children: dict[int, subprocess.Popen]):
+    for p in children.values():
+        if p.poll() is None:
+            p.send_signal(signal.SIGTERM)
+    deadline = time.monotonic() + GRACE_S
+    for p in children.values():
+        try:
+            p.wait(timeout=max(0.0, deadline - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            p.kill()
+
+def main():
+    signal.signal(signal.SIGTERM, _on_signal)
+    signal.signal(signal.SIGINT, _on_signal)
+    n = process_count()
+    children = {slot: spawn(slot, n) for slot in range(n)}
+    print(f"Inference supervisor started with {n} consumer process(es).")
+    while not _stopping:
+        for slot, p in list(children.items()):
+            rc = p.poll()
+            if rc is not None and not _stopping:
+                print(f"consumer slot {slot} exited with {rc}; restarting")
+                time.sleep(RESTART_BACKOFF_S)
+                children[slot] = spawn(slot, n)
+        time.sleep(0.5)
+    drain(children)
+    print("Inference supervisor stopped.")
+
+if __name__ == "__main__":
+    main()
@@ -1,67 +1,233 @@
 from __future__ import annotations
-import os, json, time
+import os, json, socket, time
+from collections import defaultdict
 from datetime import datetime, timezone
-import redis
-from sqlalchemy import create_engine, text
+from prometheus_client import Counter, start_http_server
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError, OperationalError
 from inference.features import extract_features
-from inference.model import RiskModel
+from inference.registry import ModelRegistry
+from inference.rolling import RollingFeatureStore
+from inference.emission import EmissionPolicy
+from inference.shards import BASE_STREAM, owned_streams, shard_for, stream_name
+from inference.consumer import (DLQ_STREAM, RISK_STREAM, Entry, _stop, consume, engine, install_signal_handlers, r,
+                                release_consumer)
+from inference.risk_events import EXPLAIN, INSERT_RISK
 
-REDIS_URL = os.environ.get("REDIS_URL", "redis://redis:6379/0")
-DATABASE_URL_APP = os.environ.get("DATABASE_URL_APP")
-if not DATABASE_URL_APP:
-    raise SystemExit("DATABASE_URL_APP is required")
+# Shard streams this process owns (see inference.shards); STREAM is the first
+# one and the default for single-stream helpers.
+STREAMS = owned_streams()
+STREAM = STREAMS[0] if STREAMS else BASE_STREAM
+GROUP = "inference"
+# Unique per process so replicas never share a consumer (and its pending list).
+# The supervisor passes a stable per-slot name so a restarted child picks up
+# its own pending entries immediately.
+CONSUMER = os.environ.get("INFERENCE_CONSUMER") or f"{socket.gethostname()}-{os.getpid()}"
+# Entries that keep failing are parked on the dead-letter stream after this many deliveries.
+MAX_DELIVERIES = int(os.environ.get("INFERENCE_MAX_DELIVERIES", "3"))
+DLQ_MAXLEN = int(os.environ.get("INFERENCE_DLQ_MAXLEN", "100000"))
+DB_RETRIES = int(os.environ.get("INFERENCE_DB_RETRIES", "5"))
+DB_BACKOFF_S = float(os.environ.get("INFERENCE_DB_BACKOFF_S", "0.5"))
+DB_BACKOFF_MAX_S = float(os.environ.get("INFERENCE_DB_BACKOFF_MAX_S", "10"))
+RISK_STREAM_MAXLEN = int(os.environ.get("INFERENCE_RISK_STREAM_MAXLEN", "1000000"))
+# Payload fields copied onto the risk stream so rules can also match raw vitals.
+RISK_STREAM_VITALS = ("hr", "spo2", "rr", "temp_c", "intake_ml")
+# Prometheus exporter; supervisor slots listen on port + slot. 0 disables it.
+METRICS_PORT = int(os.environ.get("INFERENCE_METRICS_PORT", "9108"))
 
-r = redis.Redis.from_url(REDIS_URL, decode_responses=True)
-eng = create_engine(DATABASE_URL_APP, future=True, pool_pre_ping=True)
-model = RiskModel()
+models = ModelRegistry()
+rolling = RollingFeatureStore(r)
+emitter = EmissionPolicy(redis_client=r)
 
-STREAM = "hakilix.telemetry"
-GROUP = "inference"
-CONSUMER = "worker-1"
+RISK_WRITTEN = Counter("hakilix_risk_events_written_total", "risk_events rows written", ["reason"])
+RISK_SUPPRESSED = Counter("hakilix_risk_events_suppressed_total", "Scored readings not written by the emission policy")
 
-def ensure_group():
-    try:
-        r.xgroup_create(STREAM, GROUP, id="0-0", mkstream=True)
-    except Exception:
-        pass
+def insert_risk_batch(rows: list[tuple[str, str, list[float]]], model_version: str):
+    """Persist (agency_id, resident_id, scores) rows in a single transaction.
 
-def insert_risk(agency_id: str, resident_id: str, scores: list[float]):
+    Rows are grouped per tenant so RLS is set once per agency and each group is
+    sent as one executemany (pipelined by psycopg) instead of a round-trip per row.
+    """
     now = datetime.now(timezone.utc)
-    explain = json.dumps({
-        "FALLS": "Gait / Hypotension / Wandering",
-        "RESPIRATORY": "RR Trend / SpO₂ / Temp",
-        "DEHYDRATION": "Intake / Tachycardia",
-        "DELIRIUM_UTI": "Sleep / Agitation / Toileting",
-    })
-    with eng.begin() as c:
-        c.execute(text("SELECT set_config('app.tenant_id', :tid, true)"), {"tid": agency_id})
-        c.execute(text("""
-            INSERT INTO hakilix.risk_events(time, agency_id, resident_id, falls_risk, resp_risk, dehydration_risk, delirium_uti_risk, model_version, explain)
-            VALUES (:t,:aid,:rid,:f,:r,:d,:u,:mv,:e)
-        """), {"t": now, "aid": agency_id, "rid": resident_id,
-                  "f": scores[0], "r": scores[1], "d": scores[2], "u": scores[3],
-                  "mv": model.version, "e": explain})
+    by_agency: dict[str, list[dict]] = defaultdict(list)
+    for agency_id, resident_id, scores in rows:
+        by_agency[agency_id].append({"t": now, "aid": agency_id, "rid": resident_id,
+                                     "f": scores[0], "r": scores[1], "d": scores[2], "u": scores[3],
+                                     "mv": model_version, "e": EXPLAIN})
+    with engine().begin() as c:
+        for agency_id, params in by_agency.items():
+            c.execute(text("SELECT set_config('app.tenant_id', :tid, true)"), {"tid": agency_id})
+            c.execute(INSERT_RISK, params)
 
-def main():
-    ensure_group()
-    print("Inference worker started.")
-    while True:
+def _is_transient(e: Exception) -> bool:
+    return isinstance(e, OperationalError) or (isinstance(e, DBAPIError) and e.connection_invalidated)
+
+def persist_with_retry(rows: list[tuple[str, str, list[float]]], model_version: str):
+    """insert_risk_batch with exponential backoff on transient DB errors.
+
+    Only the already-scored rows are retried; nothing is re-read or re-scored.
+    """
+    delay = DB_BACKOFF_S
+    for attempt in range(DB_RETRIES + 1):
         try:
-            msgs = r.xreadgroup(GROUP, CONSUMER, {STREAM: ">"}, count=50, block=5000)
-            if not msgs:
+            insert_risk_batch(rows, model_version)
+            return
+        except Exception as e:
+            if not _is_transient(e) or attempt == DB_RETRIES or _stop.is_set():
+                raise
+            print(f"transient db error (attempt {attempt + 1}/{DB_RETRIES}), retrying in {delay:.1f}s:", e)
+            _stop.wait(delay)
+            delay = min(delay * 2, DB_BACKOFF_MAX_S)
+
+def delivery_counts(ids: list[str], stream: str = STREAM, group: str = GROUP) -> dict[str, int]:
+    pipe = r.pipeline(transaction=False)
+    for mid in ids:
+        pipe.xpending_range(stream, group, min=mid, max=mid, count=1)
+    return {mid: (res[0]["times_delivered"] if res else 0) for mid, res in zip(ids, pipe.execute())}
+
+def dead_letter(failed: list[tuple[str, dict, str]], stream: str = STREAM, group: str = GROUP) -> list[str]:
+    """Park entries that exhausted MAX_DELIVERIES; returns the ids now safe to ack.
+
+    Entries below the limit stay pending and come back through XAUTOCLAIM.
+    """
+    if not failed:
+        return []
+    counts = delivery_counts([mid for mid, _, _ in failed], stream, group)
+    parked = []
+    pipe = r.pipeline(transaction=False)
+    for mid, fields, err in failed:
+        if counts.get(mid, 0) < MAX_DELIVERIES:
+            continue
+        pipe.xadd(DLQ_STREAM, {**fields, "dlq_source_stream": stream, "dlq_source_id": mid,
+                               "dlq_error": err[:2000], "dlq_deliveries": counts[mid],
+                               "dlq_consumer": CONSUMER, "dlq_time": datetime.now(timezone.utc).isoformat()},
+                  maxlen=DLQ_MAXLEN, approximate=True)
+        parked.append(mid)
+    if parked:
+        pipe.execute()
+        print(f"dead-lettered {len(parked)} entr{'y' if len(parked) == 1 else 'ies'} to {DLQ_STREAM}")
+    return parked
+
+def publish_scores(scored: list[tuple[str, str, dict, list[float]]], model_version: str):
+    """XADD (agency_id, resident_id, payload, scores) to the sharded risk stream."""
+    if not RISK_STREAM or not scored:
+        return
+    pipe = r.pipeline(transaction=False)
+    for agency_id, resident_id, payload, sc in scored:
+        fields = {"agency_id": agency_id, "resident_id": resident_id, "model_version": model_version,
+                  "time": str(payload.get("time") or datetime.now(timezone.utc).isoformat()),
+                  "falls_risk": sc[0], "resp_risk": sc[1], "dehydration_risk": sc[2], "delirium_uti_risk": sc[3]}
+        for k in RISK_STREAM_VITALS:
+            if payload.get(k) is not None:
+                fields[k] = payload[k]
+        pipe.xadd(stream_name(shard_for(agency_id, resident_id), base=RISK_STREAM), fields,
+                  maxlen=RISK_STREAM_MAXLEN, approximate=True)
+    pipe.execute()
+
+def process(entries: list[Entry], stream: str = STREAM) -> list[str]:
+    """Score and persist a batch; returns the ids that are safe to acknowledge.
+
+    Failures are isolated per entry: a malformed message only holds back itself,
+    the rest of the batch is committed and acknowledged.
+    """
+    rows, ids, failed, skipped = [], [], [], []
+    emit_reasons: dict[str, str] = {}
+    staged: dict = {}
+    payloads: dict[str, dict] = {}
+    # One model per batch: a hot reload mid-batch does not mix versions.
+    model = models.current()
+    rolling.warm([rolling.key(f.get("agency_id", "A-001"), f.get("resident_id", "R-001")) for _, f in entries])
+    keys, xs = [], []
+    for msg_id, fields in entries:
+        try:
+            agency_id = fields.get("agency_id", "A-001")
+            resident_id = fields.get("resident_id", "R-001")
+            payload = json.loads(fields.get("payload", "{}"))
+            fv = extract_features(payload)
+            xs.append(fv.to_array() + rolling.update(agency_id, resident_id, payload))
+            keys.append((msg_id, agency_id, resident_id))
+            payloads[msg_id] = payload
+        except Exception as e:
+            failed.append((msg_id, fields, f"{type(e).__name__}: {e}"))
+    if xs:
+        try:
+            scores = model.predict_batch(xs).tolist()
+        except Exception:
+            # Score one by one so a single bad vector cannot sink the batch.
+            scores = []
+            for (msg_id, _, _), x in zip(keys, xs):
+                try:
+                    scores.append(model.predict(x))
+                except Exception as e:
+                    scores.append(None)
+                    failed.append((msg_id, dict(entries)[msg_id], f"{type(e).__name__}: {e}"))
+        scored = [(k, sc) for k, sc in zip(keys, scores) if sc is not None]
+        emit_keys = [rolling.key(agency_id, resident_id) for (_, agency_id, resident_id), _ in scored]
+        emitter.warm(emit_keys)
+        reasons, staged = emitter.decide(emit_keys, [sc for _, sc in scored], time.time())
+        for ((msg_id, agency_id, resident_id), sc), why in zip(scored, reasons):
+            if why is None:
+                # Suppressed readings are done: acknowledge without a row.
+                skipped.append(msg_id)
                 continue
-            for _, entries in msgs:
-                for msg_id, fields in entries:
-                    agency_id = fields.get("agency_id", "A-001")
-                    resident_id = fields.get("resident_id", "R-001")
-                    payload = json.loads(fields.get("payload", "{}"))
-                    fv = extract_features(payload)
-                    scores = model.predict(fv.to_array())
-                    insert_risk(agency_id, resident_id, scores)
-                    r.xack(STREAM, GROUP, msg_id)
+            rows.append((agency_id, resident_id, sc))
+            ids.append(msg_id)
+            emit_reasons[msg_id] = why
+    if rows:
+        try:
+            persist_with_retry(rows, model.version)
         except Exception as e:
-            print("inference error:", e)
-            time.sleep(2)
+            if _is_transient(e):
+                # DB still down: leave everything pending for redelivery.
+                raise
+            # Non-transient (e.g. a constraint or data error): isolate the offending rows.
+            ok_ids = []
+            by_id = dict(entries)
+            for row, mid in zip(rows, ids):
+                try:
+                    insert_risk_batch([row], model.version)
+                    ok_ids.append(mid)
+                except Exception as row_err:
+                    if _is_transient(row_err):
+                        raise
+                    failed.append((mid, by_id[mid], f"{type(row_err).__name__}: {row_err}"))
+                    # Not written: keep comparing against the previous emitted state.
+                    staged.pop(rolling.key(row[0], row[1]), None)
+            ids = ok_ids
+        emitter.commit(staged)
+        for mid in ids:
+            RISK_WRITTEN.labels(reason=emit_reasons[mid]).inc()
+    if skipped:
+        RISK_SUPPRESSED.inc(len(skipped))
+    if ids or skipped:
+        done = set(ids) | set(skipped)
+        try:
+            publish_scores([(aid, rid, payloads[mid], sc) for (mid, aid, rid), sc in scored if mid in done],
+                           model.version)
+        except Exception as e:
+            # Alerts are best effort relative to the risk_events commit.
+            print("risk stream publish failed:", e)
+    rolling.maybe_checkpoint()
+    return ids + skipped + dead_letter(failed, stream)
+
+def start_metrics():
+    if METRICS_PORT <= 0:
+        return
+    port = METRICS_PORT + int(os.environ.get("INFERENCE_SLOT", "0"))
+    try:
+        start_http_server(port)
+    except OSError as e:
+        print("metrics exporter disabled:", e)
+
+def main():
+    engine()
+    install_signal_handlers()
+    start_metrics()
+    print("Inference worker started:", CONSUMER, "streams:", ",".join(STREAMS))
+    consume(process, CONSUMER, STREAMS, GROUP)
+    release_consumer(CONSUMER, STREAMS, GROUP)
+    rolling.maybe_checkpoint(force=True)
+    print("Inference worker drained:", CONSUMER)
 
 if __name__ == "__main__":
     main()
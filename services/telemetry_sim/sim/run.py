@@ -1,5 +1,5 @@
 from __future__ import annotations
-import os, time, json, random
+import os, time, json, random, zlib
 from datetime import datetime, timezone
 from hashlib import sha256
 import requests, redis
@@ -22,7 +22,14 @@ RESIDENT_IDS = _parse_residents()
 
 DEVICE_TOKEN = "devtok_" + sha256((DEMO_DEVICE_ID + DEMO_AGENCY_ID).encode("utf-8")).hexdigest()[:24]
 r = redis.Redis.from_url(REDIS_URL, decode_responses=True)
-STREAM = "hakilix.telemetry"
+STREAM = os.environ.get("REDIS_STREAM", "hakilix.telemetry")
+TELEMETRY_SHARDS = max(1, int(os.environ.get("TELEMETRY_SHARDS", "1")))
+
+def shard_stream(agency_id: str, resident_id: str) -> str:
+    # Must match inference.shards.shard_for / stream_name.
+    if TELEMETRY_SHARDS == 1:
+        return STREAM
+    return f"{STREAM}.{zlib.crc32(f'{agency_id}:{resident_id}'.encode('utf-8')) % TELEMETRY_SHARDS}"
 
 def gen(resident_id: str):
     base_hr = random.randint(62, 84)
@@ -74,7 +81,7 @@ def post(payload: dict):
 
 def publish(resident_id: str, payload: dict):
     r.xadd(
-        STREAM,
+        shard_stream(DEMO_AGENCY_ID, resident_id),
         {"agency_id": DEMO_AGENCY_ID, "resident_id": resident_id, "payload": json.dumps(payload)},
         maxlen=4000,
         approximate=True,
@@ -3,6 +3,7 @@ from __future__ import annotations
 import base64
 import json
 import os
+import zlib
 from datetime import datetime, timezone
 from typing import Any, Dict
 
@@ -22,6 +23,7 @@ if not DATABASE_URL:
 
 REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
 STREAM = os.getenv("REDIS_STREAM", "hakilix.telemetry")
+TELEMETRY_SHARDS = max(1, int(os.getenv("TELEMETRY_SHARDS", "1")))
 
 engine = create_engine(DATABASE_URL, future=True, pool_pre_ping=True)
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False, future=True)
@@ -41,6 +43,13 @@ class PubSubMessage(BaseModel):
 def health():
     return {"status":"ok","service":"hakilix_worker","time": datetime.now(timezone.utc).isoformat()}
 
+def shard_stream(agency_id: str, resident_id: str) -> str:
+    # Must match inference.shards.shard_for / stream_name.
+    if TELEMETRY_SHARDS == 1:
+        return STREAM
+    shard = zlib.crc32(f"{agency_id}:{resident_id}".encode("utf-8")) % TELEMETRY_SHARDS
+    return f"{STREAM}.{shard}"
+
 def _decode_pubsub_data(msg: Dict[str, Any]) -> Dict[str, Any]:
     data_b64 = msg.get("data")
     if not data_b64:
@@ -100,7 +109,7 @@ async def pubsub_push(payload: PubSubMessage, request: Request):
         })
         db.commit()
 
-    # 2) enqueue for inference worker via Redis stream
-    r.xadd(STREAM, {"agency_id": agency_id, "resident_id": telemetry["resident_id"], "payload": json.dumps(telemetry)})
+    # 2) enqueue for inference worker via the resident's shard stream
+    r.xadd(shard_stream(agency_id, telemetry["resident_id"]), {"agency_id": agency_id, "resident_id": telemetry["resident_id"], "payload": json.dumps(telemetry)})
 
     return {"status":"ok"}